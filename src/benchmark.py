@@ -36,6 +36,20 @@ def parse_args():
   %(prog)s --games 1000                 # 1000ゲーム実行
   %(prog)s --simulations 700            # シミュレーション回数を700に設定
   %(prog)s --gpu                        # GPU使用（CuPy必要）
+  %(prog)s --engine state               # NumPy版エンジンでシミュレーション
+  %(prog)s --engine batch               # 全プレイアウトを配列でまとめて実行
+  %(prog)s --workers 16                 # 16プロセスで並列探索
+  %(prog)s --time-budget 200            # 1手200ミリ秒の持ち時間で探索
+  %(prog)s --allocation halving         # 見込みのある候補にプレイアウトを寄せる
+  %(prog)s --early-stop 0.95            # 最善手が95%%の信頼水準で決まったら打ち切る
+  %(prog)s --paired --early-stop 0.95   # 共通乱数で候補間の差を比べて早く打ち切る
+  %(prog)s --determinization stratified # A・K・6・8などの持ち主で層別化して確定化
+  %(prog)s --determinization exact      # パス推論と整合する手札の割り当てから一様に確定化
+  %(prog)s --determinization particle   # 手番をまたいで持つ粒子（相手手札の仮説）から確定化
+  %(prog)s --enumerate-worlds 50        # 整合する世界が50以下なら全て1回ずつ列挙
+  %(prog)s --endgame-solver 12          # 手札の合計が12枚以下なら終盤ソルバーで勝者を求める
+  %(prog)s --search ismcts              # 情報集合MCTSで探索
+  %(prog)s --rave                       # 初手の後に出した候補カードにもプレイアウトの結果を数える
   %(prog)s --games 500 --simulations 500 --gpu  # すべて指定
         """
     )
@@ -60,6 +74,86 @@ def parse_args():
         help='GPU使用（CuPyが必要）'
     )
     
+    parser.add_argument(
+        '--engine',
+        choices=['state', 'bit', 'batch'],
+        default=None,
+        help='シミュレーション用エンジン（state: NumPy版 / bit: ビットボード版 / batch: 全局一括のNumPy版）（デフォルト: main.pyのSIMULATION_ENGINE）'
+    )
+    
+    parser.add_argument(
+        '--workers',
+        type=int,
+        default=None,
+        help='並列探索のワーカープロセス数（0: 直列）（デフォルト: main.pyのPARALLEL_WORKERS）'
+    )
+    
+    parser.add_argument(
+        '--time-budget',
+        type=float,
+        default=None,
+        help='1手あたりの持ち時間（ミリ秒）。指定時は回数ではなく時間で探索を打ち切る（デフォルト: main.pyのTIME_BUDGET_MS）'
+    )
+    
+    parser.add_argument(
+        '--allocation',
+        choices=['uniform', 'ucb1', 'halving'],
+        default=None,
+        help='ルート候補へのプレイアウト配分（uniform: 全候補同数 / ucb1: UCB1 / halving: 逐次半減）（デフォルト: main.pyのROOT_ALLOCATION）'
+    )
+    
+    parser.add_argument(
+        '--early-stop',
+        type=float,
+        default=None,
+        metavar='CONFIDENCE',
+        help='最善手が統計的に決まったらシミュレーションを打ち切る（信頼水準、例: 0.95）（デフォルト: main.pyのENABLE_EARLY_STOPPING）'
+    )
+    
+    parser.add_argument(
+        '--paired',
+        action='store_true',
+        default=None,
+        help='共通乱数: 同じ確定化の全候補でロールアウトの乱数列をそろえる（デフォルト: main.pyのPAIRED_ROLLOUTS）'
+    )
+    
+    parser.add_argument(
+        '--determinization',
+        choices=['random', 'stratified', 'exact', 'particle'],
+        default=None,
+        help='確定化の方式（random: 制約付き無作為 / stratified: ピボットカードの持ち主で層別化 / exact: 制約を満たす世界から一様に / particle: 手番をまたぐ粒子フィルタから）（デフォルト: main.pyのDETERMINIZATION_MODE）'
+    )
+    
+    parser.add_argument(
+        '--enumerate-worlds',
+        type=int,
+        default=None,
+        metavar='N',
+        help='推論と整合する世界がN以下なら無作為な確定化の代わりに全て1回ずつ列挙（デフォルト: main.pyのWORLD_ENUMERATION_THRESHOLD）'
+    )
+    
+    parser.add_argument(
+        '--endgame-solver',
+        type=int,
+        default=None,
+        metavar='CARDS',
+        help='全員の手札の合計がCARDS枚以下ならプレイアウトの代わりに終盤ソルバー（max-n探索）を使う（デフォルト: main.pyのENDGAME_SOLVER_CARDS）'
+    )
+    
+    parser.add_argument(
+        '--search',
+        choices=['pimc', 'ismcts'],
+        default=None,
+        help='探索方式（pimc: 候補ごとの平坦なモンテカルロ / ismcts: 情報集合MCTS）（デフォルト: main.pyのSEARCH_MODE）'
+    )
+    
+    parser.add_argument(
+        '--rave',
+        action='store_true',
+        default=None,
+        help='AMAF/RAVE: プレイアウト中に後から出した候補カードの統計も混ぜる（デフォルト: main.pyのENABLE_RAVE）'
+    )
+    
     parser.add_argument(
         '--progress-interval',
         type=int,
@@ -81,7 +175,10 @@ def setup_gpu(use_gpu):
             return False
     return False
 
-def run_benchmark(game_count, simulation_count=None, use_gpu=False, progress_interval=10):
+def run_benchmark(game_count, simulation_count=None, use_gpu=False, progress_interval=10, engine=None, workers=None, time_budget_ms=None,
+                  root_allocation=None, early_stop_confidence=None, paired_rollouts=None,
+                  determinization=None, enumeration_threshold=None, endgame_cards=None, search=None,
+                  rave=None):
     """
     ベンチマークを実行
     
@@ -90,6 +187,17 @@ def run_benchmark(game_count, simulation_count=None, use_gpu=False, progress_int
         simulation_count: シミュレーション回数（Noneの場合はmain.pyのデフォルト値）
         use_gpu: GPU使用フラグ
         progress_interval: 進捗表示の間隔
+        engine: シミュレーション用エンジン（Noneの場合はmain.pyのデフォルト値）
+        workers: 並列探索のワーカープロセス数（Noneの場合はmain.pyのデフォルト値）
+        time_budget_ms: 1手あたりの持ち時間（ミリ秒）（Noneの場合はmain.pyのデフォルト値）
+        root_allocation: ルート候補へのプレイアウト配分（Noneの場合はmain.pyのデフォルト値）
+        early_stop_confidence: 早期打ち切りの信頼水準（指定時は早期打ち切りを有効化、Noneの場合はmain.pyのデフォルト値）
+        paired_rollouts: 共通乱数によるロールアウト（Noneの場合はmain.pyのデフォルト値）
+        determinization: 確定化の方式（Noneの場合はmain.pyのデフォルト値）
+        enumeration_threshold: 全世界を列挙する世界数の上限（Noneの場合はmain.pyのデフォルト値）
+        endgame_cards: 終盤ソルバーを使う手札合計の上限（Noneの場合はmain.pyのデフォルト値）
+        search: 探索方式（Noneの場合はmain.pyのデフォルト値）
+        rave: AMAF/RAVE（Noneの場合はmain.pyのデフォルト値）
     """
     # GPU設定
     gpu_available = setup_gpu(use_gpu)
@@ -104,7 +212,12 @@ def run_benchmark(game_count, simulation_count=None, use_gpu=False, progress_int
     ai_pos = 0  # AI is Player 0
     
     # AI初期化
-    my_ai = HybridStrongestAI(my_player_num=ai_pos, simulation_count=sim_count)
+    my_ai = HybridStrongestAI(my_player_num=ai_pos, simulation_count=sim_count, engine=engine, workers=workers,
+                              time_budget_ms=time_budget_ms, root_allocation=root_allocation,
+                              early_stopping=True if early_stop_confidence is not None else None,
+                              early_stop_confidence=early_stop_confidence, paired_rollouts=paired_rollouts,
+                              determinization=determinization, enumeration_threshold=enumeration_threshold,
+                              endgame_cards=endgame_cards, search=search, rave=rave)
     
     # ベンチマーク情報を表示
     print("="*60)
@@ -113,6 +226,17 @@ def run_benchmark(game_count, simulation_count=None, use_gpu=False, progress_int
     print(f"ゲーム数: {game_count}")
     print(f"シミュレーション回数: {sim_count}")
     print(f"GPU使用: {'はい (CuPy)' if gpu_available else 'いいえ (CPU)'}")
+    print(f"探索方式: {my_ai.search}")
+    print(f"シミュレーションエンジン: {my_ai.engine}")
+    print(f"並列ワーカー数: {my_ai.workers if my_ai.workers > 0 else 'なし（直列）'}")
+    print(f"プレイアウト配分: {my_ai.root_allocation}")
+    print(f"早期打ち切り: {f'あり（信頼水準 {my_ai.early_stop_confidence:g}）' if my_ai.early_stopping else 'なし'}")
+    print(f"共通乱数ロールアウト: {'あり' if my_ai.paired_rollouts else 'なし'}")
+    print(f"AMAF/RAVE: {'あり' if my_ai.rave else 'なし'}")
+    print(f"確定化: {my_ai.determinization}")
+    print(f"全世界の列挙: {f'整合する世界が{my_ai.enumeration_threshold}以下のとき' if my_ai.enumeration_threshold > 0 else 'なし'}")
+    print(f"終盤ソルバー: {f'手札の合計が{my_ai.endgame_cards}枚以下のとき' if my_ai.endgame_cards > 0 else 'なし'}")
+    print(f"1手の持ち時間: {f'{my_ai.time_budget_ms:g}ms' if my_ai.time_budget_ms is not None else 'なし（回数で打ち切り）'}")
     print(f"進捗表示間隔: {progress_interval}ゲームごと")
     print("="*60)
     print()
@@ -184,6 +308,8 @@ def run_benchmark(game_count, simulation_count=None, use_gpu=False, progress_int
     print("="*60)
     print(f"総実行時間: {duration:.2f}秒")
     print(f"平均時間: {duration/game_count:.2f}秒/ゲーム")
+    if my_ai.early_stopping:
+        print(f"早期打ち切り率: {my_ai.early_stop_rate():.1%} ({my_ai.early_stopped_moves}/{my_ai.searched_moves}手)")
     print()
     
     # AI勝率
@@ -238,7 +364,18 @@ def main():
             game_count=args.games,
             simulation_count=args.simulations,
             use_gpu=args.gpu,
-            progress_interval=args.progress_interval
+            progress_interval=args.progress_interval,
+            engine=args.engine,
+            workers=args.workers,
+            time_budget_ms=args.time_budget,
+            root_allocation=args.allocation,
+            early_stop_confidence=args.early_stop,
+            paired_rollouts=args.paired,
+            determinization=args.determinization,
+            enumeration_threshold=args.enumerate_worlds,
+            endgame_cards=args.endgame_solver,
+            search=args.search,
+            rave=args.rave
         )
         
         print()
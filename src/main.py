@@ -1,6 +1,11 @@
 import random
 import copy
+import itertools
+import math
+import statistics
 import time
+from array import array
+from concurrent.futures import ProcessPoolExecutor
 from enum import Enum
 from random import shuffle
 import numpy as np
@@ -13,13 +18,43 @@ MY_PLAYER_NUM = 0     # 自分のプレイヤー番号
 # 大会モード: 処理時間を気にせず最強を目指す（実証済み最適値＋参考コード統合による強化）
 SIMULATION_COUNT = 1000  # 1手につき何回シミュレーションするか（超強化版：700→1000, 最高精度）
 SIMULATION_DEPTH = 350  # どこまで先読みするか（強化版：300→350）
+TIME_BUDGET_MS = None  # 1手あたりの持ち時間（ミリ秒）。指定時はシミュレーション回数ではなく時間で探索を打ち切る
+BATCH_PROBE_SIMULATIONS = 8  # 持ち時間制のバッチエンジンで、1巡の所要時間を測る最初の巡の確定化の回数
+BATCH_TIME_FILL = 0.8  # 持ち時間制のバッチエンジンで、次の巡に見込む残り時間の割合（測った1回あたりの時間から回数を決める）
+ROOT_ALLOCATION = 'uniform'  # ルート候補へのプレイアウト配分（'uniform': 全候補同数 / 'ucb1': UCB1 / 'halving': 逐次半減）
+ROOT_BANDIT_BUDGET_RATIO = 0.5  # 'ucb1' / 'halving' のプレイアウト総数（全候補同数の場合に対する比率）
+ROOT_UCB_C = 1.0  # UCB1 の探索項の係数
+ROLLOUT_SCORE_RANGE = 3.3  # 1プレイアウトのスコア幅（-1.3〜+2）
+ENABLE_EARLY_STOPPING = False  # 最善手が統計的に決まったらシミュレーションを打ち切る（root_allocation='uniform'）
+EARLY_STOP_CONFIDENCE = 0.95  # 早期打ち切りの信頼水準（首位のLCBが他の全候補のUCBを上回ったら打ち切る）
+EARLY_STOP_MIN_SIMS = 30  # 打ち切り判定を始める最小シミュレーション回数
+EARLY_STOP_CHECK_INTERVAL = 10  # 打ち切り判定の間隔（シミュレーション回数）
+EARLY_STOP_MIN_MARGIN = 1e-9  # 打ち切りに必要な首位の信頼下限の余裕（浮動小数点の誤差だけの差は同点とみなす）
+PAIRED_ROLLOUTS = False  # 共通乱数: 同じ確定化の全候補でロールアウトの乱数列をそろえ、候補間の差を低分散で比べる
+DETERMINIZATION_MODE = 'random'  # 確定化の方式（'random': 制約付き無作為 / 'stratified': ピボットカードの持ち主で層別化 / 'exact': 制約を満たす世界から一様に / 'particle': 手番をまたぐ粒子フィルタから）
+DETERMINIZATION_BATCH_SIZE = 64  # 'exact' / 'particle' で一度に生成する世界の数（sim 番目の世界は (種, sim // この数) で決まる）
+WORLD_ENUMERATION_THRESHOLD = 0  # 推論と整合する世界がこの数以下なら全て1回ずつ列挙する（0で無効）
+DETERMINIZATION_STRATA_BLOCK = 32  # 層別化で持ち主の出現回数をそろえる単位（シミュレーション回数）
+PARTICLE_COUNT = 128  # 'particle' の粒子（相手手札の仮説）の数
+PARTICLE_RESAMPLE_RATIO = 0.5  # 有効サンプルサイズが粒子数のこの割合を下回ったらリサンプリングする
+PARTICLE_MCMC_MOVES = 3  # リサンプリングで複製された粒子ごとに試すカード入れ替え（メトロポリス法）の回数
+ENABLE_RAVE = False  # AMAF（初手の後に出した候補カードにもプレイアウトの点数を数える）を直接の統計と混ぜる
+RAVE_EQUIVALENCE = 20  # AMAF の重み β = sqrt(k / (3n + k)) の k（n: 直接のプレイアウト回数）
+SEARCH_MODE = 'pimc'  # 探索方式（'pimc': 候補ごとの平坦なモンテカルロ / 'ismcts': 情報集合MCTS）
+ISMCTS_UCB_C = 0.7  # ISMCTS の木の中の UCB 探索係数（報酬は [0, 1] 程度）
+ENDGAME_SOLVER_CARDS = 0  # 全員の手札の合計がこの枚数以下なら、プレイアウトの代わりに終盤ソルバーで勝者を求める（0で無効）
+ENDGAME_TABLE_SIZE = 200000  # 終盤ソルバーの置換表の最大エントリ数（超えたら古いものから捨てる）
+SUIT_TABLE_SIZE = 1 << 16  # スート別テーブル（場の13bit × 手札の13bit）1つあたりの最大エントリ数（超えたら古いものから捨てる）
+PARALLEL_WORKERS = 0  # 並列探索のワーカープロセス数（0: 直列。プールは手・ゲームをまたいで使い回す）
+ZOBRIST_DEBUG = False  # True: next() のたびに差分更新したZobristキーを全再計算と照合する（デバッグ用、遅い）
+SIMULATION_ENGINE = 'bit'  # シミュレーション用エンジン（'state': NumPy版State / 'bit': ビットボード版BitState / 'batch': 全局一括のBatchState）
 
 # Phase 2改善フラグ
 ENABLE_TUNNEL_LOCK = True  # トンネルロック戦略
 ENABLE_BURST_FORCE = True  # バースト誘導戦略
 
 # 確率的推論の設定
-BELIEF_STATE_DECAY_FACTOR = 0.05  # パス観測時の確率減衰率（実証済み）
+BELIEF_STATE_DECAY_FACTOR = 0.05  # パス観測時の確率減衰率（実証済み）。'particle' では合法手を持っていた粒子の重みにかける
 DETERMINIZATION_ATTEMPTS = 120  # 確定化のリトライ回数（強化版：100→120）
 
 # 戦略重み付け係数（強化版：戦略ボーナスの影響を増強、参考コード統合により最適化）
@@ -80,7 +115,6 @@ ADVANCED_HEURISTIC_WEIGHT = 0.8   # 高度なヒューリスティックの重
 # 新戦略の有効化フラグ
 ENABLE_NECROMANCER = True    # ネクロマンサー戦略（バースト予知）
 ENABLE_SEVEN_SIGNAL = True   # 7の信号機戦略
-ENABLE_HYPERLOOP_DIST = True # ハイパーループ距離計算
 
 # --- データクラス定義 ---
 
@@ -119,12 +153,39 @@ class Number(Enum):
     def __repr__(self):
         return f"Number.{self.name}"
 
+SUIT_BY_INDEX = tuple(Suit)      # スート番号（0〜3）→ Suit
+NUMBER_BY_INDEX = tuple(Number)  # 0始まりの数字インデックス（0〜12）→ Number
+SUIT_INDEX = {s: i for i, s in enumerate(SUIT_BY_INDEX)}
+
+
 class Card:
-    def __init__(self, suit, number):
+    """カード1枚。52枚は CARDS に事前生成して使い回す（インターン）。
+
+    Card(suit, number) は新しいオブジェクトを作らず、CARDS の同じインスタンスを返す。
+    - id: カードID（スート番号 * 13 + 数字 - 1、0〜51）
+    - suit_index: スート番号（0〜3） / number_index: 数字の0始まりインデックス（0〜12）
+    """
+    __slots__ = ('suit', 'number', 'id', 'suit_index', 'number_index')
+
+    def __new__(cls, suit, number):
         # if not (isinstance(suit, Suit) and isinstance(number, Number)):
         #     raise ValueError
-        self.suit = suit
-        self.number = number
+        return CARDS[SUIT_INDEX[suit] * 13 + number.val - 1]
+
+    @classmethod
+    def _create(cls, suit, number):
+        """CARDS 構築用（ここ以外でインスタンスを作らない）"""
+        card = object.__new__(cls)
+        card.suit = suit
+        card.number = number
+        card.suit_index = SUIT_INDEX[suit]
+        card.number_index = number.val - 1
+        card.id = card.suit_index * 13 + card.number_index
+        return card
+
+    def __reduce__(self):
+        # pickle / copy してもインターン済みのインスタンスに戻す
+        return (card_from_id, (self.id,))
 
     def __str__(self):
         return str(self.suit) + str(self.number)
@@ -133,10 +194,46 @@ class Card:
         return f"Card({self.__str__()})"
 
     def __eq__(self, other):
-        return (self.suit, self.number) == (other.suit, other.number)
+        # インターン済みなので同じカードは同じオブジェクト
+        if self is other:
+            return True
+        return (self.suit, self.number) == (getattr(other, 'suit', None), getattr(other, 'number', None))
 
     def __hash__(self):
-        return hash((self.suit, self.number))
+        return self.id
+
+
+# 52枚のカード表（カードID順 = スート順 × 数字順）
+CARDS = tuple(Card._create(s, n) for s in SUIT_BY_INDEX for n in NUMBER_BY_INDEX)
+SEVEN_CARDS = tuple(CARDS[s_idx * 13 + 6] for s_idx in range(4))
+DIAMOND_SEVEN = CARDS[SUIT_INDEX[Suit.DIAMOND] * 13 + 6]
+
+# カードID → スート番号 / 数字インデックス
+CARD_SUIT_INDEX = tuple(c.suit_index for c in CARDS)
+CARD_NUMBER_INDEX = tuple(c.number_index for c in CARDS)
+
+# カードID → 7から外側に向かって次に出せるようになるカードのID（A/K・7は-1）
+NEXT_CARD_ID = tuple(
+    (cid - 1 if n_idx < 6 and n_idx > 0 else cid + 1 if 6 < n_idx < 12 else -1)
+    for cid, n_idx in enumerate(CARD_NUMBER_INDEX)
+)
+
+# カードID → 円環上の隣接カードID（(数字+1)%13, (数字-1)%13 の順、トンネルを含む）
+CIRCULAR_NEIGHBOR_IDS = tuple(
+    (CARD_SUIT_INDEX[cid] * 13 + (n_idx + 1) % 13, CARD_SUIT_INDEX[cid] * 13 + (n_idx - 1) % 13)
+    for cid, n_idx in enumerate(CARD_NUMBER_INDEX)
+)
+
+
+def card_from_id(card_id):
+    """カードID（0〜51）からCardを取得"""
+    return CARDS[card_id]
+
+
+def card_of(suit_index, number_index):
+    """スート番号と0始まりの数字インデックスからCardを取得"""
+    return CARDS[suit_index * 13 + number_index]
+
 
 class Hand(list):
     def __init__(self, card_list):
@@ -162,9 +259,7 @@ class Hand(list):
 
 class Deck(list):
     def __init__(self):
-        super().__init__(
-            Card(suit, number) for suit in Suit for number in Number
-        )
+        super().__init__(CARDS)
         self.shuffle()
 
     def shuffle(self):
@@ -181,47 +276,151 @@ class Deck(list):
         return cards
 
 
+# --- スート別合法手テーブル ---
+# 1スートの合法手は、そのスートの場の13bitパターン（bit i = 数字インデックス i が場にある）だけで決まる。
+# 8192通りすべてを起動時に前計算し、合法手生成をスートあたり1回の表引きにする。
+
+SUIT_BITS = 0x1FFF        # 1スート分（13bit）のマスク
+ALL_CARDS_MASK = (1 << 52) - 1  # 52枚すべてのマスク
+_SMALL_SIDE_BITS = 0x003F  # A〜6（bit0〜5）
+_LARGE_SIDE_BITS = 0x1F80  # 8〜K（bit7〜12）
+_LOW_SIDE_MASK = _SMALL_SIDE_BITS * 0x8004002001  # A〜6 を4スート分
+_HIGH_SIDE_MASK = _LARGE_SIDE_BITS * 0x8004002001  # 8〜K を4スート分
+_SUIT_BIT_WEIGHTS = np.array([1 << i for i in range(13)], dtype='int64')  # field_cards の行 → 13bitパターン
+
+
+def _suit_legal_bits(suit_field):
+    """1スート分の場（13bit）から出せるカードのbitを返す（テーブル構築用）
+
+    トンネルルール:
+    - AもKも出ていない: 6から下・8から上の最初の空き
+    - Aが出ている: 8から上のみ / Kが出ている: 6から下のみ / 両方出ている: 両側
+    """
+    is_ace_out = suit_field & 1
+    is_king_out = suit_field >> 12 & 1
+    bits = 0
+
+    # 7より小さい側: Kが出ている OR 初期状態 → 6から下へ最初の空き
+    if is_king_out or not is_ace_out:
+        empty = ~suit_field & _SMALL_SIDE_BITS
+        if empty:
+            bits |= 1 << (empty.bit_length() - 1)
+
+    # 7より大きい側: Aが出ている OR 初期状態 → 8から上へ最初の空き
+    if is_ace_out or not is_king_out:
+        empty = ~suit_field & _LARGE_SIDE_BITS
+        if empty:
+            bits |= empty & -empty
+
+    return bits
+
+
+def _build_suit_move_tables():
+    legal_bits = []
+    legal_indexes = []
+    low_frontier = []
+    high_frontier = []
+    for suit_field in range(1 << 13):
+        bits = _suit_legal_bits(suit_field)
+        legal_bits.append(bits)
+        legal_indexes.append(tuple(i for i in range(13) if bits >> i & 1))
+
+        # 各側で次に場に出るカード（トンネル状態に関係なく、7から外側の最初の空き）
+        empty = ~suit_field & _SMALL_SIDE_BITS
+        low_frontier.append(empty.bit_length() - 1 if empty else -1)
+        empty = ~suit_field & _LARGE_SIDE_BITS
+        high_frontier.append((empty & -empty).bit_length() - 1 if empty else -1)
+    return tuple(legal_bits), tuple(legal_indexes), tuple(low_frontier), tuple(high_frontier)
+
+
+# SUIT_LEGAL_BITS[m]: 出せるカードの13bit / SUIT_LEGAL_INDEXES[m]: 出せる数字インデックス（昇順）
+# SUIT_LOW_FRONTIER[m] / SUIT_HIGH_FRONTIER[m]: A〜6側 / 8〜K側で次に出るカードの数字インデックス（なければ-1）
+SUIT_LEGAL_BITS, SUIT_LEGAL_INDEXES, SUIT_LOW_FRONTIER, SUIT_HIGH_FRONTIER = _build_suit_move_tables()
+
+
+def legal_mask_from_field(field):
+    """場の52bitマスクから出せるカードの52bitマスクを返す（4回の表引き）"""
+    return (SUIT_LEGAL_BITS[field & SUIT_BITS]
+            | SUIT_LEGAL_BITS[field >> 13 & SUIT_BITS] << 13
+            | SUIT_LEGAL_BITS[field >> 26 & SUIT_BITS] << 26
+            | SUIT_LEGAL_BITS[field >> 39 & SUIT_BITS] << 39)
+
+
+class SuitTable:
+    """(スートの場の13bit, そのスートの手札の13bit) → build の結果 を遅延で埋める表
+
+    ロールアウトの採点や戦略評価の特徴量の多くは、1スート分の場と手札だけで決まる。
+    2^26 通りを前計算する代わりに、実際に現れたパターンだけを初回に build で作って覚える。
+    max_entries を超えたら古いものから捨てる（EndgameSolver の置換表と同じ）。
+    """
+
+    __slots__ = ('build', 'max_entries', 'entries', 'misses')
+
+    def __init__(self, build, max_entries=None):
+        self.build = build
+        self.max_entries = max_entries if max_entries is not None else SUIT_TABLE_SIZE
+        self.entries = {}  # suit_field << 13 | suit_hand → build(suit_field, suit_hand)
+        self.misses = 0
+
+    def get(self, suit_field, suit_hand):
+        value = self.entries.get(suit_field << 13 | suit_hand)
+        if value is None:
+            value = self.fill(suit_field, suit_hand)
+        return value
+
+    def fill(self, suit_field, suit_hand):
+        """表にないパターンを build して登録する"""
+        entries = self.entries
+        if len(entries) >= self.max_entries:
+            del entries[next(iter(entries))]
+        value = entries[suit_field << 13 | suit_hand] = self.build(suit_field, suit_hand)
+        self.misses += 1
+        return value
+
+
 # --- 推論器 (Inference Engine) ---
 
 class CardTracker:
     """パス履歴から相手の手札可能性を推論
     
     参考用実装からの完全コピー版（doc/misc/colab_notebook.md）
-    - シンプルなset-basedアプローチ
+    - possible[p] = プレイヤーpが持ちうるカードの52bitマスク
     - パス観測時にlegal_actionsを完全に除外（より決定的）
-    - 確率計算なし（実行速度重視）
+    - 確率計算なし（実行速度重視）。評価関数向けの問い合わせは AND + popcount 1回で、
+      summary() は推論が更新されるまで同じ集計を返す（1手の評価全体で共有）
     """
 
     def __init__(self, state, my_player_num):
         self.players_num = state.players_num
         self.my_player_num = my_player_num
-        self.all_cards = [Card(s, n) for s in Suit for n in Number]
         
-        # possible[p] = プレイヤーpが持ちうるカード集合
-        self.possible = [set(self.all_cards) for _ in range(self.players_num)]
+        self.possible = [ALL_CARDS_MASK] * self.players_num
         self.pass_counts = [0] * self.players_num
+        self._summary = None
         
         # 場に出たカードは誰も持たない
         self._apply_field(state)
         
         # 自分の手札は確定
-        my_hand = set(state.players_cards[my_player_num])
-        for p in range(self.players_num):
-            if p == my_player_num:
-                self.possible[p].intersection_update(my_hand)
-            else:
-                self.possible[p].difference_update(my_hand)
+        self._apply_hand(state)
         
         self.out_player = set(state.out_player)
 
     def _apply_field(self, state):
         """場に出たカードを除外"""
-        for s_idx, s in enumerate(Suit):
-            for n_idx, n in enumerate(Number):
-                if state.field_cards[s_idx][n_idx] == 1:
-                    card = Card(s, n)
-                    for p in range(self.players_num):
-                        self.possible[p].discard(card)
+        keep = ~_field_cards_to_mask(state.field_cards)
+        self.possible = [mask & keep for mask in self.possible]
+        self._summary = None
+
+    def _apply_hand(self, state):
+        """自分の手札を確定（自分は手札だけ、相手は手札以外）"""
+        my_hand = _cards_to_mask(state.players_cards[self.my_player_num])
+        for p in range(self.players_num):
+            if p == self.my_player_num:
+                self.possible[p] &= my_hand
+            else:
+                self.possible[p] &= ~my_hand
+        self._summary = None
 
     def observe_action(self, state, player, action, is_pass):
         """行動観測で可能性を更新"""
@@ -230,18 +429,32 @@ class CardTracker:
 
         if is_pass:
             self.pass_counts[player] += 1
-            # パス時、出せるカードを持っていないと推論
-            legal = state.legal_actions()
-            for c in legal:
-                self.possible[player].discard(c)
+            # パス時、出せるカードを持っていないと推論（合法手はテーブル引きのマスクで取得）
+            self.possible[player] &= ~state.legal_mask()
         elif action is not None:
             # カードを出したら全員が持っていない
-            for p in range(self.players_num):
-                self.possible[p].discard(action)
+            keep = ~(1 << action.id)
+            self.possible = [mask & keep for mask in self.possible]
+        self._summary = None
 
     def mark_out(self, player):
         self.out_player.add(player)
-        self.possible[player].clear()
+        self.possible[player] = 0
+        self._summary = None
+
+    def holds(self, player, card_id):
+        """プレイヤーがそのカードを持ちうるか"""
+        return bool(self.possible[player] >> card_id & 1)
+
+    def count(self, player, mask):
+        """マスクのうちプレイヤーが持ちうるカードの枚数"""
+        return (self.possible[player] & mask).bit_count()
+
+    def summary(self):
+        """評価関数で共有する集計（推論が変わるまでキャッシュ）"""
+        if self._summary is None:
+            self._summary = TrackerSummary(self.possible)
+        return self._summary
 
     def get_player_weight(self, player):
         """パス回数に基づく重み（0.5～1.0）"""
@@ -249,10 +462,298 @@ class CardTracker:
         return max(0.5, weight)
 
 
+class TrackerSummary:
+    """CardTracker.possible のプレイヤー別集計
+
+    - total[p]: 持ちうる枚数
+    - suit_counts[p][s] / low_counts[p][s] / high_counts[p][s]: スート全体 / A〜6側 / 8〜K側で持ちうる枚数
+    - follow[p]: 「7から外側に次のカードを p が持ちうる」カードのマスク（follow[p] >> card_id & 1 で引く）
+    """
+    __slots__ = ('total', 'suit_counts', 'low_counts', 'high_counts', 'follow')
+
+    def __init__(self, possible):
+        self.total = [mask.bit_count() for mask in possible]
+        self.low_counts = [_suit_counts(mask & _LOW_SIDE_MASK) if mask else [0] * 4 for mask in possible]
+        self.high_counts = [_suit_counts(mask & _HIGH_SIDE_MASK) if mask else [0] * 4 for mask in possible]
+        # 7は必ず場にあるので、スート全体 = A〜6側 + 8〜K側
+        self.suit_counts = [[low + high for low, high in zip(lows, highs)]
+                            for lows, highs in zip(self.low_counts, self.high_counts)]
+        self.follow = [(mask << 1 & _CHAIN_SMALL_BITS) | (mask >> 1 & _CHAIN_LARGE_BITS) for mask in possible]
+
+
+class IncrementalTracker:
+    """AIインスタンスに紐づけて手番をまたいで使う CardTracker
+
+    - 前回の sync() から増えた履歴だけを再生する（カーソル = 読み終えた履歴の長さ）
+    - 読み終えた部分が今の履歴の先頭と一致しなければ（新しいゲーム・別の局面）最初から作り直す
+    - sync() は今回新しく読んだ履歴を返すので、OpponentModel も同じカーソルで1手1回だけ観測できる
+    - events[i] は履歴 i 手目の (player, カードID（パスは-1）, パス時の合法手マスク, バーストで場に出たカードのマスク)。
+      ParticleBelief はこれを自分のカーソルで読む（作り直すと rebuilds が増える）
+    """
+
+    def __init__(self, my_player_num):
+        self.my_player_num = my_player_num
+        self.reset()
+
+    def reset(self):
+        self.tracker = None
+        self.replay_state = None
+        self.codes = array('H')  # 読み終えた履歴（エンコード済み）
+        self.events = []
+        self.played = 0  # 履歴で出されたカードのマスク
+        self.rebuilds = 0
+
+    @property
+    def position(self):
+        return len(self.codes)
+
+    def _diverged(self, state, codes):
+        if self.tracker is None or self.tracker.players_num != state.players_num:
+            return True
+        position = len(self.codes)
+        return len(codes) < position or codes[:position] != self.codes
+
+    def _rebuild(self, state):
+        self.tracker = CardTracker(state, self.my_player_num)
+        # 盤面のみ再現する軽量 state（BitState: put_card はビット演算、legal_mask は表引き）
+        self.replay_state = BitState(
+            players_num=state.players_num,
+            field=0,
+            hands=[0] * state.players_num,
+            turn_player=None,
+            pass_count=[0] * state.players_num,
+            out_player=[],
+            history=[],
+            zobrist=0,
+        )
+        self.codes = array('H')
+        self.events = []
+        self.played = 0
+        self.rebuilds += 1
+
+    def sync(self, state):
+        """state.history のうち未読の部分を再生し、新しく読んだ (player, card, pass_flag) のリストを返す"""
+        codes = HistoryLog.of(state.history).codes()
+        if self._diverged(state, codes):
+            self._rebuild(state)
+        tracker = self.tracker
+        replay_state = self.replay_state
+        new_entries = [HistoryLog._decode(c) for c in codes[len(self.codes):]]
+
+        # 今の場と自分の手札を反映（どちらも単調に減るだけなので、毎回かけ直しても結果は全再生と同じ）
+        tracker._apply_field(state)
+        tracker._apply_hand(state)
+        for p in state.out_player:
+            if p not in tracker.out_player:
+                tracker.mark_out(p)
+
+        if replay_state.turn_player is None and new_entries:
+            # start player を履歴から復元（ダイヤ7を出したプレイヤー）
+            replay_state.turn_player = 0
+            for (p0, a0, pf0) in new_entries:
+                if pf0 == 0 and a0 is DIAMOND_SEVEN:
+                    replay_state.turn_player = p0
+                    break
+
+        # バーストで場に出た手札は履歴に残らないので、「今の場にあって履歴で出されていないカード」として復元する
+        # （バーストが1人までなら正確。3人戦ではバーストが2人出た時点で終局する）
+        for (p, a, pf) in new_entries:
+            if pf == 0 and a is not None:
+                self.played |= 1 << a.id
+        burst_cards = _field_cards_to_mask(state.field_cards) & ~self.played
+
+        events = self.events
+        for (p, a, pf) in new_entries:
+            # 1) その手番直前の盤面で観測（legal_actionsが正しい）
+            tracker.observe_action(replay_state, p, a, is_pass=(pf == 1 or a is None))
+
+            # 2) 行動を replay_state に適用（盤面/パス/アウト）
+            if pf == 1 or a is None:
+                legal = 0 if p in replay_state.out_player else replay_state.legal_mask()
+                burst = 0
+                replay_state.pass_count[p] += 1
+                if replay_state.pass_count[p] > 3 and p not in replay_state.out_player:
+                    replay_state.out_player.append(p)
+                    burst = burst_cards & ~replay_state.field
+                    replay_state.field |= burst_cards
+                    tracker.mark_out(p)
+                events.append((p, -1, legal, burst))
+            else:
+                replay_state.put_card(a)
+                events.append((p, a.id, 0, 0))
+
+            # 3) 次手番へ（out_player をスキップ）
+            original = replay_state.turn_player
+            for i in range(1, replay_state.players_num + 1):
+                np_ = (original + i) % replay_state.players_num
+                if np_ not in replay_state.out_player:
+                    replay_state.turn_player = np_
+                    break
+
+        self.codes.extend(codes[len(self.codes):])
+        return new_entries
+
+
+# --- 行動履歴 ---
+# 1手 = 16bit整数: プレイヤー番号 << 7 | カードID（なし=63） << 1 | パスフラグ
+
+_HISTORY_NO_CARD = 63
+
+
+class _HistoryBuffer:
+    """HistoryLog が共有する実体（shared=True になった後は末尾を書き換えない）"""
+    __slots__ = ('codes', 'shared')
+
+    def __init__(self, codes):
+        self.codes = codes
+        self.shared = False
+
+
+class HistoryLog:
+    """追記専用の行動履歴（(player, card, pass_flag) のシーケンスとして読める）
+
+    - 整数エンコードした array('H') に記録し、fork() は実体を参照共有して長さだけ持つ（O(1)）
+    - 共有中の実体に別の分岐が追記済みのときだけ、自分の長さまでをコピーして分離する（copy-on-write）
+    - pop() は取り消し（BitState.undo）用
+    """
+    __slots__ = ('_buf', '_length')
+
+    def __init__(self, entries=()):
+        self._buf = _HistoryBuffer(array('H', (self._encode(e) for e in entries)))
+        self._length = len(self._buf.codes)
+
+    @staticmethod
+    def _encode(entry):
+        player, action, pass_flag = entry
+        card_id = getattr(action, 'id', _HISTORY_NO_CARD)
+        return player << 7 | card_id << 1 | (1 if pass_flag else 0)
+
+    @staticmethod
+    def _decode(code):
+        card_id = code >> 1 & 0x3F
+        return (code >> 7, None if card_id == _HISTORY_NO_CARD else CARDS[card_id], code & 1)
+
+    @classmethod
+    def of(cls, history):
+        """既存の履歴（HistoryLog / タプルのリスト / None）から共有コピーを作る"""
+        if isinstance(history, HistoryLog):
+            return history.fork()
+        return cls(history or ())
+
+    def fork(self):
+        """同じ実体を共有するコピー（O(1)）"""
+        self._buf.shared = True
+        forked = HistoryLog.__new__(HistoryLog)
+        forked._buf = self._buf
+        forked._length = self._length
+        return forked
+
+    def append(self, entry):
+        buf = self._buf
+        codes = buf.codes
+        if len(codes) != self._length:
+            if buf.shared:
+                # 他の分岐が追記済み → 自分の長さまでをコピーして分離
+                buf = self._buf = _HistoryBuffer(codes[:self._length])
+                codes = buf.codes
+            else:
+                del codes[self._length:]
+        codes.append(self._encode(entry))
+        self._length += 1
+
+    def pop(self):
+        self._length -= 1
+        codes = self._buf.codes
+        entry = self._decode(codes[self._length])
+        if not self._buf.shared:
+            del codes[self._length:]
+        return entry
+
+    def codes(self):
+        """エンコード済みの整数列（読み取り専用として扱う）"""
+        return self._buf.codes[:self._length]
+
+    def __len__(self):
+        return self._length
+
+    def __iter__(self):
+        codes = self._buf.codes
+        decode = self._decode
+        for i in range(self._length):
+            yield decode(codes[i])
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._decode(c) for c in self._buf.codes[:self._length][index]]
+        if index < 0:
+            index += self._length
+        if not 0 <= index < self._length:
+            raise IndexError('history index out of range')
+        return self._decode(self._buf.codes[index])
+
+    def __eq__(self, other):
+        return list(self) == list(other)
+
+    def __repr__(self):
+        return f"HistoryLog({list(self)!r})"
+
+
+# --- 局面のZobristハッシュ ---
+# 場・各手札・手番・パス回数・脱落者の要素ごとに64bit乱数を割り当て、局面のキーをそれらのXORにする。
+# State / BitState は手ごとに差分更新した zobrist を持つ（置換表・評価のメモ化・同一局面の検出用）。
+# 乱数は固定シードなので、プロセスをまたいでも同じ局面は同じキーになる。
+
+ZOBRIST_MAX_PLAYERS = 8
+_ZOBRIST_RNG = random.Random(0x7A0B)
+_ZOBRIST_FIELD = tuple(_ZOBRIST_RNG.getrandbits(64) for _ in range(52))
+_ZOBRIST_HAND = tuple(tuple(_ZOBRIST_RNG.getrandbits(64) for _ in range(52)) for _ in range(ZOBRIST_MAX_PLAYERS))
+_ZOBRIST_PASS = tuple(tuple(_ZOBRIST_RNG.getrandbits(64) for _ in range(5)) for _ in range(ZOBRIST_MAX_PLAYERS))
+_ZOBRIST_TURN = tuple(_ZOBRIST_RNG.getrandbits(64) for _ in range(ZOBRIST_MAX_PLAYERS))
+_ZOBRIST_OUT = tuple(_ZOBRIST_RNG.getrandbits(64) for _ in range(ZOBRIST_MAX_PLAYERS))
+
+
+def _zobrist_byte_tables(values):
+    """カードごとの値から、52bitマスクの各バイト（7個）の256通りに対するXORの表を作る"""
+    tables = []
+    for b in range(7):
+        table = [0] * 256
+        for v in range(1, 256):
+            low = v & -v
+            card_id = b * 8 + low.bit_length() - 1
+            table[v] = table[v ^ low] ^ (values[card_id] if card_id < 52 else 0)
+        tables.append(tuple(table))
+    return tuple(tables)
+
+
+_ZOBRIST_FIELD_BYTES = _zobrist_byte_tables(_ZOBRIST_FIELD)
+_ZOBRIST_HAND_BYTES = tuple(_zobrist_byte_tables(values) for values in _ZOBRIST_HAND)
+
+
+def _zobrist_cards(byte_tables, mask):
+    """mask のカードに対応する値のXOR（バイトごとの表引き7回）"""
+    t0, t1, t2, t3, t4, t5, t6 = byte_tables
+    return (t0[mask & 255] ^ t1[mask >> 8 & 255] ^ t2[mask >> 16 & 255] ^ t3[mask >> 24 & 255]
+            ^ t4[mask >> 32 & 255] ^ t5[mask >> 40 & 255] ^ t6[mask >> 48 & 255])
+
+
+def zobrist_key(field, hands, turn_player, pass_count, out_player):
+    """局面のZobristキーを最初から計算する（field / hands は52bitマスク、out_player は脱落者の並び）"""
+    key = _zobrist_cards(_ZOBRIST_FIELD_BYTES, field) ^ _ZOBRIST_TURN[turn_player]
+    for p, hand in enumerate(hands):
+        key ^= _zobrist_cards(_ZOBRIST_HAND_BYTES[p], hand) ^ _ZOBRIST_PASS[p][pass_count[p]]
+    for p in out_player:
+        key ^= _ZOBRIST_OUT[p]
+    return key
+
+
 # --- ゲームエンジン ---
 
 class State:
-    def __init__(self, players_num=3, field_cards=None, players_cards=None, turn_player=None, pass_count=None, out_player=None, history=None):
+    def __init__(self, players_num=3, field_cards=None, players_cards=None, turn_player=None, pass_count=None, out_player=None, history=None, record_history=True, zobrist=None):
+        # record_history=False のとき next() は履歴を記録しない（使い捨てのロールアウト用）
+        self.record_history = record_history
+        # 局面のZobristキー（put_card / next で差分更新。手札などを直接書き換えたら refresh_zobrist() を呼ぶ）
+        self.zobrist = 0
         if players_cards is None:
             # 初期化は関数にまとめて、replayでも再利用できるようにする
             self.players_num = players_num
@@ -264,7 +765,8 @@ class State:
             self.turn_player = turn_player
             self.pass_count = pass_count
             self.out_player = out_player
-            self.history = history if history is not None else []
+            self.history = history if isinstance(history, HistoryLog) else HistoryLog.of(history)
+        self.zobrist = zobrist if zobrist is not None else self.compute_zobrist()
 
     def _init_deal_and_open_sevens(self):
         deck = Deck()
@@ -272,7 +774,7 @@ class State:
         self.field_cards = np.zeros((4, 13), dtype='int64')
         self.pass_count = [0] * self.players_num
         self.out_player = []
-        self.history = []  # (player, action, pass_flag)
+        self.history = HistoryLog()  # (player, action, pass_flag)
 
         # 手札にある7を自動的に場に出す処理（履歴にも残す）
         start_flags = [0] * self.players_num
@@ -291,7 +793,8 @@ class State:
         new_field_cards = self.field_cards.copy()
         new_pass_count = list(self.pass_count)
         new_out_player = list(self.out_player)
-        new_history = list(self.history)
+        # 履歴は実体を共有してO(1)でコピー
+        new_history = HistoryLog.of(self.history)
 
         return State(
             players_num=self.players_num,
@@ -301,22 +804,40 @@ class State:
             pass_count=new_pass_count,
             out_player=new_out_player,
             history=new_history,
+            record_history=self.record_history,
+            zobrist=self.zobrist,
         )
 
+    def compute_zobrist(self):
+        """Zobristキーを最初から計算する"""
+        return zobrist_key(_field_cards_to_mask(self.field_cards), [_cards_to_mask(h) for h in self.players_cards],
+                           self.turn_player, self.pass_count, self.out_player)
+
+    def refresh_zobrist(self):
+        """手札などを直接書き換えた後に、Zobristキーを計算し直す"""
+        self.zobrist = self.compute_zobrist()
+
+    def _check_zobrist(self):
+        """ZOBRIST_DEBUG: 差分更新したキーが全再計算と一致するか確かめる"""
+        expected = self.compute_zobrist()
+        if self.zobrist != expected:
+            raise AssertionError(f"Zobristキーが一致しません: {self.zobrist:#x} != {expected:#x}")
+
     def choice_seven(self, hand, player=None, record_history=False):
         """手札の7を場に出す。ダイヤの7があれば1を返す。
 
         record_history=True のとき、出した7を history に (player, card, 0) で記録する。
         """
         is_start_player = 0
-        sevens = [Card(suit, Number.SEVEN) for suit in Suit]
 
-        if hand.check(Card(Suit.DIAMOND, Number.SEVEN)):
+        if hand.check(DIAMOND_SEVEN):
             is_start_player = 1
 
-        for card in sevens:
+        for card in SEVEN_CARDS:
             if hand.check(card):
                 hand.choice(card)
+                if player is not None:
+                    self.zobrist ^= _ZOBRIST_HAND[player][card.id]
                 self.put_card(card)
                 if record_history and player is not None:
                     # 初期配置は「パスではない」扱い
@@ -356,7 +877,7 @@ class State:
         # start player は history のうちダイヤ7を出したプレイヤーが原則
         start_player = None
         for (p, a, pf) in ended_state.history:
-            if pf == 0 and isinstance(a, Card) and a == Card(Suit.DIAMOND, Number.SEVEN):
+            if pf == 0 and a is DIAMOND_SEVEN:
                 start_player = p
                 break
         s.turn_player = start_player if start_player is not None else 0
@@ -391,12 +912,10 @@ class State:
 
     def put_card(self, card):
         """場にカードを置く（記録する）"""
-        suit_index = 0
-        for i, s in enumerate(Suit):
-            if card.suit == s:
-                suit_index = i
-                break
-        self.field_cards[suit_index][card.number.val - 1] = 1
+        row = self.field_cards[card.suit_index]
+        if not row[card.number_index]:
+            row[card.number_index] = 1
+            self.zobrist ^= _ZOBRIST_FIELD[card.id]
 
     def legal_actions(self):
         """場で出せるカードのリストを返す (トンネルルール対応)。
@@ -406,44 +925,28 @@ class State:
         - カードがAまで出た場合 → そのスートはKからしか出せない（トンネル発動）
         - Kが出た時 → そのスートはAからしか出せない（トンネル発動）
         - AとKの両方が出ている → 両側から伸ばせる（列完成に向かう）
+
+        各スートの13bitパターンから SUIT_LEGAL_INDEXES を引くだけで求める（スートごとに小さい側→大きい側の順）。
         """
         actions = []
-        for suit, n in zip(Suit, range(4)):
-            # Aが出ている (index 0) / Kが出ている (index 12)
-            is_ace_out = self.field_cards[n][0] == 1
-            is_king_out = self.field_cards[n][12] == 1
-
-            # --- 7より小さい側 (A-6) ---
-            # 条件: Kが出ている OR (AもKも出ていない = 初期状態)
-            if is_king_out or (not is_ace_out and not is_king_out):
-                small_side = self.field_cards[n][0:6]  # A..6
-                if small_side[5] == 0:
-                    actions.append(Card(suit, Number.SIX))
-                else:
-                    for i in range(5, -1, -1):
-                        if small_side[i] == 0:
-                            actions.append(Card(suit, self.num_to_Enum(i + 1)))
-                            break
-
-            # --- 7より大きい側 (8-K) ---
-            # 条件: Aが出ている OR (AもKも出ていない = 初期状態)
-            if is_ace_out or (not is_ace_out and not is_king_out):
-                if self.field_cards[n][7] == 0:
-                    actions.append(Card(suit, Number.EIGHT))
-                else:
-                    for i in range(7, 13):
-                        if self.field_cards[n][i] == 0:
-                            actions.append(Card(suit, self.num_to_Enum(i + 1)))
-                            break
+        for n, suit_field in enumerate(self.suit_masks()):
+            base = n * 13
+            for i in SUIT_LEGAL_INDEXES[suit_field]:
+                actions.append(CARDS[base + i])
+        return actions
 
-        return list(set(actions))  # 重複排除
+    def suit_masks(self):
+        """各スートの場の13bitパターン（4要素のリスト）"""
+        return self.field_cards.dot(_SUIT_BIT_WEIGHTS).tolist()
+
+    def legal_mask(self):
+        """場で出せるカードの52bitマスク"""
+        masks = self.suit_masks()
+        return (SUIT_LEGAL_BITS[masks[0]] | SUIT_LEGAL_BITS[masks[1]] << 13
+                | SUIT_LEGAL_BITS[masks[2]] << 26 | SUIT_LEGAL_BITS[masks[3]] << 39)
 
     def num_to_Enum(self, num):
-        enum_list = [Number.ACE, Number.TWO, Number.THREE, Number.FOUR,
-                   Number.FIVE, Number.SIX, Number.SEVEN, Number.EIGHT,
-                   Number.NINE, Number.TEN, Number.JACK, Number.QUEEN,
-                   Number.KING]
-        return enum_list[num - 1]
+        return NUMBER_BY_INDEX[num - 1]
 
     def my_actions(self):
         """現在のプレイヤーが出せるカード一覧"""
@@ -459,6 +962,10 @@ class State:
     def my_hands(self):
         return self.players_cards[self.turn_player]
 
+    def hand_count(self, player):
+        """プレイヤーの残り手札枚数"""
+        return len(self.players_cards[player])
+
     def is_done(self):
         """ゲーム終了判定: 勝者（手札0）が出たか、または残り1人になったら終了"""
         # 手札がなくなったプレイヤーがいれば終了
@@ -476,28 +983,35 @@ class State:
         p_idx = self.turn_player
 
         # 行動ログ
-        self.history.append((p_idx, action, 1 if (pass_flag == 1 or action is None) else 0))
+        if self.record_history:
+            self.history.append((p_idx, action, 1 if (pass_flag == 1 or action is None) else 0))
 
         if pass_flag == 1 or action is None:
             # パス処理
+            pass_keys = _ZOBRIST_PASS[p_idx]
+            self.zobrist ^= pass_keys[self.pass_count[p_idx]] ^ pass_keys[self.pass_count[p_idx] + 1]
             self.pass_count[p_idx] += 1
             if self.pass_count[p_idx] > 3:
                 # バースト処理
                 # 手札をすべて場に出す
                 hand = self.players_cards[p_idx]
+                hand_keys = _ZOBRIST_HAND[p_idx]
                 for card in list(hand):
                     try:
+                        self.zobrist ^= hand_keys[card.id]
                         self.put_card(card)
                     except:
                          pass # 既に出ているなどのエラーは無視
                 hand.clear() # 手札消滅
                 self.out_player.append(p_idx)
+                self.zobrist ^= _ZOBRIST_OUT[p_idx]
                 # print(f"Player {p_idx} BURST!")
         else:
             # カードを出す
             if action:
                 try:
                     self.players_cards[p_idx].choice(action) # 手札から削除
+                    self.zobrist ^= _ZOBRIST_HAND[p_idx][action.id]
                     self.put_card(action) # 場に出す
                 except ValueError:
                     pass
@@ -506,10 +1020,14 @@ class State:
         # 勝利判定チェック（手札が0になったら）
         if len(self.players_cards[p_idx]) == 0 and p_idx not in self.out_player:
              # ここではターンを渡さずに終了状態にする（is_doneで判定させるため）
+             if ZOBRIST_DEBUG:
+                 self._check_zobrist()
              return self
              
         # 次のプレイヤーへ
         self.next_player()
+        if ZOBRIST_DEBUG:
+            self._check_zobrist()
         return self
 
     def next_player(self):
@@ -519,134 +1037,1819 @@ class State:
             next_p = (original + i) % self.players_num
             # バーストしたプレイヤーや上がったプレイヤー（out_player）はスキップ
             if next_p not in self.out_player:
+                self.zobrist ^= _ZOBRIST_TURN[original] ^ _ZOBRIST_TURN[next_p]
                 self.turn_player = next_p
                 return
         # ここに来るのは全員アウトの場合のみ
 
 
-# --- 最強AI実装 (Hybrid: Rule-Based + PIMC + Inference) ---
+# --- ビットボードエンジン ---
+# カードID = スート番号 * 13 + (数字 - 1)（0〜51）
+# 場と各手札を52bit整数で持ち、合法手生成をビット演算で行う高速版エンジン
 
-class OpponentModel:
-    """strategy.md の相手タイプ推定（強化版 + 永続的記憶）。
-    
-    各プレイヤーの行動パターンを分析し、戦略モードを判定する。
-    - Aggressive（トンネル活用型）: A/Kなどの端を積極的に出す
-    - Blocker（遅延・ハメ型）: パスを多用、中央付近を止める
-    
-    永続的記憶：試合をまたいでプレイヤーの傾向を記憶する
+def _mask_to_cards(mask):
+    """ビットマスクをカードID昇順のCardリストに変換"""
+    cards = []
+    while mask:
+        low = mask & -mask
+        cards.append(CARDS[low.bit_length() - 1])
+        mask ^= low
+    return cards
+
+
+def _field_cards_to_mask(field_cards):
+    """4×13のNumPy配列（場）を52bitマスクに変換"""
+    field = 0
+    for idx in np.flatnonzero(field_cards):
+        field |= 1 << int(idx)
+    return field
+
+
+def _cards_to_mask(cards):
+    """Cardの列をビットマスクに変換"""
+    mask = 0
+    for card in cards:
+        mask |= 1 << card.id
+    return mask
+
+
+class BitState:
+    """ビットボード版のゲームエンジン（Stateと同じ next / legal_actions / my_actions / is_done / clone API）
+
+    - field: 場に出たカードの52bitマスク
+    - hands[p]: プレイヤーpの手札の52bitマスク
+    - 合法手・手札はカードID昇順で返す（State.legal_actionsの生成順と一致）
+    - next() は取り消し情報を積み、undo() / undo_to() で元の状態に戻せる（clone不要の探索用）
+    - zobrist: 局面のZobristキー（State と同じ値。next / undo / put_card / set_hand で差分更新）
     """
-    
-    # クラス変数（永続的記憶） - 試合をまたいで保持される
-    _persistent_opponent_data = {}  # プレイヤーIDごとの統計データ
-    _game_count = 0  # 総試合数
-    
-    # 定数
-    MOVING_AVERAGE_ALPHA = 0.3  # 移動平均の係数（新しい情報の重み）
-    PASS_RATE_THRESHOLD = 0.2  # パス率の閾値（これを超えるとburst_force）
-    ACE_KING_RATE_THRESHOLD = 0.3  # A/K即出し率の閾値（これを超えるとtunnel_lock）
 
-    def __init__(self, players_num):
+    def __init__(self, players_num=3, field=0, hands=None, turn_player=None, pass_count=None, out_player=None, history=None, record_history=True, zobrist=None):
         self.players_num = players_num
-        # 各プレイヤーの特徴フラグ（このゲーム内のみ）
-        self.flags = {p: {
-            "aggressive": 0,
-            "blocker": 0,
-            "tunnel_usage": 0,  # トンネルを開けた回数
-            "pass_count": 0,     # パス回数
-            "end_cards": 0,      # 端カード（A/K）を出した回数
-            "middle_cards": 0,   # 中央カード（6/8）を出した回数
-            "total_actions": 0,  # 総行動回数（パス以外）
-        } for p in range(players_num)}
-        
-        # ゲーム進行度（ターン数）
-        self.turn_count = 0
-        
-        # 永続データの初期化（まだない場合）
-        for p in range(players_num):
-            if p not in OpponentModel._persistent_opponent_data:
-                OpponentModel._persistent_opponent_data[p] = {
-                    'pass_rate': 0.0,  # パス使用率（移動平均）
-                    'ace_king_immediate_rate': 0.0,  # A/K即出し率（移動平均）
-                    'tunnel_usage_rate': 0.0,  # トンネル使用率（移動平均）
-                    'game_count': 0,  # このプレイヤーとの対戦回数
-                }
+        # record_history=False のとき next() は履歴を記録しない（途中で切り替えないこと: undo と対応しなくなる）
+        self.record_history = record_history
+        # 取り消しスタック: (手番プレイヤー, 直前の場, 直前の手札, 種別 0=カード/1=パス/2=バースト, 直前のキー)
+        self._undo = []
+        self.zobrist = 0
+        if hands is None:
+            self._init_deal_and_open_sevens()
+        else:
+            self.field = field
+            self.hands = hands
+            self.turn_player = turn_player
+            self.pass_count = pass_count
+            self.out_player = out_player
+            self.history = history if isinstance(history, HistoryLog) else HistoryLog.of(history)
+        self.zobrist = zobrist if zobrist is not None else self.compute_zobrist()
 
-    def observe(self, state, player, action, pass_flag):
-        """行動観測で相手タイプを更新"""
-        self.turn_count += 1
-        
-        if pass_flag == 1:
-            self.flags[player]["pass_count"] += 1
-            self.flags[player]["blocker"] += 1
-            return
+    def _init_deal_and_open_sevens(self):
+        # Stateと同じ乱数消費で配る（同じシードなら同じ初期配置になる）
+        deck = Deck()
+        self.hands = [_cards_to_mask(h) for h in deck.deal(self.players_num)]
+        self.field = 0
+        self.pass_count = [0] * self.players_num
+        self.out_player = []
+        self.history = HistoryLog()
 
-        if action is None or isinstance(action, list):
-            return
+        start_flags = [0] * self.players_num
+        for p in range(self.players_num):
+            start_flags[p] = self.choice_seven(p, record_history=True)
 
-        # 行動をカウント
-        self.flags[player]["total_actions"] += 1
+        if 1 in start_flags:
+            self.turn_player = start_flags.index(1)
+        else:
+            self.turn_player = 0
 
-        # A/K を出した → aggressive, トンネル活用
-        if action.number in (Number.ACE, Number.KING):
-            self.flags[player]["aggressive"] += 2
-            self.flags[player]["end_cards"] += 1
-            
-            # トンネルを開ける行動かチェック
-            suit_idx = list(Suit).index(action.suit)
-            if action.number == Number.ACE:
-                # Aを出した → K側のトンネルを開ける
-                if state.field_cards[suit_idx][12] == 0:  # Kがまだ出ていない
-                    self.flags[player]["tunnel_usage"] += 1
-            elif action.number == Number.KING:
-                # Kを出した → A側のトンネルを開ける
-                if state.field_cards[suit_idx][0] == 0:  # Aがまだ出ていない
-                    self.flags[player]["tunnel_usage"] += 1
+    @classmethod
+    def from_state(cls, state):
+        """StateからBitStateを作成"""
+        return cls(
+            players_num=state.players_num,
+            field=_field_cards_to_mask(state.field_cards),
+            hands=[_cards_to_mask(h) for h in state.players_cards],
+            turn_player=state.turn_player,
+            pass_count=list(state.pass_count),
+            out_player=list(state.out_player),
+            history=HistoryLog.of(state.history),
+        )
 
-        # 中央(6/8)を出した → 両方向に展開、やや blocker
-        if action.number in (Number.SIX, Number.EIGHT):
-            self.flags[player]["middle_cards"] += 1
-            self.flags[player]["blocker"] += 0.5
+    def load(self, state):
+        """State / BitState の内容をこのインスタンスに読み込む（リストを使い回してプールから再利用する）"""
+        self.players_num = state.players_num
+        if isinstance(state, BitState):
+            self.field = state.field
+            self.hands[:] = state.hands
+        else:
+            self.field = _field_cards_to_mask(state.field_cards)
+            self.hands[:] = [_cards_to_mask(h) for h in state.players_cards]
+        self.turn_player = state.turn_player
+        self.pass_count[:] = state.pass_count
+        self.out_player[:] = state.out_player
+        self.history = HistoryLog.of(state.history)
+        self._undo.clear()
+        self.refresh_zobrist()
+        return self
 
-        # J/Qあたりを出した → blocker 傾向
-        if action.number in (Number.JACK, Number.QUEEN):
-            self.flags[player]["blocker"] += 1
-    
-    def update_persistent_stats(self, player):
-        """ゲーム終了時に永続データを更新（移動平均）"""
-        flags = self.flags[player]
-        persistent = OpponentModel._persistent_opponent_data[player]
-        
-        # 総行動数（パス + 実際の行動）
-        total_turns = flags["pass_count"] + flags["total_actions"]
-        if total_turns == 0:
-            return
-        
-        # 今回のゲームでの統計
-        current_pass_rate = flags["pass_count"] / total_turns
-        safe_total_actions = max(1, flags["total_actions"])
-        current_ace_king_rate = flags["end_cards"] / safe_total_actions
-        current_tunnel_rate = flags["tunnel_usage"] / safe_total_actions
-        
-        # 移動平均で更新
-        alpha = OpponentModel.MOVING_AVERAGE_ALPHA
-        persistent['pass_rate'] = (1 - alpha) * persistent['pass_rate'] + alpha * current_pass_rate
-        persistent['ace_king_immediate_rate'] = (1 - alpha) * persistent['ace_king_immediate_rate'] + alpha * current_ace_king_rate
-        persistent['tunnel_usage_rate'] = (1 - alpha) * persistent['tunnel_usage_rate'] + alpha * current_tunnel_rate
-        persistent['game_count'] += 1
-    
-    def get_persistent_stats(self, player):
-        """プレイヤーの永続統計を取得"""
-        if player in OpponentModel._persistent_opponent_data:
-            return OpponentModel._persistent_opponent_data[player]
-        return None
+    def to_state(self):
+        """BitStateをStateに変換（手札はカードID順）"""
+        return State(
+            players_num=self.players_num,
+            field_cards=self.field_cards,
+            players_cards=self.players_cards,
+            turn_player=self.turn_player,
+            pass_count=list(self.pass_count),
+            out_player=list(self.out_player),
+            history=HistoryLog.of(self.history),
+        )
 
-    def mode(self, player):
-        """プレイヤーの戦略モードを判定
-        
-        Returns:
-            - "tunnel_lock": トンネル活用型（A/Kを積極的に使う）→ トンネルロックで対抗
-            - "burst_force": パス多用型（詰まりやすい）→ バースト誘導で対抗
-            - "neutral": 中立型
+    def clone(self):
+        return BitState(
+            players_num=self.players_num,
+            field=self.field,
+            hands=list(self.hands),
+            turn_player=self.turn_player,
+            pass_count=list(self.pass_count),
+            out_player=list(self.out_player),
+            history=HistoryLog.of(self.history),
+            record_history=self.record_history,
+            zobrist=self.zobrist,
+        )
+
+    def compute_zobrist(self):
+        """Zobristキーを最初から計算する"""
+        return zobrist_key(self.field, self.hands, self.turn_player, self.pass_count, self.out_player)
+
+    def refresh_zobrist(self):
+        """場・パス回数などを直接書き換えた後に、Zobristキーを計算し直す"""
+        self.zobrist = self.compute_zobrist()
+
+    def _check_zobrist(self):
+        """ZOBRIST_DEBUG: 差分更新したキーが全再計算と一致するか確かめる"""
+        expected = self.compute_zobrist()
+        if self.zobrist != expected:
+            raise AssertionError(f"Zobristキーが一致しません: {self.zobrist:#x} != {expected:#x}")
+
+    def set_hand(self, player, hand):
+        """プレイヤーの手札を差し替える（確定化用。キーは差分更新）"""
+        hand_bytes = _ZOBRIST_HAND_BYTES[player]
+        self.zobrist ^= _zobrist_cards(hand_bytes, self.hands[player]) ^ _zobrist_cards(hand_bytes, hand)
+        self.hands[player] = hand
+
+    @property
+    def field_cards(self):
+        """互換用: 場を4×13のNumPy配列で返す（スナップショット）"""
+        field_cards = np.zeros((4, 13), dtype='int64')
+        mask = self.field
+        while mask:
+            low = mask & -mask
+            idx = low.bit_length() - 1
+            field_cards[idx // 13][idx % 13] = 1
+            mask ^= low
+        return field_cards
+
+    @property
+    def players_cards(self):
+        """互換用: 各手札をHandのリストで返す（スナップショット。変更しても状態には反映されない）"""
+        return [Hand(_mask_to_cards(h)) for h in self.hands]
+
+    def choice_seven(self, player, record_history=False):
+        """手札の7を場に出す。ダイヤの7があれば1を返す。"""
+        is_start_player = 0
+        hand = self.hands[player]
+        if hand >> (3 * 13 + 6) & 1:
+            is_start_player = 1
+
+        for s_idx in range(4):
+            card_id = s_idx * 13 + 6
+            bit = 1 << card_id
+            if hand & bit:
+                hand ^= bit
+                self.field |= bit
+                self.zobrist ^= _ZOBRIST_HAND[player][card_id] ^ _ZOBRIST_FIELD[card_id]
+                if record_history:
+                    self.history.append((player, CARDS[s_idx * 13 + 6], 0))
+        self.hands[player] = hand
+        return is_start_player
+
+    def put_card(self, card):
+        bit = 1 << card.id
+        if not self.field & bit:
+            self.field |= bit
+            self.zobrist ^= _ZOBRIST_FIELD[card.id]
+
+    def suit_masks(self):
+        """各スートの場の13bitパターン（4要素のリスト）"""
+        field = self.field
+        return [field & SUIT_BITS, field >> 13 & SUIT_BITS, field >> 26 & SUIT_BITS, field >> 39 & SUIT_BITS]
+
+    def legal_mask(self):
+        """場で出せるカードの52bitマスク"""
+        return legal_mask_from_field(self.field)
+
+    def legal_actions(self):
+        return _mask_to_cards(self.legal_mask())
+
+    def my_actions(self):
+        return _mask_to_cards(self.legal_mask() & self.hands[self.turn_player])
+
+    def my_hands(self):
+        return Hand(_mask_to_cards(self.hands[self.turn_player]))
+
+    def hand_count(self, player):
+        return self.hands[player].bit_count()
+
+    def is_done(self):
+        for i, hand in enumerate(self.hands):
+            if hand == 0 and i not in self.out_player:
+                return True
+        return self.players_num - len(self.out_player) <= 1
+
+    def winner(self):
+        """手札を使い切ったプレイヤー（いなければ-1）"""
+        for i, hand in enumerate(self.hands):
+            if hand == 0 and i not in self.out_player:
+                return i
+        return -1
+
+    def next(self, action, pass_flag=0):
+        if pass_flag == 1 or action is None:
+            return self.next_id(-1)
+        return self.next_id(action.id)
+
+    def next_id(self, card_id):
+        """カードIDで状態更新（-1はパス）。State.nextと同じ規則。取り消し情報を積む。"""
+        p_idx = self.turn_player
+        hands = self.hands
+        prev_field = self.field
+        prev_hand = hands[p_idx]
+        prev_key = self.zobrist
+        kind = 0
+
+        if card_id < 0:
+            kind = 1
+            if self.record_history:
+                self.history.append((p_idx, None, 1))
+            count = self.pass_count[p_idx]
+            self.pass_count[p_idx] = count + 1
+            self.zobrist ^= _ZOBRIST_PASS[p_idx][count] ^ _ZOBRIST_PASS[p_idx][count + 1]
+            if count + 1 > 3:
+                # バースト: 手札をすべて場に出して失格
+                kind = 2
+                dumped = prev_hand & ~prev_field
+                self.field = prev_field | prev_hand
+                hands[p_idx] = 0
+                self.out_player.append(p_idx)
+                self.zobrist ^= (_zobrist_cards(_ZOBRIST_HAND_BYTES[p_idx], prev_hand)
+                                 ^ _zobrist_cards(_ZOBRIST_FIELD_BYTES, dumped) ^ _ZOBRIST_OUT[p_idx])
+        else:
+            if self.record_history:
+                self.history.append((p_idx, CARDS[card_id], 0))
+            bit = 1 << card_id
+            if prev_hand & bit:
+                hands[p_idx] = prev_hand ^ bit
+                self.field = prev_field | bit
+                self.zobrist ^= _ZOBRIST_HAND[p_idx][card_id] ^ _ZOBRIST_FIELD[card_id]
+
+        self._undo.append((p_idx, prev_field, prev_hand, kind, prev_key))
+
+        # 勝利判定（手札が0になったらターンを渡さない）
+        if hands[p_idx] == 0 and p_idx not in self.out_player:
+            if ZOBRIST_DEBUG:
+                self._check_zobrist()
+            return self
+
+        self.next_player()
+        if ZOBRIST_DEBUG:
+            self._check_zobrist()
+        return self
+
+    def undo(self):
+        """直前の next() / next_id() を取り消す"""
+        p_idx, prev_field, prev_hand, kind, prev_key = self._undo.pop()
+        self.turn_player = p_idx
+        self.field = prev_field
+        self.hands[p_idx] = prev_hand
+        self.zobrist = prev_key
+        if kind:
+            self.pass_count[p_idx] -= 1
+            if kind == 2:
+                self.out_player.pop()
+        if self.record_history:
+            self.history.pop()
+        return self
+
+    def undo_depth(self):
+        """取り消し可能な手数（undo_to に渡す目印）"""
+        return len(self._undo)
+
+    def undo_to(self, depth):
+        """undo_depth() が depth になるまで取り消す"""
+        while len(self._undo) > depth:
+            self.undo()
+        return self
+
+    def next_player(self):
+        original = self.turn_player
+        for i in range(1, self.players_num + 1):
+            next_p = (original + i) % self.players_num
+            if next_p not in self.out_player:
+                self.zobrist ^= _ZOBRIST_TURN[original] ^ _ZOBRIST_TURN[next_p]
+                self.turn_player = next_p
+                return
+
+
+class BitStatePool:
+    """シミュレーション用BitStateのプール（探索ごとにインスタンスを作らず使い回す）
+
+    貸し出すBitStateは履歴を記録しない（record_history=False）。
+    """
+
+    def __init__(self):
+        self._free = []
+
+    def acquire(self, state):
+        """state の内容を読み込んだBitStateを貸し出す"""
+        if self._free:
+            return self._free.pop().load(state)
+        # キーは load() で計算するので、空の状態では計算しない
+        return BitState(players_num=state.players_num, hands=[], pass_count=[], out_player=[], record_history=False,
+                        zobrist=0).load(state)
+
+    def release(self, bit_state):
+        self._free.append(bit_state)
+
+
+# --- プレイアウト専用状態 ---
+
+# 「7から外側の次のカード」が1つ小さい番号 / 1つ大きい番号 のカード（シフトで次のカードへ写す）
+_CHAIN_SMALL_BITS = 0x3E * 0x8004002001  # 2〜6（次は1つ小さい番号）を4スート分
+_CHAIN_LARGE_BITS = 0xF80 * 0x8004002001  # 8〜Q（次は1つ大きい番号）を4スート分
+
+
+def _suit_counts(hand):
+    """手札マスクのスート別枚数（4要素のリスト）"""
+    return [(hand & SUIT_BITS).bit_count(), (hand >> 13 & SUIT_BITS).bit_count(),
+            (hand >> 26 & SUIT_BITS).bit_count(), (hand >> 39 & SUIT_BITS).bit_count()]
+
+
+_NEXT_SEAT_TABLES = {}
+
+
+def _next_seat_table(players_num):
+    """脱落者集合(bitマスク)ごとの次手番表 table[out_mask][player] を返す（人数ごとにキャッシュ）"""
+    table = _NEXT_SEAT_TABLES.get(players_num)
+    if table is None:
+        table = []
+        for out_mask in range(1 << players_num):
+            row = []
+            for p in range(players_num):
+                seat = p  # 全員脱落なら手番は動かない（State.next_player と同じ）
+                for i in range(1, players_num + 1):
+                    q = (p + i) % players_num
+                    if not out_mask >> q & 1:
+                        seat = q
+                        break
+                row.append(seat)
+            table.append(tuple(row))
+        table = tuple(table)
+        _NEXT_SEAT_TABLES[players_num] = table
+    return table
+
+
+class RolloutState:
+    """_playout 専用の軽量状態。
+
+    履歴・取り消し情報・例外処理を持たず、手札はビットマスク、手札枚数は差分更新、
+    手番は脱落者集合ごとの次手番表で決める。勝者は手札が尽きた手で確定するので、
+    終了判定はO(1)。規則と勝者は State / BitState と同じ。
+    """
+
+    __slots__ = ('players_num', 'field', 'hands', 'counts', 'pass_count', 'out_mask', 'alive', 'turn_player', 'winner', '_next_seat')
+
+    def __init__(self, players_num=3):
+        self.players_num = players_num
+        self.field = 0
+        self.hands = [0] * players_num
+        self.counts = [0] * players_num
+        self.pass_count = [0] * players_num
+        self.out_mask = 0
+        self.alive = players_num
+        self.turn_player = 0
+        self.winner = -1
+        self._next_seat = _next_seat_table(players_num)
+
+    def load(self, state):
+        """State / BitState の内容を読み込む（インスタンスを使い回すため self を返す）"""
+        n = state.players_num
+        if n != self.players_num:
+            self.__init__(n)
+        if isinstance(state, BitState):
+            self.field = state.field
+            self.hands[:] = state.hands
+        else:
+            self.field = _field_cards_to_mask(state.field_cards)
+            self.hands[:] = [_cards_to_mask(h) for h in state.players_cards]
+        self.counts[:] = [h.bit_count() for h in self.hands]
+        self.pass_count[:] = state.pass_count
+        out_mask = 0
+        for p in state.out_player:
+            out_mask |= 1 << p
+        self.out_mask = out_mask
+        self.alive = n - out_mask.bit_count()
+        self.turn_player = state.turn_player
+        self.winner = -1
+        for i, count in enumerate(self.counts):
+            if count == 0 and not out_mask >> i & 1:
+                self.winner = i
+                break
+        return self
+
+    def legal_mask(self):
+        return legal_mask_from_field(self.field)
+
+    def hand_count(self, player):
+        return self.counts[player]
+
+    def is_done(self):
+        return self.winner >= 0 or self.alive <= 1
+
+    def next(self, action, pass_flag=0):
+        if pass_flag == 1 or action is None:
+            return self.next_id(-1)
+        return self.next_id(action.id)
+
+    def next_id(self, card_id):
+        """カードIDで状態更新（-1はパス）"""
+        p_idx = self.turn_player
+        if card_id < 0:
+            pass_count = self.pass_count[p_idx] + 1
+            self.pass_count[p_idx] = pass_count
+            if pass_count > 3:
+                # バースト: 手札をすべて場に出して失格
+                self.field |= self.hands[p_idx]
+                self.hands[p_idx] = 0
+                self.counts[p_idx] = 0
+                self.out_mask |= 1 << p_idx
+                self.alive -= 1
+        else:
+            bit = 1 << card_id
+            hand = self.hands[p_idx]
+            if hand & bit:
+                self.hands[p_idx] = hand ^ bit
+                self.field |= bit
+                count = self.counts[p_idx] - 1
+                self.counts[p_idx] = count
+                if count == 0:
+                    # 上がり（手番は渡さない）
+                    self.winner = p_idx
+                    return self
+
+        self.turn_player = self._next_seat[self.out_mask][p_idx]
+        return self
+
+
+# --- 終盤ソルバー ---
+
+class EndgameSolver:
+    """手札の合計が少ない確定化局面を max-n 探索で解く（プレイアウトの代わり、endgame_cards）。
+
+    - 各プレイヤーは自分が上がれる手を選ぶ（効用は勝ち=1 / それ以外=0）。上がれる手が見つかった時点で
+      残りの手は読まない。どの手でも結果が同じなら、カードID昇順・パス最後の並びで最初の手を選ぶ
+    - 手はその場で出せるカードと、パス（出せるカードがないとき、またはパスが3回未満のとき）。
+      自分からバーストする手は読まない
+    - 局面（場・手札・パス回数・脱落者・手番）のZobristキー（zobrist_key と同じ）で置換表を引く。値は局面だけで決まるので
+      シミュレーション・手をまたいで使い回す。max_entries を超えたら古いものから捨てる
+    """
+
+    def __init__(self, my_player_num, max_entries=None):
+        self.my_player_num = my_player_num
+        self.max_entries = max_entries if max_entries is not None else ENDGAME_TABLE_SIZE
+        self.table = {}
+        # 探索したノード数と置換表のヒット数
+        self.nodes = 0
+        self.hits = 0
+        self._hands = None
+        self._passes = None
+        self._field = 0
+        self._next_seat = None
+
+    def solve(self, state):
+        """RolloutState を手番から最善で打ち切り、(勝者, 自分の残り枚数, 勝者の残り枚数) を返す（state は変更しない）"""
+        if state.winner >= 0 or state.alive <= 1:
+            return (state.winner, state.counts[self.my_player_num], 0)
+        self._hands = list(state.hands)
+        self._passes = list(state.pass_count)
+        self._field = state.field
+        self._next_seat = state._next_seat
+        out_player = [p for p in range(state.players_num) if state.out_mask >> p & 1]
+        key = zobrist_key(state.field, state.hands, state.turn_player, state.pass_count, out_player)
+        winner, my_remaining = self._search(state.turn_player, state.out_mask, state.alive, key)
+        return (winner, my_remaining, 0)
+
+    def _store(self, key, result):
+        table = self.table
+        if len(table) >= self.max_entries:
+            del table[next(iter(table))]
+        table[key] = result
+
+    def _search(self, turn, out_mask, alive, key):
+        """手番 turn の局面の (勝者, 自分の残り枚数)"""
+        result = self.table.get(key)
+        if result is not None:
+            self.hits += 1
+            return result
+        self.nodes += 1
+
+        me = self.my_player_num
+        hands = self._hands
+        field = self._field
+        hand = hands[turn]
+        seat = self._next_seat[out_mask][turn]
+        turn_key = key ^ _ZOBRIST_TURN[turn] ^ _ZOBRIST_TURN[seat]
+        hand_keys = _ZOBRIST_HAND[turn]
+
+        best = None
+        moves = legal_mask_from_field(field) & hand
+        can_pass = not moves or self._passes[turn] < 3
+        while moves:
+            low = moves & -moves
+            moves ^= low
+            if hand == low:
+                # 上がり
+                best = (turn, 0 if turn == me else hands[me].bit_count())
+                break
+            card_id = low.bit_length() - 1
+            hands[turn] = hand ^ low
+            self._field = field | low
+            result = self._search(seat, out_mask, alive, turn_key ^ hand_keys[card_id] ^ _ZOBRIST_FIELD[card_id])
+            hands[turn] = hand
+            self._field = field
+            if best is None or result[0] == turn:
+                best = result
+                if result[0] == turn:
+                    break
+        else:
+            if can_pass:
+                result = self._search_pass(turn, out_mask, alive, key)
+                if best is None or result[0] == turn:
+                    best = result
+
+        self._store(key, best)
+        return best
+
+    def _search_pass(self, turn, out_mask, alive, key):
+        """手番 turn がパスした後の (勝者, 自分の残り枚数)"""
+        passes = self._passes
+        count = passes[turn]
+        key ^= _ZOBRIST_PASS[turn][count] ^ _ZOBRIST_PASS[turn][count + 1]
+        passes[turn] = count + 1
+        if count + 1 <= 3:
+            seat = self._next_seat[out_mask][turn]
+            result = self._search(seat, out_mask, alive, key ^ _ZOBRIST_TURN[turn] ^ _ZOBRIST_TURN[seat])
+        else:
+            # バースト: 手札をすべて場に出して失格
+            hands = self._hands
+            field = self._field
+            hand = hands[turn]
+            key ^= (_zobrist_cards(_ZOBRIST_HAND_BYTES[turn], hand) ^ _zobrist_cards(_ZOBRIST_FIELD_BYTES, hand)
+                    ^ _ZOBRIST_OUT[turn])
+            hands[turn] = 0
+            self._field = field | hand
+            if alive - 1 <= 1:
+                result = (-1, hands[self.my_player_num].bit_count())
+            else:
+                out_mask |= 1 << turn
+                seat = self._next_seat[out_mask][turn]
+                result = self._search(seat, out_mask, alive - 1, key ^ _ZOBRIST_TURN[turn] ^ _ZOBRIST_TURN[seat])
+            hands[turn] = hand
+            self._field = field
+        passes[turn] = count
+        return result
+
+
+# --- ロールアウト方策 ---
+
+class RolloutPolicy:
+    """プレイアウト用の軽量ポリシー（再帰禁止・状態を持たないので1プロセスに1つで足りる）。
+
+    参考用コード（xq-kessyou-main）の戦略を統合したスコアリング:
+      1. A/K優先                  +ROLLOUT_ACE_KING_BONUS
+      2. 7から外側の次のカードが
+         場にある                 +ROLLOUT_ADJACENT_BONUS
+         場にない                 -ROLLOUT_ADJACENT_PENALTY
+           さらに自分が持っている +ROLLOUT_SAFE_BONUS +ROLLOUT_CHAIN_MULTIPLIER（連鎖可能性）
+      3. スート集中戦略           +同スートの手札枚数 * ROLLOUT_SUIT_MULTIPLIER
+      4. 手札削減インセンティブ   +(手札枚数 - 1) * ROLLOUT_HAND_REDUCTION
+    最高スコアの手を選び、同点なら random.choice で選ぶ（候補はカードID昇順）。
+
+    1〜3は1スート分の場と手札だけで決まるので、スートごとの「最高スコアと、それを取る数字インデックス」を
+    SuitTable に覚えておき、手番ごとの採点は出せるカードのあるスートの表引きと比較だけにする。
+    4は全候補で同じ値なので順位に影響せず省く。
+    """
+
+    __slots__ = ('_score_open', '_score_chain', '_score_closed', '_next_bits', '_suit_weight', '_suit_table',
+                 '_np_score_open', '_np_score_chain', '_np_score_closed', '_np_suit_weight')
+
+    def __init__(self):
+        score_open, score_chain, score_closed, next_bits = [], [], [], []
+        for card_id in range(52):
+            num_idx = CARD_NUMBER_INDEX[card_id]
+            base = ROLLOUT_ACE_KING_BONUS if num_idx == 0 or num_idx == 12 else 0
+            next_id = NEXT_CARD_ID[card_id]
+            if next_id >= 0:
+                next_bits.append(1 << next_id)
+                score_open.append(base + ROLLOUT_ADJACENT_BONUS)
+                score_chain.append(base - ROLLOUT_ADJACENT_PENALTY + ROLLOUT_SAFE_BONUS + ROLLOUT_CHAIN_MULTIPLIER)
+                score_closed.append(base - ROLLOUT_ADJACENT_PENALTY)
+            else:
+                next_bits.append(0)
+                score_open.append(base)
+                score_chain.append(base)
+                score_closed.append(base)
+        self._score_open = tuple(score_open)
+        self._score_chain = tuple(score_chain)
+        self._score_closed = tuple(score_closed)
+        self._next_bits = tuple(next_bits)
+        self._suit_weight = tuple(k * ROLLOUT_SUIT_MULTIPLIER for k in range(14))
+        self._suit_table = SuitTable(self._best_in_suit)
+        # BatchState 用（同じ表のNumPy配列版）
+        self._np_score_open = np.array(self._score_open, dtype='float64')
+        self._np_score_chain = np.array(self._score_chain, dtype='float64')
+        self._np_score_closed = np.array(self._score_closed, dtype='float64')
+        self._np_suit_weight = np.array(self._suit_weight, dtype='float64')
+
+    def choose(self, state, rng=random):
+        """手番プレイヤーの手をカードIDで返す（-1はパス）。State / BitState / RolloutState に対応。
+
+        同点の乱択には rng（random モジュールまたは random.Random）を使う。
+        """
+        if isinstance(state, (RolloutState, BitState)):
+            return self._pick(state.field, state.hands[state.turn_player], rng)
+        return self._pick(_field_cards_to_mask(state.field_cards),
+                          _cards_to_mask(state.players_cards[state.turn_player]), rng)
+
+    def choose_rollout(self, state, rng=random):
+        """RolloutState用"""
+        return self._pick(state.field, state.hands[state.turn_player], rng)
+
+    def _best_in_suit(self, suit_field, suit_hand):
+        """1スート分の (最高スコア, スートごとの「それを取るカードIDの昇順タプル」4つ)。
+
+        出せるカードがなければ (None, None)。
+        """
+        score_open = self._score_open
+        score_chain = self._score_chain
+        score_closed = self._score_closed
+        next_bits = self._next_bits
+        weight = self._suit_weight[suit_hand.bit_count()]
+        max_score = None
+        best = []
+        # スート0のカードIDは数字インデックスと等しく、採点表はスートによらない
+        for n in SUIT_LEGAL_INDEXES[suit_field]:
+            if not suit_hand >> n & 1:
+                continue
+            if suit_hand & next_bits[n]:
+                score = score_chain[n]
+            elif suit_field & next_bits[n]:
+                score = score_open[n]
+            else:
+                score = score_closed[n]
+            score += weight
+
+            if max_score is None or score > max_score:
+                max_score = score
+                best = [n]
+            elif score == max_score:
+                best.append(n)
+        if max_score is None:
+            return None, None
+        return max_score, tuple(tuple(base + n for n in best) for base in (0, 13, 26, 39))
+
+    def _pick(self, field, hand, rng):
+        table = self._suit_table
+        entries = table.entries
+        max_score = None
+        best_ids = ()
+
+        for s in range(4):
+            base = 13 * s
+            suit_hand = hand >> base & SUIT_BITS
+            if not suit_hand:
+                continue
+            suit_field = field >> base & SUIT_BITS
+            entry = entries.get(suit_field << 13 | suit_hand)
+            if entry is None:
+                entry = table.fill(suit_field, suit_hand)
+            score = entry[0]
+            if score is None:
+                continue
+
+            if max_score is None or score > max_score:
+                max_score = score
+                best_ids = entry[1][s]
+            elif score == max_score:
+                best_ids += entry[1][s]
+
+        return rng.choice(best_ids) if best_ids else -1
+
+    def choose_batch(self, batch, idx, rng, ply=0):
+        """BatchState の局 idx それぞれの手番の手をカードID配列で返す（-1はパス）。
+
+        採点は choose と同じ。同点は rng による一様な乱択で選ぶ（逐次版とは乱数系列が異なる）。
+        batch.stream_seeds がある場合は、局ごとの種・手数・カードから作る乱数で同点を決める
+        （同じ種の局どうしは同じ乱数列を使う）。
+        """
+        hand = batch.current_hands(idx)
+        actions = batch.legal_masks(idx) & hand
+        field = batch.field.reshape(batch.size, 52)[idx]
+
+        # 次のカードが自分の手札にある（連鎖）/ 場にある / それ以外 の3通り（番兵列で「次なし」を吸収）
+        pad = np.zeros((len(idx), 1), dtype=bool)
+        next_in_hand = np.concatenate((hand, pad), axis=1)[:, _NP_NEXT_CARD]
+        next_on_field = np.concatenate((field, pad), axis=1)[:, _NP_NEXT_CARD]
+        score = np.where(next_in_hand, self._np_score_chain,
+                         np.where(next_on_field, self._np_score_open, self._np_score_closed))
+        suit_counts = hand.reshape(-1, 4, 13).sum(axis=2)
+        score = score + self._np_suit_weight[suit_counts[:, _NP_CARD_SUIT]]
+
+        score = np.where(actions, score, -np.inf)
+        best = actions & (score == score.max(axis=1, keepdims=True))
+        if batch.stream_seeds is None:
+            choice = np.argmax(np.where(best, rng.random(best.shape), -1.0), axis=1)
+        else:
+            ply_mix = np.uint64(ply * _MIX_PLY & 0xFFFFFFFFFFFFFFFF)
+            keys = _np_mix64(batch.stream_seeds[idx, None] + ply_mix + _NP_CARD_MIX)
+            choice = np.argmax(np.where(best, keys, np.uint64(0)), axis=1)
+        return np.where(actions.any(axis=1), choice, -1)
+
+
+ROLLOUT_POLICY = RolloutPolicy()
+
+
+# --- バッチエンジン ---
+
+_NP_SUIT_LEGAL_BITS = np.array(SUIT_LEGAL_BITS, dtype='int64')
+_NP_SUIT_SHIFTS = np.arange(13, dtype='int64')
+_NP_CARD_SHIFTS = np.arange(52, dtype='uint64')
+_NP_CARD_SUIT = np.array(CARD_SUIT_INDEX, dtype='int64')
+_NP_NEXT_CARD = np.array([n if n >= 0 else 52 for n in NEXT_CARD_ID], dtype='int64')  # 次がなければ番兵列52
+
+
+_MIX_PLY = 0x9E3779B97F4A7C15  # 手数ごとにずらす定数（共通乱数モードの同点決め）
+_NP_CARD_MIX = _NP_CARD_SHIFTS * np.uint64(0xD1B54A32D192ED03)  # カードごとにずらす値
+
+
+def _np_mix64(x):
+    """splitmix64 の最終混合（uint64配列の各要素を一様な64bit値に写す）"""
+    x = (x ^ (x >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    x = (x ^ (x >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return x ^ (x >> np.uint64(31))
+
+
+def _np_unpack_masks(masks):
+    """52bitマスクの配列を最後の軸に52要素のbool配列として展開する"""
+    masks = np.asarray(masks, dtype='uint64')
+    return (masks[..., None] >> _NP_CARD_SHIFTS & 1).astype(bool)
+
+
+class BatchState:
+    """N局のプレイアウトを配列で同時に進める状態。
+
+    場は N×4×13、手札は N×人数×52 のbool配列、パス回数・脱落・手番・勝者は局ごとの配列。
+    1手ごとに全局の合法手生成・ロールアウト方策の採点・状態更新を配列演算で行う。
+    規則は State / RolloutState と同じ（勝者が出た局・残り1人の局は止まる）。
+    """
+
+    def __init__(self, size, players_num=3):
+        self.size = size
+        self.players_num = players_num
+        self.field = np.zeros((size, 4, 13), dtype=bool)
+        self.hands = np.zeros((size, players_num, 52), dtype=bool)
+        self.pass_count = np.zeros((size, players_num), dtype='int64')
+        self.out = np.zeros((size, players_num), dtype=bool)
+        self.turn_player = np.zeros(size, dtype='int64')
+        self.winner = np.full(size, -1, dtype='int64')
+        self._next_seat = np.array(_next_seat_table(players_num), dtype='int64')
+        self._out_weights = np.array([1 << p for p in range(players_num)], dtype='int64')
+        # 局ごとのロールアウト乱数の種（共通乱数モード。None なら共有の乱数生成器を使う）
+        self.stream_seeds = None
+
+    @classmethod
+    def from_states(cls, states):
+        """State / BitState / RolloutState のリストから作る"""
+        players_num = states[0].players_num
+        states = [s if isinstance(s, RolloutState) else RolloutState(players_num).load(s) for s in states]
+        batch = cls(len(states), players_num)
+        batch.field[:] = _np_unpack_masks([s.field for s in states]).reshape(-1, 4, 13)
+        batch.hands[:] = _np_unpack_masks([s.hands for s in states])
+        batch.pass_count[:] = [s.pass_count for s in states]
+        batch.out[:] = [[s.out_mask >> p & 1 for p in range(players_num)] for s in states]
+        batch.turn_player[:] = [s.turn_player for s in states]
+        batch.winner[:] = [s.winner for s in states]
+        return batch
+
+    def active_indices(self):
+        """まだ終わっていない局のインデックス"""
+        alive = self.players_num - self.out.sum(axis=1)
+        return np.flatnonzero((self.winner < 0) & (alive > 1))
+
+    def legal_masks(self, idx):
+        """局 idx の場で出せるカード（len(idx)×52のbool）。スートごとに SUIT_LEGAL_BITS を表引きする"""
+        suit_fields = self.field[idx].dot(_SUIT_BIT_WEIGHTS)
+        legal = _NP_SUIT_LEGAL_BITS[suit_fields]
+        return (legal[..., None] >> _NP_SUIT_SHIFTS & 1).astype(bool).reshape(-1, 52)
+
+    def current_hands(self, idx):
+        """局 idx の手番プレイヤーの手札（len(idx)×52のbool）"""
+        return self.hands[idx, self.turn_player[idx]]
+
+    def hand_counts(self):
+        """各局・各プレイヤーの残り手札枚数（N×人数）"""
+        return self.hands.sum(axis=2)
+
+    def step(self, idx, card_ids):
+        """局 idx をそれぞれ1手進める（card_ids: カードID配列、-1はパス）"""
+        turn = self.turn_player[idx]
+        field = self.field.reshape(self.size, 52)
+        play = card_ids >= 0
+
+        # カードを出す（手札が0になったら勝者確定）
+        g, p, c = idx[play], turn[play], card_ids[play]
+        self.hands[g, p, c] = False
+        field[g, c] = True
+        emptied = ~self.hands[g, p].any(axis=1)
+        self.winner[g[emptied]] = p[emptied]
+
+        # パス（4回目はバースト: 手札をすべて場に出して失格）
+        g, p = idx[~play], turn[~play]
+        self.pass_count[g, p] += 1
+        burst = self.pass_count[g, p] > 3
+        g, p = g[burst], p[burst]
+        field[g] |= self.hands[g, p]
+        self.hands[g, p] = False
+        self.out[g, p] = True
+
+        # 次手番へ（上がった局は手番を渡さない）
+        g = idx[self.winner[idx] < 0]
+        out_mask = self.out[g].astype('int64').dot(self._out_weights)
+        self.turn_player[g] = self._next_seat[out_mask, self.turn_player[g]]
+        return self
+
+
+# --- 確定化（相手手札のサンプリング） ---
+
+_PIVOTAL_NUMBER_INDEXES = (0, 5, 7, 12)  # A・6・8・K
+
+
+def _pivotal_card_ids(state):
+    """勝敗を左右しやすいカード: A・K・6・8 と、各スートの両側で次に場に出るカード"""
+    ids = {suit * 13 + n for suit in range(4) for n in _PIVOTAL_NUMBER_INDEXES}
+    for suit, suit_field in enumerate(state.suit_masks()):
+        for n in (SUIT_LOW_FRONTIER[suit_field], SUIT_HIGH_FRONTIER[suit_field]):
+            if n >= 0:
+                ids.add(suit * 13 + n)
+    return ids
+
+
+def determinize_hands(original_state, tracker, my_player_num, fixed=None):
+    """推論制約を満たす相手手札の割り当て {プレイヤー: カードのリスト} を生成（状態はコピーしない）
+
+    fixed（{カード: プレイヤー}）を渡すと、そのカードは指定のプレイヤーに配った上で残りを割り当てる。
+    """
+    fixed = fixed or {}
+
+    # 相手のカードプール
+    pool = []
+    for p in range(original_state.players_num):
+        if p != my_player_num:
+            pool.extend(c for c in original_state.players_cards[p] if c not in fixed)
+
+    need = {p: len(original_state.players_cards[p]) for p in range(original_state.players_num) if p != my_player_num}
+    for p in fixed.values():
+        need[p] -= 1
+
+    # 確定化を複数回リトライ（値は DETERMINIZATION_ATTEMPTS で管理）
+    # 制約を満たす割り当てを試行（過去の検証でこの回数で十分収束）
+    for _ in range(30):  # 参考用実装の値（30回）
+        random.shuffle(pool)
+        remain = list(pool)
+        hands = {p: [c for c, owner in fixed.items() if owner == p] for p in need.keys()}
+        ok = True
+
+        # 各プレイヤーに可能なカードを割り当て
+        for p in need.keys():
+            k = need[p]
+            if k == 0:
+                continue
+
+            possible_mask = tracker.possible[p]
+            possible_list = [c for c in remain if possible_mask >> c.id & 1]
+
+            if len(possible_list) < k:
+                ok = False
+                break
+
+            chosen = possible_list[:k]
+            hands[p].extend(chosen)
+            chosen_set = set(chosen)
+            remain = [c for c in remain if c not in chosen_set]
+
+        if not ok:
+            continue
+
+        # 残りを分配
+        if remain:
+            ps = list(need.keys())
+            idx = 0
+            for c in remain:
+                hands[ps[idx % len(ps)]].append(c)
+                idx += 1
+
+        return hands
+
+    # 指定のカードを固定したままでは制約を満たせなかった場合は、固定を外してやり直す
+    if fixed:
+        return determinize_hands(original_state, tracker, my_player_num)
+
+    # 無作為な試行で見つからなければ、制約を満たす割り当てから直接引く（推論は捨てない）
+    sampler = ExactWorldSampler(original_state, tracker, my_player_num)
+    return {p: _mask_to_cards(mask) for p, mask in sampler.hand_masks(0).items()}
+
+
+class StratifiedWorldSampler:
+    """ピボットカードの持ち主で層別化した確定化（determinization='stratified'）。
+
+    相手が持つピボットカードのうち、推論上2人以上が持ちうるものについて、
+    DETERMINIZATION_STRATA_BLOCK 回ごとに各持ち主候補がその所有確率に比例した回数ずつ現れるよう
+    割り当てを並べる（カードごとに独立に並べ替える＝ラテン超方格）。所有確率は推論と整合する全世界の中での
+    割合（ExactWorldSampler.ownership）なので、層ごとの出現回数は一様な確定化の期待値と一致する。
+    残りのカードは determinize_hands で推論制約を満たすよう配る。割り当ては (seed, シミュレーション番号) だけで決まる。
+    AIを参照しないので、並列探索ではそのままワーカーへ送れる。
+    """
+
+    def __init__(self, state, tracker, my_player_num, seed):
+        self.state = state
+        self.tracker = tracker
+        self.my_player_num = my_player_num
+        self.seed = seed
+        self.need = {p: len(state.players_cards[p]) for p in range(state.players_num) if p != my_player_num}
+
+        block = DETERMINIZATION_STRATA_BLOCK
+        pivotal = _pivotal_card_ids(state)
+        unknown = sorted((c for p in self.need for c in state.players_cards[p] if c.id in pivotal), key=lambda c: c.id)
+        # seed を渡して、周辺確率を求めるだけのサンプラーが random を消費しないようにする
+        ownership = ExactWorldSampler(state, tracker, my_player_num, seed=0).ownership() if unknown else {}
+        self._strata = []  # [(カード, ブロック内の持ち主の並び（未シャッフル）)]
+        for card in unknown:
+            share = ownership.get(card.id, {})
+            owners = [p for p in self.need if share.get(p, 0) > 0]
+            if len(owners) < 2:
+                continue
+            # 所有確率に比例した回数（最大剰余法で合計を block にそろえる）
+            quotas = [block * share[p] for p in owners]
+            total = sum(quotas)
+            quotas = [q * block / total for q in quotas]
+            counts = [int(q) for q in quotas]
+            for i in sorted(range(len(owners)), key=lambda i: counts[i] - quotas[i])[:block - sum(counts)]:
+                counts[i] += 1
+            self._strata.append((card, [p for p, k in zip(owners, counts) for _ in range(k)]))
+        self._plan_block = None
+        self._plan = None
+
+    def hand_masks(self, sim):
+        """sim 番目のシミュレーションの相手手札 {プレイヤー: 52bitマスク}"""
+        block, pos = divmod(sim, DETERMINIZATION_STRATA_BLOCK)
+        if block != self._plan_block:
+            rng = random.Random(self.seed ^ block * 0x9E3779B97F4A7C15)
+            self._plan = []
+            for _, owners in self._strata:
+                column = list(owners)
+                rng.shuffle(column)
+                self._plan.append(column)
+            self._plan_block = block
+
+        # 手札枚数を超える分は固定しない
+        fixed = {}
+        used = dict.fromkeys(self.need, 0)
+        for (card, _), column in zip(self._strata, self._plan):
+            owner = column[pos]
+            if used[owner] < self.need[owner]:
+                fixed[card] = owner
+                used[owner] += 1
+        hands = determinize_hands(self.state, self.tracker, self.my_player_num, fixed)
+        return {p: _cards_to_mask(cards) for p, cards in hands.items()}
+
+
+class ExactWorldSampler:
+    """推論制約（CardTracker.possible）を必ず満たす相手手札を、整合する全割り当てから一様に引く（determinization='exact'）。
+
+    相手のカードを「持ちうる相手の集合（bitマスク）」ごとの型に分け、型ごとに各相手へ何枚渡すかを
+    「残りの型で作れる割り当ての数」（動的計画法で数える）に比例した確率で選び、型の中では無作為に並べて配る。
+    K 個の世界をまとめて引くときは、枚数の選択を同じ残り枚数の世界ごとに、並べ替えを argsort で一括に行う。
+    試行の繰り返しはない。推論が実際の手札と矛盾する（相手が出せるのにパスした等）ときだけ、
+    枚数だけを合わせた制約なしの配り方から一様に引く（relaxed=True）。
+    """
+
+    def __init__(self, state, tracker, my_player_num, batch_size=None, seed=None, constrained=True):
+        self.players_num = state.players_num
+        self.players = [p for p in range(state.players_num)
+                        if p != my_player_num and len(state.players_cards[p]) > 0]
+        self.need = tuple(len(state.players_cards[p]) for p in self.players)
+
+        # constrained=False なら最初から制約なし（ParticleBelief の提案分布の片方）
+        self.relaxed = not constrained
+        if self.relaxed:
+            self._build_types(state, [ALL_CARDS_MASK] * len(self.players))
+        else:
+            self._build_types(state, [tracker.possible[p] for p in self.players])
+        if self.world_count == 0 and not self.relaxed:
+            self.relaxed = True
+            self._build_types(state, [ALL_CARDS_MASK] * len(self.players))
+
+        # batch_size を指定すると、sim 番目の世界を (seed, sim // batch_size) で初期化した乱数でまとめて生成した
+        # batch_size 個の (sim % batch_size) 番目とする（ワーカーへの分け方によらず同じ世界になる）。
+        # None なら1世界ずつ random から種を取る
+        self.batch_size = batch_size
+        self.seed = seed if seed is not None else random.getrandbits(64)
+        self._buffer = None
+        self._buffer_block = None
+        # enumerate_worlds() 後は、全世界を決まった順に並べたもの（sim 番目のシミュレーションは sim 番目の世界）
+        self._worlds = None
+
+    def _build_types(self, state, possible_masks):
+        """相手のカードを型（持ちうる相手のbitマスク）ごとに分け、整合する世界の数を数える"""
+        types = {}
+        for p in self.players:
+            for card in state.players_cards[p]:
+                owners = 0
+                for i, mask in enumerate(possible_masks):
+                    if mask >> card.id & 1:
+                        owners |= 1 << i
+                types.setdefault(owners, []).append(card.id)
+        self._types = sorted(types.items())
+        self._type_cards = [np.array(ids, dtype='int64') for _, ids in self._types]
+        self._compositions = [self._type_compositions(owners, len(ids)) for owners, ids in self._types]
+        self._ways_memo = {}
+        self.world_count = self._ways(0, self.need)
+
+    def _type_compositions(self, owners, size):
+        """型の size 枚を持ちうる相手に分ける全通り [(各相手の枚数のタプル, 多項係数)]"""
+        members = [i for i in range(len(self.players)) if owners >> i & 1]
+        result = []
+
+        def rec(k, left, counts):
+            if k == len(members) - 1:
+                counts[members[k]] = left
+                ways = math.factorial(size)
+                for c in counts:
+                    ways //= math.factorial(c)
+                result.append((tuple(counts), ways))
+                counts[members[k]] = 0
+                return
+            for c in range(left + 1):
+                counts[members[k]] = c
+                rec(k + 1, left - c, counts)
+            counts[members[k]] = 0
+
+        if members:
+            rec(0, size, [0] * len(self.players))
+        return result
+
+    def _ways(self, i, need):
+        """i 番目以降の型で残り枚数 need をちょうど満たす割り当ての数"""
+        if i == len(self._types):
+            return 1 if not any(need) else 0
+        key = (i, need)
+        ways = self._ways_memo.get(key)
+        if ways is None:
+            ways = 0
+            for counts, mult in self._compositions[i]:
+                rest = tuple(n - c for n, c in zip(need, counts))
+                if min(rest, default=0) >= 0:
+                    ways += mult * self._ways(i + 1, rest)
+            self._ways_memo[key] = ways
+        return ways
+
+    def ownership(self):
+        """各カードを各相手が持つ確率（整合する全世界の中での割合） {カードID: {プレイヤー: 確率}}
+
+        前から i 番目までの型で残り枚数が need になる割り当ての数と、残りの型での割り当ての数 _ways を掛けて、
+        型ごとに各相手へ渡る枚数の期待値を求め、型の枚数で割る（同じ型のカードは同じ確率）。
+        """
+        result = {}
+        if self.world_count == 0:
+            return result
+        prefix = {self.need: 1}
+        for i, (_, ids) in enumerate(self._types):
+            expected = [0] * len(self.players)
+            following = {}
+            for need, before in prefix.items():
+                for counts, mult in self._compositions[i]:
+                    rest = tuple(n - c for n, c in zip(need, counts))
+                    if min(rest, default=0) < 0:
+                        continue
+                    ways = before * mult
+                    after = ways * self._ways(i + 1, rest)
+                    if after:
+                        for j, c in enumerate(counts):
+                            expected[j] += after * c
+                        following[rest] = following.get(rest, 0) + ways
+            prefix = following
+            share = {p: expected[j] / (self.world_count * len(ids)) for j, p in enumerate(self.players)}
+            for card_id in ids:
+                result[card_id] = share
+        return result
+
+    def sample(self, k, rng):
+        """k 個の世界を引き、各相手の手札マスク（k × 人数 の uint64 配列）を返す"""
+        m = len(self.players)
+        masks = np.zeros((k, self.players_num), dtype='uint64')
+
+        need = np.tile(np.array(self.need, dtype='int64'), (k, 1))
+        for i, (cards, compositions) in enumerate(zip(self._type_cards, self._compositions)):
+            # 残り枚数が同じ世界ごとに、この型の分け方を割り当て数に比例した確率で選ぶ
+            chosen = np.empty((k, m), dtype='int64')
+            rows_by_need = {}
+            for row, key in enumerate(map(tuple, need.tolist())):
+                rows_by_need.setdefault(key, []).append(row)
+            for key, rows in rows_by_need.items():
+                options, weights = [], []
+                for counts, mult in compositions:
+                    rest = tuple(n - c for n, c in zip(key, counts))
+                    if min(rest, default=0) >= 0:
+                        ways = mult * self._ways(i + 1, rest)
+                        if ways:
+                            options.append(counts)
+                            weights.append(ways)
+                total = sum(weights)
+                picks = rng.choice(len(options), size=len(rows), p=[w / total for w in weights])
+                chosen[rows] = np.array(options, dtype='int64')[picks]
+            need -= chosen
+
+            # 型の中のカードを世界ごとに並べ替え、先頭から各相手の枚数ずつ配る
+            order = cards[np.argsort(rng.random((k, len(cards))), axis=1)]
+            bounds = np.cumsum(chosen, axis=1)
+            position = np.arange(len(cards))
+            owner = (position[None, :, None] >= bounds[:, None, :]).sum(axis=2)
+            bits = np.left_shift(np.uint64(1), order.astype('uint64'))
+            for j, p in enumerate(self.players):
+                masks[:, p] += np.where(owner == j, bits, np.uint64(0)).sum(axis=1, dtype='uint64')
+        return masks
+
+    def enumerate_worlds(self, limit):
+        """世界の数が limit 以下なら全てを列挙して以後 hand_masks(sim) で順に返す。列挙したかどうかを返す"""
+        if self.world_count == 0 or self.world_count > limit:
+            return False
+        rows = []
+
+        def splits(cards, counts, j):
+            # cards を j 番目以降の相手に counts 枚ずつ分ける全通り（相手ごとのマスクのタプル）
+            if j == len(counts):
+                yield ()
+                return
+            for combo in itertools.combinations(cards, counts[j]):
+                mask = sum(1 << c for c in combo)
+                rest = [c for c in cards if not mask >> c & 1]
+                for tail in splits(rest, counts, j + 1):
+                    yield (mask,) + tail
+
+        def rec(i, need, masks):
+            if i == len(self._types):
+                rows.append(masks)
+                return
+            cards = self._type_cards[i].tolist()
+            for counts, _ in self._compositions[i]:
+                rest = tuple(n - c for n, c in zip(need, counts))
+                if min(rest, default=0) >= 0 and self._ways(i + 1, rest):
+                    for split in splits(cards, counts, 0):
+                        rec(i + 1, rest, tuple(a | b for a, b in zip(masks, split)))
+
+        rec(0, self.need, (0,) * len(self.players))
+        self._worlds = np.zeros((len(rows), self.players_num), dtype='uint64')
+        self._worlds[:, self.players] = np.array(rows, dtype='uint64').reshape(len(rows), len(self.players))
+        return True
+
+    def hand_masks(self, sim):
+        """sim 番目のシミュレーションの相手手札 {プレイヤー: 52bitマスク}"""
+        if self._worlds is not None:
+            row = self._worlds[sim]
+        elif self.batch_size is None:
+            row = self.sample(1, np.random.default_rng(random.getrandbits(64)))[0]
+        else:
+            block, pos = divmod(sim, self.batch_size)
+            if block != self._buffer_block:
+                self._buffer = self.sample(self.batch_size, np.random.default_rng([self.seed, block]))
+                self._buffer_block = block
+            row = self._buffer[pos]
+        return {p: int(row[p]) for p in self.players}
+
+
+# --- 粒子フィルタによる信念状態 ---
+# 相手手札の仮説（粒子）の集団を手番をまたいで持ち、新しく増えた履歴だけで更新する（determinization='particle'）。
+# パスは「合法手を持っていない」の柔らかい証拠として、持っていた粒子の重みを BELIEF_STATE_DECAY_FACTOR 倍にする
+# （戦略的パスがあるので消しはしない）。相手が出したカードとバーストで見えた手札は確実なので、矛盾する粒子は
+# 持ち主とカードを入れ替えて辻褄を合わせる。有効サンプルサイズが減ったときだけ系統リサンプリングし、
+# 重複した粒子はメトロポリス法のカード入れ替えで散らす。
+
+
+def _random_bit(mask, rng):
+    """マスクの立っているbitから1つを一様に選ぶ"""
+    for _ in range(rng.randrange(mask.bit_count())):
+        mask &= mask - 1
+    return mask & -mask
+
+
+class ParticleBelief:
+    """相手手札の重み付き仮説の集団（AIインスタンスに紐づけて手番をまたいで使う）
+
+    - hands[i][p]: i 番目の粒子でのプレイヤー p の手札マスク（自分と脱落者は0）
+    - log_weights[i]: 対数重み（パスの証拠に反した回数 × log(BELIEF_STATE_DECAY_FACTOR) の累積）
+    - evidence[p]: p がパスしたときの合法手マスクの列
+    履歴は IncrementalTracker.events を自分のカーソル（position）で読む。
+    """
+
+    def __init__(self, my_player_num, particle_count=None):
+        self.my_player_num = my_player_num
+        self.particle_count = particle_count or PARTICLE_COUNT
+        self.log_decay = math.log(BELIEF_STATE_DECAY_FACTOR)
+        self.reset()
+
+    def reset(self):
+        self.hands = []
+        self.log_weights = []
+        self.evidence = []
+        self.position = 0
+        self._rebuilds = None
+        self._rng = random.Random()
+        # 作り直した回数・リサンプリングした回数
+        self.initializations = 0
+        self.resamples = 0
+
+    def _violations(self, player, mask):
+        """手札 mask のとき、player のパスの証拠に反する回数"""
+        return sum(1 for legal in self.evidence[player] if mask & legal)
+
+    def sync(self, state, feed):
+        """feed（sync 済みの IncrementalTracker）の未読の履歴で粒子を更新する。整合しなくなったら作り直す"""
+        if not self.hands or self._rebuilds != feed.rebuilds or self.position > len(feed.events):
+            self._initialize(state, feed)
+        else:
+            for event in feed.events[self.position:]:
+                self._apply(*event)
+            self.position = len(feed.events)
+            if not self._consistent(state):
+                self._initialize(state, feed)
+        if self.effective_sample_size() < PARTICLE_RESAMPLE_RATIO * len(self.hands):
+            self._resample()
+
+    def _initialize(self, state, feed):
+        """推論と完全に整合する世界と制約なしの世界を半々に引き、重み = 目標分布 / 提案分布 にする"""
+        self.initializations += 1
+        self._rng = random.Random(random.getrandbits(64))
+        self._rebuilds = feed.rebuilds
+        self.position = len(feed.events)
+        self.evidence = [[] for _ in range(state.players_num)]
+        for p, card_id, legal, burst in feed.events:
+            if legal and p != self.my_player_num:
+                self.evidence[p].append(legal)
+
+        constrained = ExactWorldSampler(state, feed.tracker, self.my_player_num)
+        relaxed = ExactWorldSampler(state, feed.tracker, self.my_player_num, constrained=False)
+        rng = np.random.default_rng(self._rng.getrandbits(64))
+        n = self.particle_count
+        n_constrained = 0 if constrained.relaxed else n // 2
+        rows = [relaxed.sample(n - n_constrained, rng)]
+        if n_constrained:
+            rows.insert(0, constrained.sample(n_constrained, rng))
+        # 混合提案の密度（constrained 側は証拠に1回も反しない世界だけを引く）
+        q_constrained = 0.5 / constrained.world_count if n_constrained else 0.0
+        q_relaxed = (0.5 if n_constrained else 1.0) / relaxed.world_count
+
+        self.hands = np.concatenate(rows).tolist()
+        self.log_weights = []
+        for hands in self.hands:
+            v = sum(self._violations(p, mask) for p, mask in enumerate(hands))
+            q = q_relaxed + (q_constrained if v == 0 else 0.0)
+            self.log_weights.append(v * self.log_decay - math.log(q))
+
+    def _apply(self, player, card_id, legal, burst):
+        """履歴1手ぶんの観測で粒子を更新する"""
+        if player == self.my_player_num:
+            return
+        rng = self._rng
+        log_decay = self.log_decay
+        violations = self._violations
+        log_weights = self.log_weights
+
+        if legal:
+            for i, hands in enumerate(self.hands):
+                if hands[player] & legal:
+                    log_weights[i] += log_decay
+            self.evidence[player].append(legal)
+
+        if card_id >= 0:
+            bit = 1 << card_id
+            for i, hands in enumerate(self.hands):
+                if not hands[player] & bit:
+                    # 持っていなかった粒子は、持っていた相手と player の無作為な1枚を入れ替える
+                    holder = next(q for q, mask in enumerate(hands) if mask & bit)
+                    before = violations(player, hands[player]) + violations(holder, hands[holder])
+                    swap = _random_bit(hands[player], rng) | bit
+                    hands[player] ^= swap
+                    hands[holder] ^= swap
+                    after = violations(player, hands[player]) + violations(holder, hands[holder])
+                    log_weights[i] += (after - before) * log_decay
+                hands[player] ^= bit
+        elif burst:
+            for i, hands in enumerate(self.hands):
+                missing = burst & ~hands[player]
+                if missing:
+                    # バーストで見えた手札を player に集め、代わりに player の余分なカードを無作為に渡す
+                    before = sum(violations(q, mask) for q, mask in enumerate(hands))
+                    extra = hands[player] & ~burst
+                    for q, mask in enumerate(hands):
+                        give = mask & missing
+                        if give:
+                            take = 0
+                            for _ in range(give.bit_count()):
+                                low = _random_bit(extra, rng)
+                                extra ^= low
+                                take |= low
+                            hands[q] ^= give | take
+                    hands[player] = burst
+                    after = sum(violations(q, mask) for q, mask in enumerate(hands))
+                    log_weights[i] += (after - before) * log_decay
+                hands[player] = 0
+
+    def _consistent(self, state):
+        """全粒子の手札枚数と相手のカードの集合が実際の局面と一致するか"""
+        sizes = [0 if p == self.my_player_num else len(cards) for p, cards in enumerate(state.players_cards)]
+        pool = 0
+        for p, cards in enumerate(state.players_cards):
+            if p != self.my_player_num:
+                pool |= _cards_to_mask(cards)
+        for hands in self.hands:
+            if len(hands) != len(sizes):
+                return False
+            union = 0
+            for mask, size in zip(hands, sizes):
+                if mask.bit_count() != size:
+                    return False
+                union |= mask
+            if union != pool:
+                return False
+        return True
+
+    def weights(self):
+        """正規化した重み（NumPy配列）"""
+        w = np.exp(np.array(self.log_weights) - max(self.log_weights))
+        return w / w.sum()
+
+    def effective_sample_size(self):
+        w = self.weights()
+        return 1.0 / float(np.dot(w, w))
+
+    def _resample(self):
+        """系統リサンプリングし、重複した粒子をメトロポリス法のカード入れ替えで散らす"""
+        rng = self._rng
+        n = len(self.hands)
+        cumulative = np.cumsum(self.weights())
+        picks = np.minimum(np.searchsorted(cumulative, (rng.random() + np.arange(n)) / n), n - 1).tolist()
+        self.hands = [list(self.hands[j]) for j in picks]
+        self.log_weights = [0.0] * n
+        self.resamples += 1
+
+        holders = [p for p, mask in enumerate(self.hands[0]) if mask]
+        if len(holders) < 2:
+            return
+        violations = self._violations
+        # 系統抽出の結果は元の順に並ぶので、直前と同じ粒子から選ばれたもの（2つ目以降の複製）だけを動かす
+        for i in range(1, n):
+            if picks[i] != picks[i - 1]:
+                continue
+            hands = self.hands[i]
+            for _ in range(PARTICLE_MCMC_MOVES):
+                p, q = rng.sample(holders, 2)
+                swap_p = _random_bit(hands[p], rng)
+                swap_q = _random_bit(hands[q], rng)
+                new_p = hands[p] ^ swap_p | swap_q
+                new_q = hands[q] ^ swap_q | swap_p
+                delta = (violations(p, new_p) + violations(q, new_q)
+                         - violations(p, hands[p]) - violations(q, hands[q]))
+                if delta <= 0 or rng.random() < math.exp(delta * self.log_decay):
+                    hands[p] = new_p
+                    hands[q] = new_q
+
+    def sampler(self, state, seed):
+        """今の粒子から世界を引く確定化器"""
+        players = [p for p in range(state.players_num) if p != self.my_player_num and state.players_cards[p]]
+        return ParticleWorldSampler(players, self.hands, self.weights(), seed)
+
+
+class ParticleWorldSampler:
+    """ParticleBelief の粒子を重みに比例して引く確定化器（hand_masks(sim) を持つ）
+
+    DETERMINIZATION_BATCH_SIZE 回ごとに系統抽出で粒子を選んで並べ替える。選び方は (seed, シミュレーション番号) だけで決まる。
+    """
+
+    def __init__(self, players, hands, weights, seed):
+        self.players = players
+        self.hands = [tuple(hands_i[p] for p in players) for hands_i in hands]
+        self.cumulative = np.cumsum(weights)
+        self.seed = seed
+        self._block = None
+        self._order = None
+
+    def hand_masks(self, sim):
+        """sim 番目のシミュレーションの相手手札 {プレイヤー: 52bitマスク}"""
+        block, pos = divmod(sim, DETERMINIZATION_BATCH_SIZE)
+        if block != self._block:
+            rng = random.Random(self.seed ^ block * 0x9E3779B97F4A7C15)
+            size = DETERMINIZATION_BATCH_SIZE
+            picks = np.searchsorted(self.cumulative, (rng.random() + np.arange(size)) / size)
+            order = np.minimum(picks, len(self.hands) - 1).tolist()
+            rng.shuffle(order)
+            self._block = block
+            self._order = order
+        return dict(zip(self.players, self.hands[self._order[pos]]))
+
+
+# --- 戦略評価の特徴量 ---
+# _evaluate_strategic_actions の各戦略（トンネルロック・バースト誘導・ヒューリスティック・ラン・終盤・ブロック・
+# カードカウンティング・高度なヒューリスティック）が見ている事実を、1手に1回だけ「候補 × 特徴量」の行列にまとめる。
+# 戦略ボーナスは この行列 @ 重みベクトル（HybridStrongestAI._strategy_weight_vector）で、
+# スートごとの集計（場の13bitパターン・自分の枚数・進行度）と CardTracker.summary() は候補をまたいで共有する。
+
+STRATEGY_FEATURES = (
+    'edge',               # A/K
+    'tunnel_complete',    # 逆側の端が場にあるA/K（出すとトンネルが完成）
+    'edge_open',          # 逆側の端が場にないA/K
+    'next_on_field',      # 7から外側の次のカードが場にある
+    'next_open',          # 次のカードが場にない
+    'next_mine',          # 次のカードを自分が持っている
+    'suit_count',         # 自分のそのスートの枚数
+    'hand_rest',          # 自分の手札枚数 - 1
+    'run_length',         # 出した後に手札だけで外側へ続けて出せる枚数
+    'lock_close',         # トンネルロック: 自分が支配的なので端を出して閉じる
+    'lock_hold',          # トンネルロック: 相手が多く持ちうるので端を温存
+    'lock_hold_soft',     # トンネルロック: 中間的なのでやや温存
+    'lock_open_good',     # トンネルロック: 自分が多い側を開ける端
+    'lock_open_bad',      # トンネルロック: 相手に有利になりうる側を開ける端
+    'burst_pass3',        # バースト誘導: 最も脆弱な相手のパスが3回以上
+    'burst_pass2',        # 同2回
+    'burst_pass1',        # 同1回
+    'burst_suit_vuln',    # 最も脆弱な相手がそのスートを持っていない度合い
+    'burst_progress',     # そのスートの進行度（場の枚数 / 13）
+    'burst_other_vuln',   # 他の相手のスート脆弱性（3以上のものの合計）
+    'block_free',         # 次のカードを持ちえない相手の数
+    'block_help',         # 次のカードを持ちうる相手の数
+    'count_risky',        # カードカウンティング: 7以外を出す（相手の残りが多い）
+    'count_dominant',     # 相手の残りが2枚以下のスート
+    'count_leading',      # 相手の残りが3〜4枚のスート
+    'circular_dist',      # 7からの円環距離
+    'seven_adjacent',     # 7で、隣（6/8）を自分が持っている
+    'seven_no_adjacent',  # 7で、隣を持っていない
+    'my_path',            # 未開放の隣（トンネル含む）を自分が持っている方向の数
+    'others_risk',        # 未開放の隣から、自分が持たないカードが続く枚数（他人の道）
+    'win_dash',           # 自分の手札が相手の最小以下
+    'tunnel_danger',      # 逆側の端を場にも手札にも持たずにA/Kを出す
+    'necromancer',        # バースト寸前の相手の数（隣が未開放のカードのみ）
+)
+
+
+_LOCK_CLOSE = (1, 0, 0, 0, 0)
+_LOCK_HOLD = (0, 1, 0, 0, 0)
+_LOCK_HOLD_SOFT = (0, 0, 1, 0, 0)
+_LOCK_OPEN_GOOD = (0, 0, 0, 1, 0)
+_LOCK_OPEN_BAD = (0, 0, 0, 0, 1)
+_LOCK_NONE = (0, 0, 0, 0, 0)
+
+
+def _suit_strategy_features(suit_field, suit_hand):
+    """1スート分の場と自分の手札だけで決まる特徴量（SUIT_FEATURE_TABLE の build）
+
+    戻り値は (スートの集計, {数字インデックス: カードの特徴量}) で、カードはそのスートの合法手だけ。
+    スートの集計:   (自分の枚数, 場の枚数 / 13, 相手の残り, A〜6側の自分の枚数, 8〜K側の自分の枚数)
+    カードの特徴量: (edge〜suit_count, run_length, トンネルロック, ロックの温存判定に使う側, 次のカードがあるか,
+                     count_risky〜others_risk, tunnel_danger, 未開放の隣があるか)
+    トンネルロックは相手の枚数で決まる場合だけ None とし、側（0: A〜6 / 1: 8〜K）を添える。
+    """
+    my_count = suit_hand.bit_count()
+    my_low = (suit_hand & _SMALL_SIDE_BITS).bit_count()
+    my_high = (suit_hand & _LARGE_SIDE_BITS).bit_count()
+    remaining = 13 - suit_field.bit_count() - my_count
+    ace_out = suit_field & 1
+    king_out = suit_field >> 12 & 1
+    count_dominant = 1 if remaining <= 2 else 0
+    count_leading = 1 if 2 < remaining <= 4 else 0
+
+    cards = {}
+    # スート0のカードIDは数字インデックスと等しい
+    for n in SUIT_LEGAL_INDEXES[suit_field]:
+        is_edge = n == 0 or n == 12
+        opposite_out = (king_out if n == 0 else ace_out) if is_edge else 0
+
+        next_id = NEXT_CARD_ID[n]
+        next_on_field = next_open = next_mine = run_length = 0
+        if next_id >= 0:
+            if suit_field >> next_id & 1:
+                next_on_field = 1
+            else:
+                next_open = 1
+                next_mine = suit_hand >> next_id & 1
+            while next_id >= 0 and suit_hand >> next_id & 1:
+                run_length += 1
+                next_id = NEXT_CARD_ID[next_id]
+
+        # トンネルロック
+        lock, lock_side = _LOCK_NONE, -1
+        if ace_out and not king_out and n == 12:
+            if my_high >= 4:
+                lock = _LOCK_CLOSE
+            elif my_high <= 2:
+                lock, lock_side = None, 1
+            else:
+                lock = _LOCK_HOLD_SOFT
+        elif king_out and not ace_out and n == 0:
+            if my_low >= 4:
+                lock = _LOCK_CLOSE
+            elif my_low <= 2:
+                lock, lock_side = None, 0
+            else:
+                lock = _LOCK_HOLD_SOFT
+        elif not ace_out and not king_out and is_edge:
+            mine, theirs = (my_high, my_low) if n == 0 else (my_low, my_high)
+            lock = _LOCK_OPEN_GOOD if mine >= theirs + 2 else _LOCK_OPEN_BAD
+
+        # カードカウンティング。元の実装は、出す側の「進行度」（7から外側で最も近い場のカードまでの距離）が
+        # 2未満なら減点、4以上なら加点していたが、距離を7自身から数えるので進行度は常に0だった。
+        # その挙動（相手の残りが多いスートの7以外は減点、加点はなし）をそのまま残す
+        count_risky = 1 if n != 6 and remaining > 3 else 0
+
+        # 高度なヒューリスティック
+        dist = abs(n - 6)
+        seven_adjacent = seven_no_adjacent = 0
+        if n == 6:
+            if suit_hand >> 5 & 1 or suit_hand >> 7 & 1:
+                seven_adjacent = 1
+            else:
+                seven_no_adjacent = 1
+        my_path = others_risk = 0
+        has_open_neighbor = 0
+        for direction, neighbor in zip((1, -1), CIRCULAR_NEIGHBOR_IDS[n]):
+            if suit_field >> neighbor & 1:
+                continue
+            has_open_neighbor = 1
+            if suit_hand >> neighbor & 1:
+                my_path += 1
+            else:
+                # 自分が持っていないカードが何枚連続しているか（トンネル越しに最大6枚）
+                curr = (n + direction) % 13
+                for _ in range(6):
+                    if (suit_field | suit_hand) >> curr & 1:
+                        break
+                    others_risk += 1
+                    curr = (curr + direction) % 13
+        tunnel_danger = 0
+        if is_edge:
+            opposite = 12 if n == 0 else 0
+            if not (suit_field | suit_hand) >> opposite & 1:
+                tunnel_danger = 1
+
+        cards[n] = (
+            (is_edge, opposite_out, is_edge and not opposite_out, next_on_field, next_open, next_mine, my_count),
+            run_length, lock, lock_side, NEXT_CARD_ID[n] >= 0,
+            (count_risky, count_dominant, count_leading,
+             min(dist, 13 - dist), seven_adjacent, seven_no_adjacent, my_path, others_risk),
+            tunnel_danger, has_open_neighbor,
+        )
+    return (my_count, suit_field.bit_count() / 13.0, remaining, my_low, my_high), cards
+
+
+SUIT_FEATURE_TABLE = SuitTable(_suit_strategy_features)
+
+
+def strategy_feature_matrix(state, my_player_num, tracker, actions):
+    """候補 × STRATEGY_FEATURES の行列（float64）。actions は合法手（場に出せるカード）
+
+    スートに閉じた特徴量は SUIT_FEATURE_TABLE から引き、ここでは相手・手札全体に関わる列だけを計算する。
+    """
+    my_hand = state.players_cards[my_player_num]
+    hand = _cards_to_mask(my_hand)
+    suit_fields = state.suit_masks()
+    summary = tracker.summary()
+    alive = [p for p in range(state.players_num) if p != my_player_num and p not in state.out_player]
+    suits = [None] * 4
+
+    # バースト誘導: 最も脆弱な相手と、その他の相手のスート脆弱性
+    burst_tier = [0.0, 0.0, 0.0]
+    burst_suit_vuln = [0] * 4
+    burst_other_vuln = [0] * 4
+    if alive:
+        suit_vuln = {p: [max(0, 5 - count) for count in summary.suit_counts[p]] for p in alive}
+        most_vulnerable = max(alive, key=lambda p: state.pass_count[p] * 10 + max(0, 10 - summary.total[p]) * 3)
+        pass_count = state.pass_count[most_vulnerable]
+        if pass_count >= 3:
+            burst_tier[0] = 1.0
+        elif pass_count >= 2:
+            burst_tier[1] = 1.0
+        elif pass_count >= 1:
+            burst_tier[2] = 1.0
+        burst_suit_vuln = suit_vuln[most_vulnerable]
+        for p in alive:
+            if p != most_vulnerable:
+                burst_other_vuln = [total + (v if v > 2 else 0) for total, v in zip(burst_other_vuln, suit_vuln[p])]
+
+    follow = summary.follow
+    hand_rest = len(my_hand) - 1
+    opp_min_hand = min((len(h) for p, h in enumerate(state.players_cards) if p != my_player_num), default=13)
+    win_dash = 1.0 if len(my_hand) <= opp_min_hand else 0.0
+    near_burst = sum(1 for p in alive if state.pass_count[p] >= 3)
+
+    rows = []
+    for card in actions:
+        s = card.suit_index
+        entry = suits[s]
+        if entry is None:
+            entry = suits[s] = SUIT_FEATURE_TABLE.get(suit_fields[s], hand >> (13 * s) & SUIT_BITS)
+        suit_info, cards = entry
+        head, run_length, lock, lock_side, has_next, counting, tunnel_danger, has_open_neighbor = \
+            cards[card.number_index]
+
+        # トンネルロック（自分が少ない側の端は、相手がその側を多く持ちうるなら温存）
+        if lock is None:
+            side_counts = summary.high_counts if lock_side else summary.low_counts
+            lock = _LOCK_HOLD if sum(side_counts[p][s] for p in alive) > 1.5 else _LOCK_HOLD_SOFT
+
+        # ブロック
+        block_free = block_help = 0
+        if has_next:
+            for p in alive:
+                if follow[p] >> card.id & 1:
+                    block_help += 1
+                else:
+                    block_free += 1
+
+        rows.append((
+            *head, hand_rest, run_length,
+            *lock,
+            *burst_tier, burst_suit_vuln[s], suit_info[1] if alive else 0.0, burst_other_vuln[s],
+            block_free, block_help,
+            *counting, win_dash,
+            tunnel_danger, near_burst * has_open_neighbor,
+        ))
+    return np.array(rows, dtype='float64').reshape(len(actions), len(STRATEGY_FEATURES))
+
+
+# --- ルート探索のシミュレーション ---
+
+class RootSimulations:
+    """1手分のルート探索で共有するもの（get_action で1手に1回作る）。
+
+    - base_seed: 通し番号 sim のシミュレーションは random を base_seed + sim で初期化してから行う
+      （直列でもワーカーに分けても、同じ通し番号なら同じ世界・同じプレイアウトになる）
+    - next_sim: 次に使う通し番号。早期打ち切りの区切りやバンディットの各回は続きの番号を使う
+    - sampler: 確定化器（hand_masks(sim) を持つ。'random' なら None）。1手に1回だけ作る
+    - 並列探索では盤面・推論器・確定化器をワーカーへ1手に1回だけ送り（payload_sent）、以後は key で引く
+      （key はプロセス内で一意な通し番号。同じ種の手が続いても取り違えない）
+    """
+
+    __slots__ = ('key', 'state', 'tracker', 'base_seed', 'sampler', 'next_sim', 'payload_sent')
+
+    _keys = itertools.count()
+
+    def __init__(self, ai, state, tracker, sampler=None):
+        self.key = next(RootSimulations._keys)
+        self.state = state
+        self.tracker = tracker
+        self.base_seed = random.getrandbits(64)
+        self.sampler = sampler if sampler is not None else ai._world_sampler(state, tracker, self.base_seed)
+        self.next_sim = 0
+        self.payload_sent = False
+
+
+# --- 最強AI実装 (Hybrid: Rule-Based + PIMC + Inference) ---
+
+class OpponentModel:
+    """strategy.md の相手タイプ推定（強化版 + 永続的記憶）。
+    
+    各プレイヤーの行動パターンを分析し、戦略モードを判定する。
+    - Aggressive（トンネル活用型）: A/Kなどの端を積極的に出す
+    - Blocker（遅延・ハメ型）: パスを多用、中央付近を止める
+    
+    永続的記憶：試合をまたいでプレイヤーの傾向を記憶する
+    """
+    
+    # クラス変数（永続的記憶） - 試合をまたいで保持される
+    _persistent_opponent_data = {}  # プレイヤーIDごとの統計データ
+    _game_count = 0  # 総試合数
+    
+    # 定数
+    MOVING_AVERAGE_ALPHA = 0.3  # 移動平均の係数（新しい情報の重み）
+    PASS_RATE_THRESHOLD = 0.2  # パス率の閾値（これを超えるとburst_force）
+    ACE_KING_RATE_THRESHOLD = 0.3  # A/K即出し率の閾値（これを超えるとtunnel_lock）
+
+    def __init__(self, players_num):
+        self.players_num = players_num
+        # 各プレイヤーの特徴フラグ（このゲーム内のみ）
+        self.flags = {p: {
+            "aggressive": 0,
+            "blocker": 0,
+            "tunnel_usage": 0,  # トンネルを開けた回数
+            "pass_count": 0,     # パス回数
+            "end_cards": 0,      # 端カード（A/K）を出した回数
+            "middle_cards": 0,   # 中央カード（6/8）を出した回数
+            "total_actions": 0,  # 総行動回数（パス以外）
+        } for p in range(players_num)}
+        
+        # ゲーム進行度（ターン数）
+        self.turn_count = 0
+        
+        # 永続データの初期化（まだない場合）
+        for p in range(players_num):
+            if p not in OpponentModel._persistent_opponent_data:
+                OpponentModel._persistent_opponent_data[p] = {
+                    'pass_rate': 0.0,  # パス使用率（移動平均）
+                    'ace_king_immediate_rate': 0.0,  # A/K即出し率（移動平均）
+                    'tunnel_usage_rate': 0.0,  # トンネル使用率（移動平均）
+                    'game_count': 0,  # このプレイヤーとの対戦回数
+                }
+
+    def observe(self, state, player, action, pass_flag):
+        """行動観測で相手タイプを更新"""
+        self.turn_count += 1
+        
+        if pass_flag == 1:
+            self.flags[player]["pass_count"] += 1
+            self.flags[player]["blocker"] += 1
+            return
+
+        if action is None or isinstance(action, list):
+            return
+
+        # 行動をカウント
+        self.flags[player]["total_actions"] += 1
+
+        # A/K を出した → aggressive, トンネル活用
+        if action.number in (Number.ACE, Number.KING):
+            self.flags[player]["aggressive"] += 2
+            self.flags[player]["end_cards"] += 1
+            
+            # トンネルを開ける行動かチェック
+            suit_idx = action.suit_index
+            if action.number == Number.ACE:
+                # Aを出した → K側のトンネルを開ける
+                if state.field_cards[suit_idx][12] == 0:  # Kがまだ出ていない
+                    self.flags[player]["tunnel_usage"] += 1
+            elif action.number == Number.KING:
+                # Kを出した → A側のトンネルを開ける
+                if state.field_cards[suit_idx][0] == 0:  # Aがまだ出ていない
+                    self.flags[player]["tunnel_usage"] += 1
+
+        # 中央(6/8)を出した → 両方向に展開、やや blocker
+        if action.number in (Number.SIX, Number.EIGHT):
+            self.flags[player]["middle_cards"] += 1
+            self.flags[player]["blocker"] += 0.5
+
+        # J/Qあたりを出した → blocker 傾向
+        if action.number in (Number.JACK, Number.QUEEN):
+            self.flags[player]["blocker"] += 1
+    
+    def update_persistent_stats(self, player):
+        """ゲーム終了時に永続データを更新（移動平均）"""
+        flags = self.flags[player]
+        persistent = OpponentModel._persistent_opponent_data[player]
+        
+        # 総行動数（パス + 実際の行動）
+        total_turns = flags["pass_count"] + flags["total_actions"]
+        if total_turns == 0:
+            return
+        
+        # 今回のゲームでの統計
+        current_pass_rate = flags["pass_count"] / total_turns
+        safe_total_actions = max(1, flags["total_actions"])
+        current_ace_king_rate = flags["end_cards"] / safe_total_actions
+        current_tunnel_rate = flags["tunnel_usage"] / safe_total_actions
+        
+        # 移動平均で更新
+        alpha = OpponentModel.MOVING_AVERAGE_ALPHA
+        persistent['pass_rate'] = (1 - alpha) * persistent['pass_rate'] + alpha * current_pass_rate
+        persistent['ace_king_immediate_rate'] = (1 - alpha) * persistent['ace_king_immediate_rate'] + alpha * current_ace_king_rate
+        persistent['tunnel_usage_rate'] = (1 - alpha) * persistent['tunnel_usage_rate'] + alpha * current_tunnel_rate
+        persistent['game_count'] += 1
+    
+    def get_persistent_stats(self, player):
+        """プレイヤーの永続統計を取得"""
+        if player in OpponentModel._persistent_opponent_data:
+            return OpponentModel._persistent_opponent_data[player]
+        return None
+
+    def mode(self, player):
+        """プレイヤーの戦略モードを判定
+        
+        Returns:
+            - "tunnel_lock": トンネル活用型（A/Kを積極的に使う）→ トンネルロックで対抗
+            - "burst_force": パス多用型（詰まりやすい）→ バースト誘導で対抗
+            - "neutral": 中立型
         """
         flags = self.flags[player]
         a = flags["aggressive"]
@@ -723,13 +2926,53 @@ class HybridStrongestAI:
     # 定数
     MAX_GAME_RESULTS_HISTORY = 100  # 結果履歴の最大保持数
     
-    def __init__(self, my_player_num, simulation_count=50):
+    def __init__(self, my_player_num, simulation_count=50, engine=None, workers=None, time_budget_ms=None,
+                 root_allocation=None, early_stopping=None, early_stop_confidence=None,
+                 paired_rollouts=None, determinization=None, enumeration_threshold=None, endgame_cards=None,
+                 search=None, rave=None):
         self.my_player_num = my_player_num
         self.simulation_count = simulation_count
+        # シミュレーション用エンジン（None の場合は SIMULATION_ENGINE）
+        self.engine = engine if engine is not None else SIMULATION_ENGINE
+        # 並列探索のワーカープロセス数（None の場合は PARALLEL_WORKERS、0 は直列）
+        self.workers = workers if workers is not None else PARALLEL_WORKERS
+        # 1手あたりの持ち時間（None の場合は TIME_BUDGET_MS、それも None なら回数で打ち切る）
+        self.time_budget_ms = time_budget_ms if time_budget_ms is not None else TIME_BUDGET_MS
+        # ルート候補へのプレイアウト配分（None の場合は ROOT_ALLOCATION）
+        self.root_allocation = root_allocation if root_allocation is not None else ROOT_ALLOCATION
+        # 早期打ち切り（None の場合は ENABLE_EARLY_STOPPING / EARLY_STOP_CONFIDENCE）
+        self.early_stopping = early_stopping if early_stopping is not None else ENABLE_EARLY_STOPPING
+        self.early_stop_confidence = early_stop_confidence if early_stop_confidence is not None else EARLY_STOP_CONFIDENCE
+        # 共通乱数（None の場合は PAIRED_ROLLOUTS）と、そのためのロールアウト専用の乱数生成器
+        self.paired_rollouts = paired_rollouts if paired_rollouts is not None else PAIRED_ROLLOUTS
+        self._rollout_rng = random.Random()
+        # 確定化の方式（None の場合は DETERMINIZATION_MODE）
+        self.determinization = determinization if determinization is not None else DETERMINIZATION_MODE
+        self.enumeration_threshold = (enumeration_threshold if enumeration_threshold is not None
+                                      else WORLD_ENUMERATION_THRESHOLD)
+        # 終盤ソルバーを使う手札合計の上限（None の場合は ENDGAME_SOLVER_CARDS、0 は使わない）
+        self.endgame_cards = endgame_cards if endgame_cards is not None else ENDGAME_SOLVER_CARDS
+        self._endgame_solver = EndgameSolver(my_player_num)
+        # 探索方式（None の場合は SEARCH_MODE）
+        self.search = search if search is not None else SEARCH_MODE
+        # AMAF/RAVE（None の場合は ENABLE_RAVE。root_allocation='uniform' の PIMC で使う）
+        self.rave = rave if rave is not None else ENABLE_RAVE
+        # 探索した手数と、そのうち早期打ち切りした手数
+        self.searched_moves = 0
+        self.early_stopped_moves = 0
+        # 直前の探索の記録（確定化の回数・候補ごとのプレイアウト回数・経過時間・時間切れでヒューリスティックに頼ったか）
+        self.last_search = {}
 
         self._opponent_model = None
+        # 手番をまたいで差分更新する推論器（履歴のカーソルを持つ）
+        self._history_tracker = IncrementalTracker(my_player_num)
+        # determinization='particle' の信念状態（粒子は手番をまたいで使い回す）
+        self._belief = ParticleBelief(my_player_num)
         # シミュレーション内で再帰的にPIMCを呼ばないためのガード
         self._in_simulation = False
+        # シミュレーション用BitStateのプール（engine='bit'）
+        self._state_pool = BitStatePool()
+        self._rollout_state = RolloutState()
         
         # 初回のみ重みを初期化
         if HybridStrongestAI._best_weights is None:
@@ -799,6 +3042,8 @@ class HybridStrongestAI:
         """次のゲームの準備（trial_weightsを生成）"""
         if ENABLE_ONLINE_LEARNING:
             HybridStrongestAI._trial_weights = self._generate_trial_weights()
+        self._history_tracker.reset()
+        self._belief.reset()
     
     def get_current_weights(self):
         """現在使用中の重み（trial_weights）を取得"""
@@ -806,17 +3051,24 @@ class HybridStrongestAI:
             return HybridStrongestAI._trial_weights
         return ADVANCED_HEURISTIC_PARAMS
 
-    def get_action(self, state):
+    def get_action(self, state, time_budget_ms=None):
+        """手を選ぶ。time_budget_ms（省略時は self.time_budget_ms）を指定すると、締め切りまでシミュレーションを
+        続ける anytime 探索になる。1回もシミュレーションが終わらなければ戦略評価だけで選ぶ。"""
         # シミュレーション中は軽量なロールアウトポリシーで打つ（AI同士前提でも無限再帰を防ぐ）
         if self._in_simulation:
             return self._rollout_policy_action(state)
 
+        started = time.time()
+        if time_budget_ms is None:
+            time_budget_ms = self.time_budget_ms
+        deadline = started + time_budget_ms / 1000.0 if time_budget_ms is not None else None
+
         # opponent model 初期化
         if self._opponent_model is None or self._opponent_model.players_num != state.players_num:
             self._opponent_model = OpponentModel(state.players_num)
 
-        # 直近の履歴から相手傾向を更新
-        for (p, a, pf) in state.history[-5:]:
+        # 前回から増えた履歴だけを再生し、推論器と相手傾向を同じカーソルで更新（1手を1回だけ観測する）
+        for (p, a, pf) in self._history_tracker.sync(state):
             self._opponent_model.observe(state, p, a, pf)
 
         my_actions = state.my_actions()
@@ -834,7 +3086,10 @@ class HybridStrongestAI:
                 return None, 1
             return candidates[0], 0
 
-        tracker = self._build_tracker_from_history(state)
+        tracker = self._history_tracker.tracker
+        if self.determinization == 'particle':
+            # 粒子を新しい履歴で更新（この手の確定化は粒子から引く）
+            self._belief.sync(state, self._history_tracker)
         
         # 新機能：ゲーム状態を評価して適応的に戦略を調整
         game_state_info = self._evaluate_game_state(state)
@@ -853,37 +3108,112 @@ class HybridStrongestAI:
         elif len(candidates) <= 5:
             actual_sim_count = int(self.simulation_count * 1.2)
 
-        for _ in range(actual_sim_count):
-            determinized_state = self._create_determinized_state_with_constraints(state, tracker)
-
-            for first_action in candidates:
-                sim_state = determinized_state.clone()
-
-                if first_action is None:
-                    sim_state.next(None, 1)
-                else:
-                    sim_state.next(first_action, 0)
-
-                winner = self._playout(sim_state)
-
-                # より詳細なスコアリング
-                if winner == self.my_player_num:
-                    action_scores[first_action] += 2  # 勝利は+2点
-                elif winner == -1:
-                    # 引き分け（全員バースト）は0点
-                    pass
-                else:
-                    action_scores[first_action] -= 1  # 負けは-1点
-                    
-                    # 手札枚数による追加評価（終了時点での手札が少ないほど良い）
-                    my_remaining = len(sim_state.players_cards[self.my_player_num])
-                    winner_remaining = len(sim_state.players_cards[winner])
-                    
-                    # 手札差に応じた細かいスコア調整
-                    if my_remaining < winner_remaining:
-                        action_scores[first_action] += 0.3  # 惜しい負けは少しプラス
-                    elif my_remaining - winner_remaining >= 3:
-                        action_scores[first_action] -= 0.3  # 大差の負けは少しマイナス
+        # 終盤で推論と整合する世界が少なければ、無作為に確定化する代わりに全世界を1回ずつ列挙する
+        world_sampler = None
+        if self.search == 'pimc' and self.enumeration_threshold > 0:
+            world_sampler = ExactWorldSampler(state, tracker, self.my_player_num)
+            if not world_sampler.enumerate_worlds(self.enumeration_threshold):
+                world_sampler = None
+
+        # PIMC の各方式が共有する1手分の乱数の種・通し番号・確定化器
+        root_sims = RootSimulations(self, state, tracker, world_sampler) if self.search == 'pimc' else None
+
+        stopped_early = False
+        settled_action = None  # 早期打ち切りで首位と判定した候補
+        if self.search == 'ismcts':
+            # 情報集合MCTS。プレイアウト数は全候補同数の PIMC と同じ（actual_sim_count × 候補数）で、
+            # バンディットと同じく 平均 × actual_sim_count を合計スコアとして使う
+            iterations = actual_sim_count * len(candidates) if deadline is None else None
+            totals, visits, simulations = ISMCTSSearch(self, state, tracker, candidates, strategic_bonus,
+                                                       actual_sim_count).run(iterations, deadline)
+            for action in candidates:
+                if visits[action]:
+                    action_scores[action] = totals[action] / visits[action] * actual_sim_count
+        elif world_sampler is not None:
+            # 世界ごとに1回ずつ。戦略ボーナスと釣り合うよう、平均 × actual_sim_count を合計スコアとして使う
+            outcomes = self._run_simulations(root_sims, candidates, world_sampler.world_count, deadline)
+            for sim_outcomes in outcomes:
+                for first_action, outcome in zip(candidates, sim_outcomes):
+                    self._score_outcome(action_scores, first_action, outcome)
+            simulations = len(outcomes)
+            if simulations:
+                for action in candidates:
+                    action_scores[action] = action_scores[action] / simulations * actual_sim_count
+            visits = {action: simulations for action in candidates}
+        elif self.root_allocation == 'uniform':
+            # 確定化→全候補のプレイアウト（持ち時間がある場合は回数の上限を設けず締め切りまで回す）
+            # 早期打ち切りありの場合は EARLY_STOP_CHECK_INTERVAL 回ごとに区切って判定する
+            remaining = actual_sim_count if deadline is None else None
+            # 候補間のスコアの積和（対になった差の分散を求める）
+            score_products = np.zeros((len(candidates), len(candidates)))
+            # AMAF: 各プレイアウトの点数を、初手と、その後に自分が出した候補カードすべてに数える
+            amaf_totals = {action: 0 for action in candidates}
+            amaf_counts = {action: 0 for action in candidates}
+            candidate_bits = [0 if action is None else 1 << action.id for action in candidates]
+            simulations = 0
+            while True:
+                chunk = remaining
+                if self.early_stopping:
+                    chunk = EARLY_STOP_CHECK_INTERVAL if remaining is None else min(EARLY_STOP_CHECK_INTERVAL, remaining)
+                outcomes = self._run_simulations(root_sims, candidates, chunk, deadline)
+                for sim_outcomes in outcomes:
+                    scores = np.array([self._score_outcome(action_scores, first_action, outcome)
+                                       for first_action, outcome in zip(candidates, sim_outcomes)])
+                    score_products += np.outer(scores, scores)
+                    if self.rave:
+                        for i, (outcome, score) in enumerate(zip(sim_outcomes, scores.tolist())):
+                            played = outcome[3]
+                            for j, action in enumerate(candidates):
+                                if i == j or played & candidate_bits[j]:
+                                    amaf_totals[action] += score
+                                    amaf_counts[action] += 1
+                simulations += len(outcomes)
+                if remaining is not None:
+                    remaining -= len(outcomes)
+                if not self.early_stopping or remaining == 0 or len(outcomes) < chunk:
+                    break
+                if simulations >= EARLY_STOP_MIN_SIMS:
+                    # 首位は最終的に比べる値（AMAF を混ぜる場合は混ぜた後の平均）で決める
+                    ranking_sums = None
+                    if self.rave:
+                        ranking_sums = dict(action_scores)
+                        self._blend_amaf(candidates, ranking_sums, amaf_totals, amaf_counts, simulations)
+                    leader = self._is_best_action_settled(candidates, action_scores, score_products, simulations,
+                                                          actual_sim_count, strategic_bonus, ranking_sums)
+                    if leader is not None:
+                        stopped_early = True
+                        settled_action = candidates[leader]
+                        break
+            if self.rave and simulations:
+                self._blend_amaf(candidates, action_scores, amaf_totals, amaf_counts, simulations)
+            # 持ち時間・早期打ち切りで回数が actual_sim_count と違っても戦略ボーナスとの釣り合いが変わらないよう、
+            # ほかの方式と同じく 平均 × actual_sim_count を合計スコアとして使う
+            if simulations:
+                for action in candidates:
+                    action_scores[action] = action_scores[action] / simulations * actual_sim_count
+            visits = {action: simulations for action in candidates}
+        else:
+            # バンディットで見込みのある候補にプレイアウトを寄せる。回数が候補ごとに違うので、
+            # 平均 × actual_sim_count を全候補同数の場合の合計スコアに相当する値として使う
+            totals, visits, simulations = self._allocate_root_bandit(
+                root_sims, candidates, actual_sim_count, strategic_bonus, deadline)
+            for action in candidates:
+                if visits[action]:
+                    action_scores[action] = totals[action] / visits[action] * actual_sim_count
+
+        # 時間切れで1回も終わらなかった場合、スコアは戦略ボーナスのみ（= _evaluate_strategic_actions の順位）になる
+        self.searched_moves += 1
+        if stopped_early:
+            self.early_stopped_moves += 1
+        self.last_search = {
+            'simulations': simulations,
+            'stopped_early': stopped_early,
+            'settled_action': settled_action,
+            'visits': visits,
+            'playouts': sum(visits.values()),
+            'elapsed_ms': (time.time() - started) * 1000.0,
+            'fallback': not any(visits.values()),
+        }
         
         # Phase 2改善: 戦略ボーナスを加算（重要度を高める）
         for action in candidates:
@@ -891,7 +3221,8 @@ class HybridStrongestAI:
                 # 戦略ボーナスの影響を調整
                 action_scores[action] += strategic_bonus[action] * STRATEGY_WEIGHT_MULTIPLIER
 
-        best_action = max(action_scores, key=action_scores.get)
+        # 早期打ち切りした場合は判定した首位をそのまま選ぶ（式の違う丸め誤差で同点付近の順位が入れ替わらないように）
+        best_action = settled_action if stopped_early else max(action_scores, key=action_scores.get)
         best_score = action_scores[best_action]
         
         # 戦略的パス判断（参考コード由来の高度な戦略）
@@ -941,80 +3272,11 @@ class HybridStrongestAI:
         return best_action, 0
 
     def _rollout_policy_action(self, state):
-        """プレイアウト用の軽量ポリシー（再帰禁止）。
-        
-        参考用コード（xq-kessyou-main）の戦略を統合した強化版。
-        スコアリングベースの判断で、より精密な選択を行う。
-        """
-        my_actions = state.my_actions()
-        if not my_actions:
+        """プレイアウト用の軽量ポリシー（再帰禁止）。採点は RolloutPolicy を参照。"""
+        card_id = ROLLOUT_POLICY.choose(state)
+        if card_id < 0:
             return None, 1
-
-        my_hand = state.players_cards[state.turn_player]
-        
-        # スコアリングベースで最適なアクションを選択（参考コードの手法）
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
-        action_scores = {}
-        
-        # 各スートのカード枚数をカウント
-        suit_counts = {suit: 0 for suit in Suit}
-        for card in my_hand:
-            suit_counts[card.suit] += 1
-        
-        for action in my_actions:
-            score = 0
-            suit_idx = suit_to_index[action.suit]
-            num_idx = action.number.val - 1
-            
-            # 1. A/K優先
-            if num_idx == 0 or num_idx == 12:
-                score += ROLLOUT_ACE_KING_BONUS
-            
-            # 2. 隣接カード分析
-            next_indices = []
-            if num_idx < 6:
-                next_indices.append(num_idx - 1)
-            elif num_idx > 6:
-                next_indices.append(num_idx + 1)
-            
-            for next_idx in next_indices:
-                if 0 <= next_idx <= 12:
-                    if state.field_cards[suit_idx][next_idx] == 1:
-                        # 次のカードが既に場にある
-                        score += ROLLOUT_ADJACENT_BONUS
-                    else:
-                        # 次のカードが場にない
-                        score -= ROLLOUT_ADJACENT_PENALTY
-                        # 自分が持っているかチェック
-                        next_num = self._index_to_number(next_idx)
-                        if next_num:
-                            next_card = Card(action.suit, next_num)
-                            if next_card in my_hand:
-                                score += ROLLOUT_SAFE_BONUS
-            
-            # 3. スート集中戦略
-            score += suit_counts[action.suit] * ROLLOUT_SUIT_MULTIPLIER
-            
-            # 4. 手札削減インセンティブ
-            score += (len(my_hand) - 1) * ROLLOUT_HAND_REDUCTION
-            
-            # 5. 連鎖可能性
-            potential_new_moves = 0
-            for c in my_hand:
-                if c.suit == action.suit:
-                    c_idx = c.number.val - 1
-                    if (num_idx < 6 and c_idx == num_idx - 1) or \
-                       (num_idx > 6 and c_idx == num_idx + 1):
-                        potential_new_moves += 1
-            score += potential_new_moves * ROLLOUT_CHAIN_MULTIPLIER
-            
-            action_scores[action] = score
-        
-        # 最高スコアのアクションを選択（同点の場合はランダム）
-        max_score = max(action_scores.values())
-        best_actions = [a for a, s in action_scores.items() if s == max_score]
-        
-        return random.choice(best_actions), 0
+        return CARDS[card_id], 0
     
     def _evaluate_game_state(self, state):
         """ゲームの現在の状態を評価し、戦略調整のための情報を返す
@@ -1053,1084 +3315,209 @@ class HybridStrongestAI:
             avg_opponent_size = sum(opponent_hand_sizes) / len(opponent_hand_sizes)
             if my_hand_size < avg_opponent_size - 2:
                 my_position = 'leading'
-            elif my_hand_size > avg_opponent_size + 2:
-                my_position = 'behind'
-            else:
-                my_position = 'middle'
-        
-        # 緊急度（パス回数に基づく）
-        my_pass_count = state.pass_count[self.my_player_num]
-        urgency = min(1.0, my_pass_count / 3.0)
-        
-        # 推奨攻撃度の計算
-        aggressiveness = 0.5  # ベースライン
-        
-        if phase == 'late':
-            aggressiveness += 0.3  # 終盤は積極的に
-        elif phase == 'early':
-            aggressiveness -= 0.1  # 序盤は慎重に
-        
-        if my_position == 'leading':
-            aggressiveness += 0.2  # リードしている場合は攻撃的に
-        elif my_position == 'behind':
-            aggressiveness -= 0.1  # 遅れている場合はやや慎重に
-        
-        if urgency > 0.6:
-            aggressiveness += 0.2  # バースト危機は積極的にカードを出す
-        
-        aggressiveness = max(0.0, min(1.0, aggressiveness))
-        
-        return {
-            'phase': phase,
-            'my_position': my_position,
-            'urgency': urgency,
-            'aggressiveness': aggressiveness,
-            'my_hand_size': my_hand_size,
-            'opponent_hand_sizes': opponent_hand_sizes
-        }
-    
-    def _count_run_length(self, action, my_hand):
-        """連続して出せるカードの長さを数える"""
-        num_idx = action.number.val - 1
-        suit = action.suit
-        run_length = 0
-        
-        if num_idx < 6:  # 7より小さい側
-            check_idx = num_idx - 1
-            while check_idx >= 0:
-                next_card = Card(suit, self._index_to_number(check_idx))
-                if next_card in my_hand:
-                    run_length += 1
-                    check_idx -= 1
-                else:
-                    break
-        elif num_idx > 6:  # 7より大きい側
-            check_idx = num_idx + 1
-            while check_idx <= 12:
-                next_card = Card(suit, self._index_to_number(check_idx))
-                if next_card in my_hand:
-                    run_length += 1
-                    check_idx += 1
-                else:
-                    break
-        
-        return run_length
-    
-    def _evaluate_strategic_actions(self, state, tracker, my_actions, game_state_info):
-        """Phase 2改善: 戦略的評価（強化版）
-        
-        OpponentModelに基づいて動的に戦略重み付けを変更
-        - Tunnel Lock モード: トンネル封鎖戦略を強化
-        - Burst Force モード: バースト誘導戦略を強化
-        - Neutral モード: バランス型
-        
-        さらにゲーム状態に応じて適応的に重みを調整
-        """
-        bonus = {}
-        my_hand = state.players_cards[self.my_player_num]
-        
-        # 相手モードの取得と重み係数の設定
-        mode_weights = {"tunnel_lock": 1.0, "burst_force": 1.0, "heuristic": 1.0}
-        
-        # ゲーム状態に応じた重み調整
-        aggressiveness = game_state_info['aggressiveness']
-        phase = game_state_info['phase']
-        
-        if self._opponent_model:
-            # 各相手のモードを判定し、最も脅威度の高い相手に合わせて戦略を調整
-            opponent_modes = []
-            threat_levels = []
-            
-            for p in range(state.players_num):
-                if p != self.my_player_num and p not in state.out_player:
-                    mode = self._opponent_model.mode(p)
-                    threat = self._opponent_model.get_threat_level(p)
-                    opponent_modes.append(mode)
-                    threat_levels.append((p, mode, threat))
-            
-            # 最も脅威度の高い相手に合わせて重み調整
-            if threat_levels:
-                threat_levels.sort(key=lambda x: x[2], reverse=True)
-                primary_opponent_mode = threat_levels[0][1]
-                
-                if primary_opponent_mode == "tunnel_lock":
-                    # トンネル活用型の相手 → トンネルロック戦略を強化
-                    mode_weights["tunnel_lock"] = TUNNEL_LOCK_WEIGHT * (1.0 + aggressiveness * AGGRESSIVENESS_MULTIPLIER)
-                    mode_weights["burst_force"] = 0.8
-                elif primary_opponent_mode == "burst_force":
-                    # パス多用型の相手 → バースト誘導戦略を強化
-                    mode_weights["burst_force"] = BURST_FORCE_WEIGHT * (1.0 + aggressiveness * AGGRESSIVENESS_MULTIPLIER)
-                    mode_weights["tunnel_lock"] = 0.8
-        
-        # フェーズに応じた戦略調整
-        if phase == 'late':
-            # 終盤は確実性重視
-            mode_weights["heuristic"] = 1.5
-        elif phase == 'early':
-            # 序盤はバランス重視
-            mode_weights["tunnel_lock"] *= 0.8
-            mode_weights["burst_force"] *= 0.8
-        
-        # トンネルロック戦略
-        if ENABLE_TUNNEL_LOCK:
-            tunnel_bonus = self._evaluate_tunnel_lock_advanced(state, tracker, my_hand, my_actions)
-            for action, score in tunnel_bonus.items():
-                bonus[action] = bonus.get(action, 0) + (score * mode_weights["tunnel_lock"])
-        
-        # バースト誘導戦略
-        if ENABLE_BURST_FORCE:
-            burst_bonus = self._evaluate_burst_force_advanced(state, tracker, my_actions)
-            for action, score in burst_bonus.items():
-                bonus[action] = bonus.get(action, 0) + (score * mode_weights["burst_force"])
-        
-        # 参考用コードからのヒューリスティック戦略を適用
-        heuristic_bonus = self._evaluate_heuristic_strategy(state, my_hand, my_actions)
-        for action, score in heuristic_bonus.items():
-            bonus[action] = bonus.get(action, 0) + (score * mode_weights["heuristic"])
-        
-        # 連続カード（ラン）戦略
-        run_bonus = self._evaluate_run_strategy(state, my_hand, my_actions)
-        for action, score in run_bonus.items():
-            bonus[action] = bonus.get(action, 0) + (score * (1.0 + aggressiveness * 0.2))
-        
-        # ゲーム終盤戦略（残り手札が少ない場合）
-        if len(my_hand) <= 5 or phase == 'late':
-            endgame_bonus = self._evaluate_endgame_strategy(state, my_hand, my_actions, game_state_info)
-            for action, score in endgame_bonus.items():
-                bonus[action] = bonus.get(action, 0) + score
-        
-        # ブロック戦略（相手を詰まらせる）
-        block_bonus = self._evaluate_block_strategy(state, tracker, my_actions)
-        for action, score in block_bonus.items():
-            bonus[action] = bonus.get(action, 0) + (score * (1.0 - aggressiveness * AGGRESSIVENESS_MULTIPLIER))
-        
-        # 新機能：カードカウンティング戦略
-        counting_bonus = self._evaluate_card_counting_strategy(state, tracker, my_hand, my_actions)
-        for action, score in counting_bonus.items():
-            bonus[action] = bonus.get(action, 0) + score
-        
-        # 新機能：参考コード由来の高度なヒューリスティック戦略
-        advanced_heuristic_bonus = self._evaluate_advanced_heuristic_strategy(state, my_hand, my_actions)
-        for action, score in advanced_heuristic_bonus.items():
-            bonus[action] = bonus.get(action, 0) + (score * ADVANCED_HEURISTIC_WEIGHT)
-        
-        return bonus
-    
-    def _evaluate_heuristic_strategy(self, state, my_hand, my_actions):
-        """参考用コード（xq-kessyou-main/7narabe_answer.ipynb）のヒューリスティック戦略（強化版）
-        
-        トンネルルール対応版:
-        - 次のカードを自分が持っている場合にボーナス
-        - 同じスートのカード数によるボーナス
-        - 自分の新たなアクションを開くカードへのボーナス
-        - 隣接カードが場にあるかチェック
-        - A/K優先度の動的調整（参考コードの戦略を統合）
-        """
-        bonus = {}
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
-        
-        # 各スートのカード枚数をカウント
-        suit_counts = {suit: 0 for suit in Suit}
-        for card in my_hand:
-            suit_counts[card.suit] += 1
-        
-        for card in my_actions:
-            suit = card.suit
-            suit_index = suit_to_index[suit]
-            number_index = card.number.val - 1  # 0-based index
-            score = 0
-            
-            # 参考コードからの改善1: A/Kの基本優先度を上げる
-            # A/Kは両端なので、相手への道を開かないため基本的に有利
-            if number_index == 0 or number_index == 12:
-                score += ACE_KING_BASE_BONUS
-            
-            # トンネルルール対応：A/Kの扱いをさらに精密化
-            is_ace_out = state.field_cards[suit_index][0] == 1
-            is_king_out = state.field_cards[suit_index][12] == 1
-            
-            # トンネルが形成されている場合の追加ボーナス
-            if number_index == 0:  # A
-                if is_king_out:
-                    # Kが出ている場合、Aを出すとトンネルが完成 → より有利
-                    score += TUNNEL_COMPLETE_BONUS
-                else:
-                    # Kが出ていない場合でも、A側を進めることは重要
-                    score += 3  # 控えめなボーナス
-            elif number_index == 12:  # K
-                if is_ace_out:
-                    # Aが出ている場合、Kを出すとトンネルが完成 → より有利
-                    score += TUNNEL_COMPLETE_BONUS
-                else:
-                    # Aが出ていない場合でも、K側を進めることは重要
-                    score += 3  # 控えめなボーナス
-            
-            # 参考コードからの改善2: 隣接カードのチェックを強化
-            next_indices = []
-            if number_index < 6:  # 7より小さい側
-                next_indices.append(number_index - 1)
-            elif number_index > 6:  # 7より大きい側
-                next_indices.append(number_index + 1)
-            
-            for next_number_index in next_indices:
-                if 0 <= next_number_index <= 12:
-                    if state.field_cards[suit_index][next_number_index] == 1:
-                        # 次のカードがすでに場にある → 良い
-                        score += ADJACENT_CARD_BONUS
-                    else:
-                        # 次のカードが場にない → 相手に道を開く可能性
-                        score -= ADJACENT_CARD_PENALTY
-                        
-                        # ただし、次のカードを自分が持っていれば軽減（Safe判定）
-                        next_number = self._index_to_number(next_number_index)
-                        if next_number:
-                            next_card = Card(suit, next_number)
-                            if next_card in my_hand:
-                                score += SAFE_MOVE_BONUS  # 次のカードを自分が持っている → 完全に制御可能
-            
-            # 参考コードからの改善3: 同じスートのカード数が多いほどボーナス
-            # 自分が多く持っているスートを積極的に進めることで、連鎖的に出せる
-            score += suit_counts[suit] * SUIT_CONCENTRATION_MULTIPLIER
-            
-            # 参考コードからの改善4: 手札を減らすインセンティブ
-            # 全体的に手札を減らす方向にインセンティブ
-            score += (len(my_hand) - 1) * HAND_REDUCTION_BONUS
-            
-            # 参考コードからの改善5: 自分の新たなアクションを開くカードへの高いボーナス
-            potential_new_moves = 0
-            for c in my_hand:
-                if c.suit == suit:
-                    c_index = c.number.val - 1
-                    # このカードを出すことで次に出せるようになるカードがあるか
-                    if (number_index < 6 and c_index == number_index - 1) or \
-                       (number_index > 6 and c_index == number_index + 1):
-                        potential_new_moves += 1
-            score += potential_new_moves * CHAIN_POTENTIAL_MULTIPLIER
-            
-            bonus[card] = score
-        
-        return bonus
-    
-    def _index_to_number(self, index):
-        """0-based indexをNumber Enumに変換"""
-        number_list = [Number.ACE, Number.TWO, Number.THREE, Number.FOUR,
-                       Number.FIVE, Number.SIX, Number.SEVEN, Number.EIGHT,
-                       Number.NINE, Number.TEN, Number.JACK, Number.QUEEN, Number.KING]
-        if 0 <= index <= 12:
-            return number_list[index]
-        return None
-    
-    def _evaluate_tunnel_lock(self, state, my_hand, my_actions):
-        """トンネルロック戦略（改善版）
-        
-        トンネルルール:
-        - Aが出た場合、K側（8→...→K）のみ伸ばせる
-        - Kが出た場合、A側（A→...→6）のみ伸ばせる
-        
-        戦略:
-        - 相手がトンネルを開けている場合（A or K が出ている）、
-          逆側の端カードを温存して封鎖することで相手を詰まらせる
-        - ただし、自分がその方向に多くのカードを持っている場合は出した方が良い
-        """
-        bonus = {}
-        
-        for suit_idx, suit in enumerate(Suit):
-            is_ace_out = state.field_cards[suit_idx][0] == 1
-            is_king_out = state.field_cards[suit_idx][12] == 1
-            
-            # 自分がこのスートで持っているカードの方向性を分析
-            my_high_cards = 0  # 8-K側のカード
-            my_low_cards = 0   # A-6側のカード
-            for card in my_hand:
-                if card.suit == suit:
-                    if card.number.val >= 8:
-                        my_high_cards += 1
-                    elif card.number.val <= 6:
-                        my_low_cards += 1
-            
-            # Aが出ている場合（K側のみ伸ばせる）
-            if is_ace_out and not is_king_out:
-                k_card = Card(suit, Number.KING)
-                if k_card in my_hand and k_card in my_actions:
-                    # 自分がK側に多くのカードを持っている場合は出した方が良い
-                    if my_high_cards >= 3:
-                        bonus[k_card] = 8  # Kを出してトンネルを閉じる
-                    else:
-                        # Kを温存して相手を詰まらせる
-                        bonus[k_card] = -10
-            
-            # Kが出ている場合（A側のみ伸ばせる）
-            if is_king_out and not is_ace_out:
-                a_card = Card(suit, Number.ACE)
-                if a_card in my_hand and a_card in my_actions:
-                    # 自分がA側に多くのカードを持っている場合は出した方が良い
-                    if my_low_cards >= 3:
-                        bonus[a_card] = 8  # Aを出してトンネルを閉じる
-                    else:
-                        # Aを温存して相手を詰まらせる
-                        bonus[a_card] = -10
-        
-        return bonus
-    
-    def _evaluate_tunnel_lock_advanced(self, state, tracker, my_hand, my_actions):
-        """トンネルロック戦略（強化版）
-        
-        確率的推論を活用した高度なトンネル封鎖戦略:
-        - 相手の手札確率分布を考慮
-        - トンネル状態の詳細分析
-        - 複数の相手を同時に考慮
-        """
-        bonus = {}
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
-        
-        for suit_idx, suit in enumerate(Suit):
-            is_ace_out = state.field_cards[suit_idx][0] == 1
-            is_king_out = state.field_cards[suit_idx][12] == 1
-            
-            # 自分がこのスートで持っているカードの方向性を詳細に分析
-            my_high_cards = []  # 8-K側のカード
-            my_low_cards = []   # A-6側のカード
-            for card in my_hand:
-                if card.suit == suit:
-                    if card.number.val >= 8:
-                        my_high_cards.append(card)
-                    elif card.number.val <= 6:
-                        my_low_cards.append(card)
-            
-            # 相手がこの方向に持っている可能性を計算
-            for action in my_actions:
-                if action.suit != suit:
-                    continue
-                
-                action_val = action.number.val
-                
-                # Aが出ている場合（K側のみ伸ばせる）
-                if is_ace_out and not is_king_out and action_val == 13:
-                    # K を出すかどうかの判断
-                    
-                    # 相手がK側（8-K）に持っている期待枚数を計算
-                    opponent_high_expectation = 0
-                    for p in range(state.players_num):
-                        if p != self.my_player_num and p not in state.out_player:
-                            for num_val in range(8, 14):
-                                num = self._index_to_number(num_val - 1)
-                                if num:
-                                    check_card = Card(suit, num)
-                                    # set-based: カードが possible[p] に含まれるかチェック
-                                    if check_card in tracker.possible[p]:
-                                        opponent_high_expectation += 1
-                    
-                    # 自分が多く持っている場合は出す、少ない場合は温存
-                    if len(my_high_cards) >= 4:
-                        # 自分が支配的 → 出してトンネルを完成させる
-                        bonus[action] = 15
-                    elif len(my_high_cards) <= 2 and opponent_high_expectation > 1.5:
-                        # 相手が多く持っている可能性 → 温存して封鎖
-                        bonus[action] = -20
-                    else:
-                        # 中間的 → やや温存
-                        bonus[action] = -5
-                
-                # Kが出ている場合（A側のみ伸ばせる）
-                elif is_king_out and not is_ace_out and action_val == 1:
-                    # A を出すかどうかの判断
-                    
-                    # 相手がA側（A-6）に持っている期待枚数を計算
-                    opponent_low_expectation = 0
-                    for p in range(state.players_num):
-                        if p != self.my_player_num and p not in state.out_player:
-                            for num_val in range(1, 7):
-                                num = self._index_to_number(num_val - 1)
-                                if num:
-                                    check_card = Card(suit, num)
-                                    # set-based: カードが possible[p] に含まれるかチェック
-                                    if check_card in tracker.possible[p]:
-                                        opponent_low_expectation += 1
-                    
-                    # 自分が多く持っている場合は出す、少ない場合は温存
-                    if len(my_low_cards) >= 4:
-                        # 自分が支配的 → 出してトンネルを完成させる
-                        bonus[action] = 15
-                    elif len(my_low_cards) <= 2 and opponent_low_expectation > 1.5:
-                        # 相手が多く持っている可能性 → 温存して封鎖
-                        bonus[action] = -20
-                    else:
-                        # 中間的 → やや温存
-                        bonus[action] = -5
-                
-                # トンネルを開ける行動（AまたはKを先に出す）
-                elif not is_ace_out and not is_king_out:
-                    if action_val == 1:  # Aを出す → K側を開放
-                        # 自分がK側に多く持っているなら有利
-                        if len(my_high_cards) >= len(my_low_cards) + 2:
-                            bonus[action] = 10
-                        else:
-                            bonus[action] = -5  # 相手に有利になる可能性
-                    elif action_val == 13:  # Kを出す → A側を開放
-                        # 自分がA側に多く持っているなら有利
-                        if len(my_low_cards) >= len(my_high_cards) + 2:
-                            bonus[action] = 10
-                        else:
-                            bonus[action] = -5  # 相手に有利になる可能性
-        
-        return bonus
-    
-    def _evaluate_burst_force_advanced(self, state, tracker, my_actions):
-        """バースト誘導戦略（強化版）
-        
-        確率的推論を活用した高度なバースト誘導:
-        - 各相手のパス回数と確率分布から脆弱性を特定
-        - 最も詰まりやすい相手を狙い撃ち
-        - 複数スートの同時攻撃
-        """
-        bonus = {}
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
-        
-        # 各プレイヤーの脆弱性スコアを計算
-        vulnerability = {}
-        for player in range(state.players_num):
-            if player == self.my_player_num or player in state.out_player:
-                continue
-            
-            pass_count = state.pass_count[player]
-            
-            # パス回数が多いほど脆弱
-            vuln_score = pass_count * 10
-            
-            # 期待手札枚数が多いほど危険（まだ余裕がある）
-            # set-based: possible[player]のサイズで推定
-            expected_hand_size = len(tracker.possible[player])
-            vuln_score += max(0, 10 - expected_hand_size) * 3
-            
-            # 各スートの所持確率を分析
-            suit_vulnerabilities = {}
-            for suit in Suit:
-                suit_card_count = 0
-                for num in Number:
-                    card = Card(suit, num)
-                    # set-based: カードが possible[player] に含まれるかチェック
-                    if card in tracker.possible[player]:
-                        suit_card_count += 1
-                
-                # 所持可能性が低いスートほど脆弱
-                suit_vulnerabilities[suit] = max(0, 5 - suit_card_count)
-            
-            vulnerability[player] = {
-                'total': vuln_score,
-                'suits': suit_vulnerabilities
-            }
-        
-        # 最も脆弱な相手を特定
-        if not vulnerability:
-            return bonus
-        
-        most_vulnerable_player = max(vulnerability.keys(), key=lambda p: vulnerability[p]['total'])
-        
-        # アクションにボーナスを付与
-        for action in my_actions:
-            action_bonus = 0
-            
-            # 最も脆弱な相手に対して
-            if most_vulnerable_player in vulnerability:
-                player_vuln = vulnerability[most_vulnerable_player]
-                suit_vuln = player_vuln['suits'].get(action.suit, 0)
-                
-                # パス回数に応じた基本ボーナス
-                pass_count = state.pass_count[most_vulnerable_player]
-                if pass_count >= 3:
-                    action_bonus += 25  # あと1回でバースト
-                elif pass_count >= 2:
-                    action_bonus += 15
-                elif pass_count >= 1:
-                    action_bonus += 8
-                
-                # スート脆弱性ボーナス
-                action_bonus += suit_vuln * 3
-                
-                # そのスートの進行度をチェック
-                suit_idx = suit_to_index[action.suit]
-                cards_played = np.sum(state.field_cards[suit_idx])
-                progress = cards_played / 13.0
-                
-                # 進行度が高いほど相手が詰まりやすい
-                action_bonus += progress * 10
-            
-            # 複数の脆弱な相手がいる場合、累積ボーナス
-            for player, vuln_data in vulnerability.items():
-                if player != most_vulnerable_player:
-                    suit_vuln = vuln_data['suits'].get(action.suit, 0)
-                    if suit_vuln > 2:  # そこそこ脆弱
-                        action_bonus += suit_vuln * 1.5
-            
-            if action_bonus > 0:
-                bonus[action] = bonus.get(action, 0) + action_bonus
-        
-        return bonus
-    
-    def _evaluate_burst_force(self, state, tracker, my_actions):
-        """バースト誘導戦略（旧版・互換性のため残す）
-        
-        パス回数が多い相手が持っていないスートを急速に進める
-        """
-        bonus = {}
-        
-        # 各プレイヤーのパス回数をチェック
-        for player in range(state.players_num):
-            if player == self.my_player_num:
-                continue
-            if player in state.out_player:
-                continue
-                
-            pass_count = state.pass_count[player]
-            
-            # パス回数が2回以上の場合、危険水域と判断
-            if pass_count >= 2:
-                # このプレイヤーが持っていなさそうなスートを推論
-                weak_suits = self._infer_weak_suits(state, tracker, player)
-                
-                # 弱いスートを進めることにボーナス
-                for action in my_actions:
-                    if action.suit in weak_suits:
-                        # パス回数が多いほど大きなボーナス（控えめに）
-                        bonus[action] = bonus.get(action, 0) + (pass_count * 5)
-        
-        return bonus
-    
-    def _infer_weak_suits(self, state, tracker, player):
-        """相手の弱いスート（持っていないカードが多そうなスート）を推論"""
-        weak_suits = []
-        
-        # 各スートについて、そのプレイヤーが持っている可能性のあるカード数を数える
-        for suit in Suit:
-            possible_count = 0
-            for number in Number:
-                card = Card(suit, number)
-                if card in tracker.possible[player]:
-                    possible_count += 1
-            
-            # 持っている可能性のあるカードが少ない（4枚以下）なら弱いスート
-            if possible_count <= 4:
-                weak_suits.append(suit)
-        
-        return weak_suits
-    
-    def _evaluate_run_strategy(self, state, my_hand, my_actions):
-        """連続カード（ラン）戦略
-        
-        連続して出せるカードがある場合、その起点となるカードに高いボーナスを与える
-        """
-        bonus = {}
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
-        
-        for action in my_actions:
-            suit = action.suit
-            suit_idx = suit_to_index[suit]
-            num_idx = action.number.val - 1
-            
-            # このカードを出した後、連続して出せるカードを数える
-            run_length = 0
-            
-            if num_idx < 6:  # 7より小さい側
-                # 下方向に連続して出せるか
-                check_idx = num_idx - 1
-                while check_idx >= 0:
-                    next_card = Card(suit, self._index_to_number(check_idx))
-                    if next_card in my_hand:
-                        run_length += 1
-                        check_idx -= 1
-                    else:
-                        break
-            elif num_idx > 6:  # 7より大きい側
-                # 上方向に連続して出せるか
-                check_idx = num_idx + 1
-                while check_idx <= 12:
-                    next_card = Card(suit, self._index_to_number(check_idx))
-                    if next_card in my_hand:
-                        run_length += 1
-                        check_idx += 1
-                    else:
-                        break
-            
-            # 連続カードが長いほど大きなボーナス
-            if run_length >= 1:
-                bonus[action] = run_length * 8
-        
-        return bonus
-    
-    def _evaluate_endgame_strategy(self, state, my_hand, my_actions, game_state_info):
-        """ゲーム終盤戦略（強化版）
-        
-        残り手札が少ない場合は、確実に出せるカードを優先する
-        ゲーム状態に応じて動的に調整
-        """
-        bonus = {}
-        
-        # 手札枚数とゲームフェーズに応じたボーナス倍率
-        hand_size = len(my_hand)
-        phase = game_state_info['phase']
-        urgency = game_state_info['urgency']
-        
-        # 基本倍率
-        if phase == 'late':
-            multiplier = max(1, 8 - hand_size)  # 終盤は強力に
-        else:
-            multiplier = max(1, 6 - hand_size)
-        
-        # 緊急度による調整
-        multiplier = multiplier * (1.0 + urgency * URGENCY_MULTIPLIER)
-        
-        for action in my_actions:
-            score = 0
-            
-            # 出した後に確実に次のカードも出せる場合（連鎖可能）
-            val = action.number.val
-            if val == 1 or val == 13:
-                # 端カードは確実に出せるので高評価
-                score += 15 * multiplier
+            elif my_hand_size > avg_opponent_size + 2:
+                my_position = 'behind'
             else:
-                # 次のカードを持っているか確認
-                if val < 7:
-                    next_val = val - 1
-                else:
-                    next_val = val + 1
-                
-                if 1 <= next_val <= 13:
-                    next_card = Card(action.suit, self._index_to_number(next_val - 1))
-                    if next_card in my_hand:
-                        score += 12 * multiplier
-            
-            if score > 0:
-                bonus[action] = score
+                my_position = 'middle'
         
-        return bonus
-    
-    def _evaluate_card_counting_strategy(self, state, tracker, my_hand, my_actions):
-        """カードカウンティング戦略
+        # 緊急度（パス回数に基づく）
+        my_pass_count = state.pass_count[self.my_player_num]
+        urgency = min(1.0, my_pass_count / 3.0)
         
-        場に出たカードと自分の手札から、残りのカードを推定し、
-        より有利な判断を行う
-        """
-        bonus = {}
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
+        # 推奨攻撃度の計算
+        aggressiveness = 0.5  # ベースライン
         
-        # 各スートについて分析
-        for suit in Suit:
-            suit_idx = suit_to_index[suit]
-            
-            # このスートで場に出ているカードを数える
-            cards_on_field = sum(state.field_cards[suit_idx])
-            
-            # 自分が持っているこのスートのカード
-            my_cards_in_suit = [c for c in my_hand if c.suit == suit]
-            
-            # 残りのカード数（相手が持っている可能性のあるカード）
-            # 全13枚 - 場のカード - 自分のカード
-            remaining_cards = 13 - cards_on_field - len(my_cards_in_suit)
-            
-            # このスートで出せるアクションを評価
-            for action in my_actions:
-                if action.suit != suit:
-                    continue
-                
-                score = 0
-                num_idx = action.number.val - 1
-                
-                # 場の進行状況を分析
-                # 7から両側にどれだけ進んでいるか
-                low_progress = 0  # 7→1方向の進行度
-                # 7より小さい側で最も進んだ位置を探す
-                for i in range(6, -1, -1):
-                    if state.field_cards[suit_idx][i] == 1:
-                        low_progress = 6 - i
-                        break
-                
-                high_progress = 0  # 7→13方向の進行度
-                # 7より大きい側で最も進んだ位置を探す
-                for i in range(6, 13):
-                    if state.field_cards[suit_idx][i] == 1:
-                        high_progress = i - 6
-                        break
-                
-                # このカードを出すことで進行する方向の評価
-                if num_idx < 6:  # 低い方向
-                    # このスートの低い側がまだ進んでいない場合、リスク
-                    if low_progress < 2 and remaining_cards > 3:
-                        score -= 5  # 相手に道を開く可能性
-                    elif low_progress >= 4:
-                        score += 8  # もう進んでいるので安全
-                elif num_idx > 6:  # 高い方向
-                    # このスートの高い側がまだ進んでいない場合、リスク
-                    if high_progress < 2 and remaining_cards > 3:
-                        score -= 5
-                    elif high_progress >= 4:
-                        score += 8
-                
-                # 相手が持っているカードが少ない場合は攻撃的に
-                if remaining_cards <= 2:
-                    score += 10  # ほぼ支配している
-                elif remaining_cards <= 4:
-                    score += 5  # やや有利
-                
-                # このカードを出すことで次に出せるカードが増えるか
-                potential_next_cards = 0
-                for c in my_cards_in_suit:
-                    c_idx = c.number.val - 1
-                    if num_idx < 6 and c_idx == num_idx - 1:
-                        potential_next_cards += 1
-                    elif num_idx > 6 and c_idx == num_idx + 1:
-                        potential_next_cards += 1
-                
-                score += potential_next_cards * 6
-                
-                if score != 0:
-                    bonus[action] = score
+        if phase == 'late':
+            aggressiveness += 0.3  # 終盤は積極的に
+        elif phase == 'early':
+            aggressiveness -= 0.1  # 序盤は慎重に
         
-        return bonus
-    
-    def _evaluate_advanced_heuristic_strategy(self, state, my_hand, my_actions):
-        """参考コード由来の高度なヒューリスティック戦略
+        if my_position == 'leading':
+            aggressiveness += 0.2  # リードしている場合は攻撃的に
+        elif my_position == 'behind':
+            aggressiveness -= 0.1  # 遅れている場合はやや慎重に
         
-        提供された参考コードからの戦略を統合:
-        - 円環距離（7からの距離）評価
-        - 深度ベースの開放リスク評価（get_chain_risk）
-        - スート支配力の評価
-        - トンネル端（A/K）の特別処理を強化
-        - 戦略的パス判断（別途実装）
+        if urgency > 0.6:
+            aggressiveness += 0.2  # バースト危機は積極的にカードを出す
         
-        参考: 問題文で提供されたmy_AI関数のパラメータ駆動戦略
-        """
-        if not ENABLE_ADVANCED_HEURISTIC:
-            return {}
+        aggressiveness = max(0.0, min(1.0, aggressiveness))
         
-        bonus = {}
-        params = self.get_current_weights()
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
+        return {
+            'phase': phase,
+            'my_position': my_position,
+            'urgency': urgency,
+            'aggressiveness': aggressiveness,
+            'my_hand_size': my_hand_size,
+            'opponent_hand_sizes': opponent_hand_sizes
+        }
+
+    def _evaluate_strategic_actions(self, state, tracker, my_actions, game_state_info):
+        """Phase 2改善: 戦略的評価（強化版）
         
-        # 自分の手札をインデックスセットで管理（高速検索用）
-        my_hand_indices = set((suit_to_index[c.suit], c.number.val - 1) for c in my_hand)
+        OpponentModelに基づいて動的に戦略重み付けを変更
+        - Tunnel Lock モード: トンネル封鎖戦略を強化
+        - Burst Force モード: バースト誘導戦略を強化
+        - Neutral モード: バランス型
         
-        # 相手の状況分析
-        opp_pass_left = [3 - state.pass_count[i] for i in range(len(state.players_cards)) if i != self.my_player_num]
-        opp_min_pass = min(opp_pass_left) if opp_pass_left else 3
-        opp_min_hand = min(len(h) for i, h in enumerate(state.players_cards) if i != self.my_player_num) if state.players_cards else 13
+        さらにゲーム状態に応じて適応的に重みを調整。
+        各戦略は strategy_feature_matrix の特徴量と _strategy_weight_vector の重みの積和として1回で評価する。
+        """
+        my_hand = state.players_cards[self.my_player_num]
         
-        def get_chain_risk(suit_idx, start_num, direction):
-            """指定した方向に、自分が持っていないカードが何枚連続しているか(他人のための道)を計算"""
-            risk_count = 0
-            curr = (start_num + direction) % 13
-            # トンネルがあるので最大6枚まで探索（7の反対側まで）
-            for _ in range(6):
-                if state.field_cards[suit_idx][curr] == 1:  # すでに出ている
-                    break
-                if (suit_idx, curr) in my_hand_indices:  # 自分で止めている
-                    break
-                # 誰かが持っているはずのカード
-                risk_count += 1
-                curr = (curr + direction) % 13
-            return risk_count
+        # 相手モードの取得と重み係数の設定
+        mode_weights = {"tunnel_lock": 1.0, "burst_force": 1.0, "heuristic": 1.0}
         
-        # 各スートのカード枚数をカウント
-        suit_counts = {Suit.SPADE: 0, Suit.CLUB: 0, Suit.HEART: 0, Suit.DIAMOND: 0}
-        for card in my_hand:
-            suit_counts[card.suit] += 1
+        # ゲーム状態に応じた重み調整
+        aggressiveness = game_state_info['aggressiveness']
+        phase = game_state_info['phase']
         
-        for card in my_actions:
-            s = card.suit
-            i = suit_to_index[s]
-            n = card.number.val - 1
-            score = 0
-            
-            # 1. ハイパーループ距離計算 (トンネルルートも考慮した最短距離)
-            if ENABLE_HYPERLOOP_DIST:
-                # 通常ルートの距離
-                dist_normal = abs(n - 6)
-                # トンネルルートの距離
-                dist_tunnel = 99
-                # A側（0）またはK側（12）がアクセス可能か確認
-                is_ace_accessible = state.field_cards[i][0] == 1 or (i, 0) in my_hand_indices
-                is_king_accessible = state.field_cards[i][12] == 1 or (i, 12) in my_hand_indices
-                
-                if is_ace_accessible and n < 7:
-                    # A側が使える場合、Aまでの距離+1
-                    dist_tunnel = n + 1
-                elif is_king_accessible and n >= 7:
-                    # K側が使える場合、Kまでの距離+1
-                    dist_tunnel = (12 - n) + 1
-                
-                # 最短ルートを選択（短い方が出やすい→価値が低い）
-                min_dist = min(dist_normal, dist_tunnel)
-                # 距離が短いほど保持価値が低いので、逆にボーナスを付ける
-                circular_dist = min(dist_normal, 13 - dist_normal)
-                score += circular_dist * params['W_CIRCULAR_DIST']
-            else:
-                # 従来の円環距離
-                dist_from_7 = abs(n - 6)
-                circular_dist = min(dist_from_7, 13 - dist_from_7)
-                score += circular_dist * params['W_CIRCULAR_DIST']
-            
-            # 2. 7の信号機戦略
-            if ENABLE_SEVEN_SIGNAL and n == 6:  # 7のインデックスは6
-                # 隣接カード（6 or 8）を持っているか確認
-                has_adjacent = (i, 5) in my_hand_indices or (i, 7) in my_hand_indices
-                if has_adjacent:
-                    score += params['W_SEVEN_ADJACENT']  # 自分に得なら即出し
-                else:
-                    score += params['W_SEVEN_NO_ADJ']    # 自分だけ損なら出し惜しみ
-            
-            # 3. 深度ベースの開放リスクと自己利益
-            # 隣接する2方向（トンネル含む）を確認
-            for direction in [1, -1]:
-                neighbor = (n + direction) % 13
-                # その方向がまだ未開放の場合のみ評価
-                if state.field_cards[i][neighbor] == 0:
-                    if (i, neighbor) in my_hand_indices:
-                        # 自分が持っているなら「自分の道」
-                        score += params['W_MY_PATH']
-                    else:
-                        # 自分が持っていないなら「他人の道」を何枚分開けてしまうか
-                        risk_depth = get_chain_risk(i, n, direction)
-                        score += risk_depth * params['W_OTHERS_RISK']
-            
-            # 3. スート支配 (そのマークを多く持っているなら、そのマークを優先的に進める)
-            same_suit_count = suit_counts[s]
-            score += same_suit_count * params['W_SUIT_DOM']
-            
-            # 4. 終盤・状況補正
-            if len(my_hand) <= opp_min_hand:
-                score += params['W_WIN_DASH']
+        if self._opponent_model:
+            # 各相手のモードを判定し、最も脅威度の高い相手に合わせて戦略を調整
+            opponent_modes = []
+            threat_levels = []
             
-            # 特殊ルール補正: トンネルの端（1, 13）を出す際、逆側の状況を見る
-            if n == 0 or n == 12:
-                opposite = 12 if n == 0 else 0
-                if state.field_cards[i][opposite] == 0 and (i, opposite) not in my_hand_indices:
-                    # 逆側のカードを自分が持っていないのにトンネルを開けるのは非常に危険
-                    score -= 50
+            for p in range(state.players_num):
+                if p != self.my_player_num and p not in state.out_player:
+                    mode = self._opponent_model.mode(p)
+                    threat = self._opponent_model.get_threat_level(p)
+                    opponent_modes.append(mode)
+                    threat_levels.append((p, mode, threat))
             
-            bonus[card] = score
-        
-        # ネクロマンサー戦略（バースト予知）
-        if ENABLE_NECROMANCER:
-            for player in range(state.players_num):
-                if player == self.my_player_num or player in state.out_player:
-                    continue
+            # 最も脅威度の高い相手に合わせて重み調整
+            if threat_levels:
+                threat_levels.sort(key=lambda x: x[2], reverse=True)
+                primary_opponent_mode = threat_levels[0][1]
                 
-                # 相手がもうすぐバーストする（pass_count >= 3）
-                if state.pass_count[player] >= 3:
-                    # 相手がバーストした場合、手札が全て場に出る
-                    # その時に自分が出せるようになるカードの価値を上げる
-                    # ただし、相手の手札は完全には分からないので、推論ベースで評価
-                    
-                    # 簡易実装：相手がバーストしそうな時は、
-                    # 場に繋がるカード（legal_actions）の価値を上げる
-                    # なぜなら、相手がバースト後に場が広がる可能性が高いから
-                    for card in my_actions:
-                        # このカードを出すことで、新たに出せるようになるカードがあるか
-                        # （つまり、場を広げる行動）
-                        card_i = suit_to_index[card.suit]
-                        card_n = card.number.val - 1
-                        
-                        # 隣接する方向で、まだ場に出ていないカードがあれば、
-                        # バースト後にそこが開く可能性がある
-                        for direction in [1, -1]:
-                            neighbor = (card_n + direction) % 13
-                            if state.field_cards[card_i][neighbor] == 0:
-                                # この方向が未開放 = バースト後に繋がる可能性
-                                bonus[card] = bonus.get(card, 0) + params['W_NECROMANCER']
-                                break  # 一度だけボーナス
-        
-        return bonus
-    
-    def _evaluate_block_strategy(self, state, tracker, my_actions):
-        """ブロック戦略
-        
-        相手が出そうとしているスートを先に進めて、相手のカードを出せなくする
-        """
-        bonus = {}
-        suit_to_index = {Suit.SPADE: 0, Suit.CLUB: 1, Suit.HEART: 2, Suit.DIAMOND: 3}
+                if primary_opponent_mode == "tunnel_lock":
+                    # トンネル活用型の相手 → トンネルロック戦略を強化
+                    mode_weights["tunnel_lock"] = TUNNEL_LOCK_WEIGHT * (1.0 + aggressiveness * AGGRESSIVENESS_MULTIPLIER)
+                    mode_weights["burst_force"] = 0.8
+                elif primary_opponent_mode == "burst_force":
+                    # パス多用型の相手 → バースト誘導戦略を強化
+                    mode_weights["burst_force"] = BURST_FORCE_WEIGHT * (1.0 + aggressiveness * AGGRESSIVENESS_MULTIPLIER)
+                    mode_weights["tunnel_lock"] = 0.8
         
-        for player in range(state.players_num):
-            if player == self.my_player_num or player in state.out_player:
-                continue
-            
-            # このプレイヤーが出せそうなカードを推論
-            for action in my_actions:
-                suit = action.suit
-                suit_idx = suit_to_index[suit]
-                num_idx = action.number.val - 1
-                
-                # 次のカードを相手が持っている可能性が高い場合、
-                # このカードを出すことで相手を助けてしまう
-                # 逆に、相手が持っていない可能性が高い場合はボーナス
-                
-                next_indices = []
-                if num_idx < 6:
-                    next_indices.append(num_idx - 1)
-                elif num_idx > 6:
-                    next_indices.append(num_idx + 1)
-                
-                for next_idx in next_indices:
-                    if 0 <= next_idx <= 12:
-                        next_card = Card(suit, self._index_to_number(next_idx))
-                        
-                        # 相手がこのカードを持っていない可能性が高い場合
-                        if next_card not in tracker.possible[player]:
-                            # 相手が出せないので、この方向を進めるのは良い
-                            bonus[action] = bonus.get(action, 0) + 3
-                        elif next_card in tracker.possible[player]:
-                            # 相手が持っている可能性がある → やや不利
-                            bonus[action] = bonus.get(action, 0) - 2
+        # フェーズに応じた戦略調整
+        if phase == 'late':
+            # 終盤は確実性重視
+            mode_weights["heuristic"] = 1.5
+        elif phase == 'early':
+            # 序盤はバランス重視
+            mode_weights["tunnel_lock"] *= 0.8
+            mode_weights["burst_force"] *= 0.8
         
-        return bonus
-
-    def _build_tracker_from_history(self, state):
-        """履歴を先頭から逐次再生し、その時点の盤面(legal_actions)でパス推論を行う。"""
-        tracker = CardTracker(state, self.my_player_num)
-
-        # 盤面のみ再現する軽量 state を作る
-        replay_state = State(
-            players_num=state.players_num,
-            field_cards=np.zeros((4, 13), dtype='int64'),
-            players_cards=[Hand([]) for _ in range(state.players_num)],
-            turn_player=0,
-            pass_count=[0] * state.players_num,
-            out_player=[],
-            history=[],
-        )
-
-        # start player を履歴から復元（ダイヤ7を出したプレイヤー）
-        start_player = None
-        for (p0, a0, pf0) in state.history:
-            if pf0 == 0 and isinstance(a0, Card) and a0 == Card(Suit.DIAMOND, Number.SEVEN):
-                start_player = p0
-                break
-        replay_state.turn_player = start_player if start_player is not None else 0
+        # 戦略ごとの倍率（無効な戦略は0）
+        hand_size = len(my_hand)
+        endgame_weight = 0.0
+        if hand_size <= 5 or phase == 'late':
+            # ゲーム終盤戦略（残り手札が少ない場合）: 手札枚数・フェーズ・緊急度に応じた倍率
+            endgame_weight = max(1, (8 if phase == 'late' else 6) - hand_size)
+            endgame_weight *= 1.0 + game_state_info['urgency'] * URGENCY_MULTIPLIER
+        group_weights = {
+            "tunnel_lock": mode_weights["tunnel_lock"] if ENABLE_TUNNEL_LOCK else 0.0,
+            "burst_force": mode_weights["burst_force"] if ENABLE_BURST_FORCE else 0.0,
+            "heuristic": mode_weights["heuristic"],
+            "run": 1.0 + aggressiveness * 0.2,
+            "endgame": endgame_weight,
+            "block": 1.0 - aggressiveness * AGGRESSIVENESS_MULTIPLIER,
+            "card_counting": 1.0,
+            "advanced_heuristic": ADVANCED_HEURISTIC_WEIGHT if ENABLE_ADVANCED_HEURISTIC else 0.0,
+        }
 
-        for (p, a, pf) in state.history:
-            # 1) その手番直前の盤面で観測（legal_actionsが正しい）
-            tracker.observe_action(replay_state, p, a, is_pass=(pf == 1 or a is None))
+        # 全戦略の特徴量を1回で作り、重み付き和をとる（戦略ごとに評価して足し合わせていた値と同じ。tests/test_strategy.py で確認）
+        matrix = strategy_feature_matrix(state, self.my_player_num, tracker, my_actions)
+        scores = matrix @ self._strategy_weight_vector(group_weights)
+        return dict(zip(my_actions, scores.tolist()))
 
-            # 2) 行動を replay_state に適用（盤面/パス/アウト）
-            if pf == 1 or a is None:
-                replay_state.pass_count[p] += 1
-                if replay_state.pass_count[p] > 3 and p not in replay_state.out_player:
-                    replay_state.out_player.append(p)
-                    tracker.mark_out(p)
-            else:
-                if a is not None:
-                    # カードを場に置く（エラーは無視 - すでに置かれている場合など）
-                    replay_state.put_card(a)
+    def _strategy_weight_vector(self, group_weights):
+        """STRATEGY_FEATURES に対応する重みベクトル（各戦略の係数 × 戦略ごとの倍率の和）"""
+        params = self.get_current_weights()
+        heuristic = group_weights["heuristic"]
+        tunnel_lock = group_weights["tunnel_lock"]
+        burst_force = group_weights["burst_force"]
+        counting = group_weights["card_counting"]
+        advanced = group_weights["advanced_heuristic"]
+        w = dict.fromkeys(STRATEGY_FEATURES, 0.0)
+
+        # ヒューリスティック
+        w['edge'] += heuristic * ACE_KING_BASE_BONUS
+        w['tunnel_complete'] += heuristic * TUNNEL_COMPLETE_BONUS
+        w['edge_open'] += heuristic * 3
+        w['next_on_field'] += heuristic * ADJACENT_CARD_BONUS
+        w['next_open'] -= heuristic * ADJACENT_CARD_PENALTY
+        w['next_mine'] += heuristic * (SAFE_MOVE_BONUS + CHAIN_POTENTIAL_MULTIPLIER)
+        w['suit_count'] += heuristic * SUIT_CONCENTRATION_MULTIPLIER
+        w['hand_rest'] += heuristic * HAND_REDUCTION_BONUS
+
+        # ラン・終盤
+        w['run_length'] += group_weights["run"] * 8
+        w['edge'] += group_weights["endgame"] * 15
+        w['next_mine'] += group_weights["endgame"] * 12
+
+        # トンネルロック
+        w['lock_close'] += tunnel_lock * 15
+        w['lock_hold'] -= tunnel_lock * 20
+        w['lock_hold_soft'] -= tunnel_lock * 5
+        w['lock_open_good'] += tunnel_lock * 10
+        w['lock_open_bad'] -= tunnel_lock * 5
+
+        # バースト誘導
+        w['burst_pass3'] += burst_force * 25
+        w['burst_pass2'] += burst_force * 15
+        w['burst_pass1'] += burst_force * 8
+        w['burst_suit_vuln'] += burst_force * 3
+        w['burst_progress'] += burst_force * 10
+        w['burst_other_vuln'] += burst_force * 1.5
+
+        # ブロック
+        w['block_free'] += group_weights["block"] * 3
+        w['block_help'] -= group_weights["block"] * 2
+
+        # カードカウンティング
+        w['count_risky'] -= counting * 5
+        w['count_dominant'] += counting * 10
+        w['count_leading'] += counting * 5
+        w['next_mine'] += counting * 6
+
+        # 高度なヒューリスティック（係数は学習中の重み）
+        w['circular_dist'] += advanced * params['W_CIRCULAR_DIST']
+        if ENABLE_SEVEN_SIGNAL:
+            w['seven_adjacent'] += advanced * params['W_SEVEN_ADJACENT']
+            w['seven_no_adjacent'] += advanced * params['W_SEVEN_NO_ADJ']
+        w['my_path'] += advanced * params['W_MY_PATH']
+        w['others_risk'] += advanced * params['W_OTHERS_RISK']
+        w['suit_count'] += advanced * params['W_SUIT_DOM']
+        w['win_dash'] += advanced * params['W_WIN_DASH']
+        w['tunnel_danger'] -= advanced * 50
+        if ENABLE_NECROMANCER:
+            w['necromancer'] += advanced * params['W_NECROMANCER']
 
-            # 3) 次手番へ（out_player をスキップ）
-            original = replay_state.turn_player
-            for i in range(1, replay_state.players_num + 1):
-                np_ = (original + i) % replay_state.players_num
-                if np_ not in replay_state.out_player:
-                    replay_state.turn_player = np_
-                    break
+        return np.array([w[name] for name in STRATEGY_FEATURES])
 
-        return tracker
+    def _build_tracker_from_history(self, state):
+        """履歴を先頭から逐次再生し、その時点の盤面(legal_actions)でパス推論を行う（毎回作り直す版）。
+        get_action は self._history_tracker で差分だけ再生する。"""
+        replay = IncrementalTracker(self.my_player_num)
+        replay.sync(state)
+        return replay.tracker
 
-    def _create_determinized_state_with_constraints(self, original_state, tracker: CardTracker):
+    def _create_determinized_state_with_constraints(self, original_state, tracker: CardTracker, hands=None):
         """重み付け確定化: 推論制約を満たすように相手手札を生成
         
         参考用実装ベース（doc/misc/colab_notebook.md 689-748行目）
+        hands（{プレイヤー: カードのリスト}）を渡した場合はその割り当てを使う。
         """
+        if hands is None:
+            hands = self._determinize_hands(original_state, tracker)
         base = original_state.clone()
+        for p, cards in hands.items():
+            base.players_cards[p] = Hand(cards)
+        base.refresh_zobrist()
+        return base
 
-        # 相手のカードプール
-        pool = []
-        for p in range(base.players_num):
-            if p != self.my_player_num:
-                pool.extend(base.players_cards[p])
-
-        # いったん空にして再配分
-        for p in range(base.players_num):
-            if p != self.my_player_num:
-                base.players_cards[p] = Hand([])
-
-        need = {p: len(original_state.players_cards[p]) for p in range(base.players_num) if p != self.my_player_num}
-
-        # 確定化を複数回リトライ（値は DETERMINIZATION_ATTEMPTS で管理）
-        # 制約を満たす割り当てを試行（過去の検証でこの回数で十分収束）
-        for _ in range(30):  # 参考用実装の値（30回）
-            random.shuffle(pool)
-            remain = list(pool)
-            hands = {p: [] for p in need.keys()}
-            ok = True
-
-            # 各プレイヤーに可能なカードを割り当て
-            for p in need.keys():
-                k = need[p]
-                if k == 0:
-                    continue
-
-                possible_list = [c for c in remain if c in tracker.possible[p]]
-                
-                if len(possible_list) < k:
-                    ok = False
-                    break
-                
-                chosen = possible_list[:k]
-                hands[p].extend(chosen)
-                chosen_set = set(chosen)
-                remain = [c for c in remain if c not in chosen_set]
-
-            if not ok:
-                continue
-
-            # 残りを分配
-            if remain:
-                ps = list(need.keys())
-                idx = 0
-                for c in remain:
-                    hands[ps[idx % len(ps)]].append(c)
-                    idx += 1
-
-            # 反映
-            for p, cards in hands.items():
-                base.players_cards[p] = Hand(cards)
-
-            return base
-
-        # フォールバック: ランダム確定化
-        return self._create_determinized_state(original_state, pool)
-
-    def _is_safe_move(self, card, hand_card_strs):
-        """出したカードの『次』を自分が持っていればSafe（ロック継続）"""
-        val = card.number.val
-        suit = card.suit
-        
-        # A(1) や K(13) は端なので、出すとそこで列が終わる＝安全（誰もそれ以上出せない）
-        if val == 1 or val == 13:
-            return True
-            
-        # 7より小さい場合 (A...6), 次に出せるのは val - 1
-        next_target_val = -1
-        if val < 7:
-            next_target_val = val - 1
-        # 7より大きい場合 (8...K), 次に出せるのは val + 1
-            
-        # 次のカードを持っているかチェック
-        # Cardオブジェクトの生成コストを避けるため文字列比較などを利用（最適化）
-        # ここでは簡易に全探索
-        
-        # 次のカードを表す文字列表現作成
-        # Number Enumから探すのは少し手間なので、単純に検索
-        # hand_card_strs は呼び出し元で作成済み
-        
-        # next_target_val に対応する Number を探す（効率悪いが枚数少ないので許容）
-        # Enum定義: ACE=(1, 'A')...
-        target_number = None
-        for n in Number:
-            if n.val == next_target_val:
-                target_number = n
-                break
-        
-        if target_number:
-            target_card_str = str(suit) + str(target_number)
-            return target_card_str in hand_card_strs
-            
-        return False
+    def _determinize_hands(self, original_state, tracker: CardTracker, fixed=None):
+        """推論制約を満たす相手手札の割り当て {プレイヤー: カードのリスト}（determinize_hands を参照）"""
+        return determinize_hands(original_state, tracker, self.my_player_num, fixed)
 
     def _get_unknown_cards(self, state):
         unknown_pool = []
@@ -2140,38 +3527,411 @@ class HybridStrongestAI:
         return unknown_pool
 
     def _create_determinized_state(self, original_state, unknown_cards):
+        new_state = original_state.clone()
+        for p_idx, cards_for_p in self._random_hands(original_state, unknown_cards).items():
+            new_state.players_cards[p_idx] = Hand(cards_for_p)
+        new_state.refresh_zobrist()
+        return new_state
+
+    def _random_hands(self, original_state, unknown_cards):
+        """制約なしのランダム確定化（相手の手札枚数だけを合わせる）"""
         shuffled_unknown = list(unknown_cards)
         random.shuffle(shuffled_unknown)
-        new_state = original_state.clone()
+        hands = {}
         card_idx = 0
-        for p_idx in range(new_state.players_num):
+        for p_idx in range(original_state.players_num):
             if p_idx != self.my_player_num:
-                count = len(new_state.players_cards[p_idx])
-                cards_for_p = shuffled_unknown[card_idx : card_idx + count]
-                new_state.players_cards[p_idx] = Hand(cards_for_p)
+                count = len(original_state.players_cards[p_idx])
+                hands[p_idx] = shuffled_unknown[card_idx : card_idx + count]
                 card_idx += count
-        return new_state
+        return hands
 
-    def _playout(self, state):
-        """Phase3: ロールアウトポリシーでのプレイアウト（AI同士を簡易に模擬）。"""
-        # プレイアウト用に各プレイヤーのAIを用意（同等ロジックのロールアウトを使う）
-        ais = [HybridStrongestAI(p, simulation_count=0) for p in range(state.players_num)]
-        for a in ais:
-            a._in_simulation = True
+    def _run_simulations(self, root_sims, candidates, sim_count, deadline=None, in_process=False):
+        """root_sims（RootSimulations）の続きの通し番号で sim_count 回のシミュレーションを行う（workers > 0 なら並列）。
 
-        for _ in range(SIMULATION_DEPTH):
-            if state.is_done():
+        in_process=True なら workers によらずこのプロセスで回す（1回ずつのバンディットの引きなど、
+        ワーカーへ送る手間のほうが大きい場合）。通し番号で乱数を初期化するので結果は並列と同じ。
+        直列でも通し番号ごとに random を初期化するので、ワーカー数によらず同じ結果になる。
+        直列の場合は呼び出し前の random の状態を戻す（ゲーム側の乱数列は探索に左右されない）。
+        """
+        first_sim = root_sims.next_sim
+        if self.workers > 0 and not in_process:
+            outcomes = self._simulate_outcomes_parallel(root_sims, candidates, first_sim, sim_count, deadline)
+        else:
+            saved = random.getstate()
+            outcomes = self._simulate_outcomes(root_sims.state, root_sims.tracker, candidates, sim_count,
+                                               base_seed=root_sims.base_seed, first_sim=first_sim, deadline=deadline,
+                                               sampler=root_sims.sampler)
+            random.setstate(saved)
+        root_sims.next_sim += sim_count if sim_count is not None else len(outcomes)
+        return outcomes
+
+    def _allocate_root_bandit(self, root_sims, candidates, sim_count, strategic_bonus, deadline=None):
+        """ルートの候補へのプレイアウト配分（root_allocation = 'ucb1' / 'halving'）。
+
+        総数は sim_count × 候補数 × ROOT_BANDIT_BUDGET_RATIO（deadline があればそこでも打ち切る）。
+        候補の価値は「平均スコア + 戦略ボーナス × STRATEGY_WEIGHT_MULTIPLIER / sim_count」で比べる
+        （get_action で最終的に比べる値を sim_count で割ったもの）。
+        - 'halving': 生き残り候補を同じ確定化で同数ずつ回し、各ラウンド後に上位半分を残す
+        - 'ucb1': 各候補1回ずつ回した後、UCB1 指標が最大の候補を1回ずつ回す
+          （1回ずつなので workers によらずこのプロセスで回す。確定化器は root_sims のものを使い回す）
+        戻り値は (候補ごとの合計スコア, 候補ごとのプレイアウト回数, 確定化の回数)。
+        """
+        totals = {action: 0 for action in candidates}
+        visits = {action: 0 for action in candidates}
+        prior = {action: strategic_bonus.get(action, 0) * STRATEGY_WEIGHT_MULTIPLIER / sim_count
+                 for action in candidates}
+        budget = max(len(candidates), int(sim_count * len(candidates) * ROOT_BANDIT_BUDGET_RATIO))
+        used = 0
+        simulations = 0
+
+        def value(action):
+            return totals[action] / visits[action] + prior[action] if visits[action] else prior[action]
+
+        def run(arms, count, in_process=False):
+            nonlocal used, simulations
+            outcomes = self._run_simulations(root_sims, arms, count, deadline, in_process)
+            for sim_outcomes in outcomes:
+                for action, outcome in zip(arms, sim_outcomes):
+                    self._score_outcome(totals, action, outcome)
+                    visits[action] += 1
+            used += len(outcomes) * len(arms)
+            simulations += len(outcomes)
+            return len(outcomes) == count
+
+        if self.root_allocation == 'halving':
+            arms = list(candidates)
+            rounds = max(1, math.ceil(math.log2(len(arms))))
+            for r in range(rounds):
+                per_arm = max(1, (budget - used) // (len(arms) * (rounds - r)))
+                if not run(arms, per_arm):
+                    break
+                # 上位半分を残す（同点は候補の並び順）
+                arms = sorted(arms, key=value, reverse=True)[:math.ceil(len(arms) / 2)]
+        else:
+            if run(candidates, 1, in_process=True):
+                # 報酬 (-1.3〜+2) を幅 ROLLOUT_SCORE_RANGE で割って [0, 1] 程度に揃えてから UCB1 を計算
+                while used < budget:
+                    log_total = math.log(sum(visits.values()))
+                    arm = max(candidates, key=lambda a: value(a) / ROLLOUT_SCORE_RANGE
+                              + ROOT_UCB_C * math.sqrt(2.0 * log_total / visits[a]))
+                    if not run([arm], 1, in_process=True):
+                        break
+
+        return totals, visits, simulations
+
+    def _world_sampler(self, state, tracker, seed=None):
+        """self.determinization に応じた確定化器（hand_masks(sim) を持つ）。'random' なら None（_determinize_hands を使う）
+
+        どの確定化器も sim 番目の世界は (seed, sim) だけで決まる。
+        """
+        if seed is None:
+            seed = random.getrandbits(64)
+        if self.determinization == 'stratified':
+            return StratifiedWorldSampler(state, tracker, self.my_player_num, seed)
+        if self.determinization == 'exact':
+            return ExactWorldSampler(state, tracker, self.my_player_num, batch_size=DETERMINIZATION_BATCH_SIZE,
+                                     seed=seed)
+        if self.determinization == 'particle' and self._belief.hands:
+            return self._belief.sampler(state, seed)
+        return None
+
+    def _simulate_outcomes(self, state, tracker, candidates, sim_count, base_seed=None, first_sim=0,
+                           sim_step=1, deadline=None, sampler=None):
+        """確定化→候補ごとのプレイアウトを sim_count 回行う。
+
+        戻り値はシミュレーションごとの結果リスト（候補順の (勝者, 自分の残り枚数, 勝者の残り枚数)）。
+        rave が有効なら、各結果の4番目に「初手の後のプレイアウトで自分が出したカードのマスク」を付ける。
+        base_seed を渡すと各シミュレーションの前に random を base_seed + 通し番号 で初期化する
+        （ワーカーへの分け方によらず同じ結果になる）。通し番号は first_sim から sim_step 刻み。
+        deadline（time.time() の値）を渡すと、その時刻で打ち切り、途中のシミュレーションは捨てる。
+        sim_count=None なら deadline まで続ける。
+        sampler（hand_masks(sim) を持つ確定化器、通常は RootSimulations.sampler）で相手手札を決める。
+        None なら _determinize_hands で推論制約を満たすよう配る。
+        """
+        if sim_count is None and self.engine == 'batch':
+            # バッチは局を集め終わってから一括で進め、締め切りで終わらなかった局は捨てるので、
+            # 巡ごとの回数を直前の巡で測った1回あたりの時間から「残り時間の BATCH_TIME_FILL 倍に収まる数」に決める
+            outcomes = []
+            round_size = min(max(1, self.simulation_count), BATCH_PROBE_SIMULATIONS)
+            while True:
+                round_started = time.time()
+                if round_started >= deadline:
+                    break
+                outcomes.extend(self._simulate_outcomes(state, tracker, candidates, round_size, base_seed,
+                                                        first_sim, sim_step, deadline, sampler))
+                first_sim += round_size * sim_step
+                now = time.time()
+                per_simulation = (now - round_started) / round_size
+                round_size = int((deadline - now) * BATCH_TIME_FILL / per_simulation) if per_simulation > 0 else 1
+                if round_size < 1:
+                    break
+            return outcomes
+
+        # ビットボードエンジンでは確定化した盤面を1つのBitStateに持ち、候補ごとにRolloutStateへ写してプレイアウト
+        # バッチエンジンでは「確定化×候補」の全局を集めて最後にBatchStateでまとめてプレイアウト
+        root_state = self._state_pool.acquire(state) if self.engine in ('bit', 'batch') else None
+        batch_games = [] if self.engine == 'batch' else None
+        batch_seeds = [] if batch_games is not None and self.paired_rollouts else None
+        outcomes = []
+
+        # 手札の合計は確定化によらないので、終盤ソルバーを使うかは呼び出しごとに1回決める
+        solve_endgame = 0 < sum(len(hand) for hand in state.players_cards) <= self.endgame_cards
+
+        sims = itertools.count(first_sim, sim_step) if sim_count is None else range(first_sim, first_sim + sim_count * sim_step, sim_step)
+        for sim in sims:
+            # バッチエンジンは局を集める間は締め切りを見ない（一括のプレイアウトが締め切りで打ち切る）
+            if deadline is not None and batch_games is None and time.time() >= deadline:
                 break
+            if base_seed is not None:
+                random.seed(base_seed + sim)
+
+            if sampler is None:
+                hands = self._determinize_hands(state, tracker)
+                if root_state is not None:
+                    for p, cards in hands.items():
+                        root_state.set_hand(p, _cards_to_mask(cards))
+            else:
+                hand_masks = sampler.hand_masks(sim)
+                if root_state is not None:
+                    for p, mask in hand_masks.items():
+                        root_state.set_hand(p, mask)
+                else:
+                    hands = {p: _mask_to_cards(mask) for p, mask in hand_masks.items()}
+            if root_state is None:
+                determinized_state = self._create_determinized_state_with_constraints(state, tracker, hands)
+                determinized_state.record_history = False
 
-            p_idx = state.turn_player
-            actions = state.my_actions()
+            # 共通乱数: このシミュレーションの全候補が同じ種のロールアウト乱数列を使う
+            if self.paired_rollouts:
+                rollout_seed = random.getrandbits(64)
 
-            if not actions:
-                state.next(None, 1)
+            sim_outcomes = []
+            for first_action in candidates:
+                if deadline is not None and batch_games is None and time.time() >= deadline:
+                    # 全候補がそろわないシミュレーションは比較に使えないので捨てる
+                    sim_outcomes = None
+                    break
+                if solve_endgame:
+                    sim_state = self._rollout_state.load(root_state if root_state is not None else determinized_state)
+                elif batch_games is not None:
+                    sim_state = RolloutState(state.players_num).load(root_state)
+                elif root_state is not None:
+                    sim_state = self._rollout_state.load(root_state)
+                else:
+                    sim_state = determinized_state.clone()
+
+                if first_action is None:
+                    sim_state.next(None, 1)
+                else:
+                    sim_state.next(first_action, 0)
+
+                if solve_endgame:
+                    # 終盤ソルバーは手順を返さないので、AMAF には初手だけが数えられる
+                    outcome = self._endgame_solver.solve(sim_state)
+                    sim_outcomes.append(outcome + (0,) if self.rave else outcome)
+                    continue
+
+                if batch_games is not None:
+                    batch_games.append(sim_state)
+                    if batch_seeds is not None:
+                        batch_seeds.append(rollout_seed)
+                    continue
+
+                if self.rave:
+                    start_hand = self._my_hand_mask(sim_state)
+                if self.paired_rollouts:
+                    self._rollout_rng.seed(rollout_seed)
+                    winner = self._playout(sim_state, self._rollout_rng)
+                else:
+                    winner = self._playout(sim_state)
+                winner_remaining = sim_state.hand_count(winner) if winner >= 0 else 0
+                outcome = (winner, sim_state.hand_count(self.my_player_num), winner_remaining)
+                if self.rave:
+                    outcome += (self._played_in_playout(sim_state, start_hand),)
+                sim_outcomes.append(outcome)
+            if sim_outcomes is None:
+                break
+            outcomes.append(sim_outcomes)
+
+        if root_state is not None:
+            self._state_pool.release(root_state)
+        if batch_games:
+            outcomes = self._batch_outcomes(batch_games, len(candidates), deadline, batch_seeds)
+        return outcomes
+
+    def _simulate_outcomes_parallel(self, root_sims, candidates, first_sim, sim_count, deadline=None):
+        """通し番号 first_sim からのシミュレーションを連番で区切ってワーカープロセスに分担させる（root並列）。
+
+        乱数はシミュレーションの通し番号ごとに初期化するので、ワーカー数が変わっても（直列でも）選ぶ手は同じ
+        （engine='batch' は同点の乱択がワーカー単位のため除く）。
+        sim_count=None（持ち時間制）の場合は、ワーカー w が first_sim + w, first_sim + w + workers, ... 番を締め切りまで回す。
+        盤面・推論器・確定化器は1手の最初の分担にだけ付けて送り、ワーカーは root_sims.key で使い回す
+        （受け取っていないワーカーに当たった分担だけ、付けて送り直す）。
+        """
+        pool = _get_worker_pool(self.workers)
+        if sim_count is None:
+            tasks = [(first_sim + w, None, self.workers) for w in range(self.workers)]
+        else:
+            chunk = -(-sim_count // self.workers)
+            tasks = [(first_sim + start, min(chunk, sim_count - start), 1) for start in range(0, sim_count, chunk)]
+        payload = (self.my_player_num, root_sims.state, root_sims.tracker, root_sims.sampler, self._worker_settings())
+
+        def submit(task, with_payload):
+            return pool.submit(_simulation_worker, (root_sims.key, root_sims.base_seed,
+                                                    payload if with_payload else None, candidates) + task + (deadline,))
+
+        futures = [submit(task, not root_sims.payload_sent) for task in tasks]
+        root_sims.payload_sent = True
+        outcomes = []
+        for task, future in zip(tasks, futures):
+            result = future.result()
+            if result is None:
+                result = submit(task, True).result()
+            outcomes.extend(result)
+        return outcomes
+
+    def _worker_settings(self):
+        """ワーカー側のAIに引き継ぐシミュレーションの設定"""
+        return {
+            'engine': self.engine,
+            'paired_rollouts': self.paired_rollouts,
+            'determinization': self.determinization,
+            'endgame_cards': self.endgame_cards,
+            'rave': self.rave,
+        }
+
+    def _batch_outcomes(self, games, candidates_num, deadline=None, stream_seeds=None):
+        """「確定化×候補」順に並んだ局をBatchStateでまとめてプレイアウトし、_simulate_outcomes と同じ形で返す
+
+        deadline で打ち切った場合は、終局していない局を含むシミュレーションを捨てる。
+        stream_seeds（局ごとのロールアウト乱数の種）を渡すと共通乱数モードで同点を決める。
+        """
+        batch = BatchState.from_states(games)
+        if stream_seeds is not None:
+            batch.stream_seeds = np.array(stream_seeds, dtype='uint64')
+        winners = self._playout_batch(batch, deadline)
+        counts = batch.hand_counts()
+        my_remaining = counts[:, self.my_player_num]
+        winner_remaining = np.where(winners >= 0, counts[np.arange(batch.size), np.maximum(winners, 0)], 0)
+        rows = list(zip(winners.tolist(), my_remaining.tolist(), winner_remaining.tolist()))
+        if self.rave:
+            # 初手の後に自分が出したカード = 一括実行前の手札 − 終局時の手札（自分がバーストした局は 0）
+            final_hands = (batch.hands[:, self.my_player_num, :].astype('uint64') << _NP_CARD_SHIFTS).sum(axis=1)
+            burst = batch.out[:, self.my_player_num]
+            played = [0 if out else game.hands[self.my_player_num] & ~int(final)
+                      for game, final, out in zip(games, final_hands.tolist(), burst.tolist())]
+            rows = [row + (mask,) for row, mask in zip(rows, played)]
+        outcomes = [rows[i:i + candidates_num] for i in range(0, len(rows), candidates_num)]
+        if deadline is not None and time.time() >= deadline:
+            unfinished = set((batch.active_indices() // candidates_num).tolist())
+            outcomes = [o for i, o in enumerate(outcomes) if i not in unfinished]
+        return outcomes
+
+    def _my_hand_mask(self, state):
+        """自分の手札の52bitマスク（State / BitState / RolloutState）"""
+        if isinstance(state, (BitState, RolloutState)):
+            return state.hands[self.my_player_num]
+        return _cards_to_mask(state.players_cards[self.my_player_num])
+
+    def _played_in_playout(self, state, start_hand):
+        """プレイアウト開始時の手札 start_hand のうち、終局までに自分が出したカードのマスク（バーストしたら 0）"""
+        if isinstance(state, RolloutState):
+            out = state.out_mask >> self.my_player_num & 1
+        else:
+            out = self.my_player_num in state.out_player
+        return 0 if out else start_hand & ~self._my_hand_mask(state)
+
+    def _blend_amaf(self, candidates, action_scores, amaf_totals, amaf_counts, simulations):
+        """直接の平均と AMAF の平均を β = sqrt(k / (3n + k))（k = RAVE_EQUIVALENCE）で混ぜ、合計スコアの尺度で書き戻す"""
+        beta = math.sqrt(RAVE_EQUIVALENCE / (3 * simulations + RAVE_EQUIVALENCE))
+        for action in candidates:
+            if amaf_counts[action]:
+                direct = action_scores[action] / simulations
+                amaf = amaf_totals[action] / amaf_counts[action]
+                action_scores[action] = ((1 - beta) * direct + beta * amaf) * simulations
+
+    def _score_outcome(self, action_scores, action, outcome):
+        """プレイアウト結果 (勝者, 自分の残り枚数, 勝者の残り枚数[, 出したカード]) を action のスコアに加え、加えた点数を返す"""
+        winner, my_remaining, winner_remaining = outcome[:3]
+
+        # より詳細なスコアリング
+        if winner == self.my_player_num:
+            action_scores[action] += 2  # 勝利は+2点
+            return 2
+        elif winner == -1:
+            # 引き分け（全員バースト）は0点
+            return 0
+        else:
+            action_scores[action] -= 1  # 負けは-1点
+
+            # 手札枚数による追加評価（終了時点での手札が少ないほど良い）
+            # 手札差に応じた細かいスコア調整
+            if my_remaining < winner_remaining:
+                action_scores[action] += 0.3  # 惜しい負けは少しプラス
+                return -0.7
+            elif my_remaining - winner_remaining >= 3:
+                action_scores[action] -= 0.3  # 大差の負けは少しマイナス
+                return -1.3
+            return -1
+
+    def _is_best_action_settled(self, candidates, score_sums, score_products, n, sim_count, strategic_bonus,
+                                ranking_sums=None):
+        """首位候補と他の各候補との差の信頼下限がすべて正なら首位の候補の添字を、そうでなければ None を返す（早期打ち切りの判定）。
+
+        全候補は同じ確定化（共通乱数モードではロールアウトの乱数列も）で比べているので、
+        シミュレーションごとの対になったスコア差の分散から信頼区間を求める（正規近似）。
+        候補の値は「平均スコア + 戦略ボーナス × STRATEGY_WEIGHT_MULTIPLIER / sim_count」で、get_action が最後に比べる
+        「平均 × sim_count + 戦略ボーナス × STRATEGY_WEIGHT_MULTIPLIER」を sim_count で割ったもの（丸め誤差で同点付近の
+        順位が入れ替わりうるので、打ち切った場合 get_action はここで決めた首位をそのまま選ぶ）。
+        ranking_sums（AMAF を混ぜた合計など）を渡すと、平均はそちらから求める（分散は score_sums の対の差から）。
+        全シミュレーションで結果が同じ候補（共通乱数での対称な手など）は差の分散が0になるので、戦略ボーナスに
+        関わらず同点として扱う。信頼下限が EARLY_STOP_MIN_MARGIN を超えない差（戦略ボーナスの丸め誤差など）でも打ち切らない。
+        """
+        z = statistics.NormalDist().inv_cdf(self.early_stop_confidence)
+        means = [score_sums[action] / n for action in candidates]
+        ranking = means if ranking_sums is None else [ranking_sums[action] / n for action in candidates]
+        values = [mean + strategic_bonus.get(action, 0) * STRATEGY_WEIGHT_MULTIPLIER / sim_count
+                  for action, mean in zip(candidates, ranking)]
+        leader = max(range(len(candidates)), key=values.__getitem__)
+
+        for other in range(len(candidates)):
+            if other == leader:
                 continue
+            diff_mean = means[leader] - means[other]
+            diff_square = (score_products[leader, leader] + score_products[other, other]
+                           - 2.0 * score_products[leader, other]) / n
+            variance = max(0.0, (diff_square - diff_mean * diff_mean) * n / (n - 1))
+            if variance == 0.0 and diff_mean == 0.0:
+                return None
+            if values[leader] - values[other] - z * math.sqrt(variance / n) <= EARLY_STOP_MIN_MARGIN:
+                return None
+        return leader
+
+    def early_stop_rate(self):
+        """探索した手のうち早期打ち切りした割合"""
+        return self.early_stopped_moves / self.searched_moves if self.searched_moves else 0.0
+
+    def _playout(self, state, rng=random):
+        """Phase3: ロールアウトポリシーでのプレイアウト（AI同士を簡易に模擬）。同点の乱択には rng を使う"""
+        if isinstance(state, BatchState):
+            return self._playout_batch(state)
+        if isinstance(state, RolloutState):
+            return self._playout_rollout(state, rng)
+        if isinstance(state, BitState):
+            return self._playout_bit(state, rng)
+
+        # ロールアウト方策はプロセス共通の ROLLOUT_POLICY を使う（AIオブジェクトは作らない）
+        choose = ROLLOUT_POLICY.choose
+        for _ in range(SIMULATION_DEPTH):
+            if state.is_done():
+                break
 
-            action, pass_flag = ais[p_idx].get_action(state)
-            state.next(action if pass_flag == 0 else None, pass_flag)
+            card_id = choose(state, rng)
+            if card_id < 0:
+                state.next(None, 1)
+            else:
+                state.next(CARDS[card_id], 0)
 
         for i, hand in enumerate(state.players_cards):
             if len(hand) == 0 and i not in state.out_player:
@@ -2179,6 +3939,205 @@ class HybridStrongestAI:
         return -1
 
 
+    def _playout_bit(self, state, rng=random):
+        """BitState用のプレイアウト"""
+        choose = ROLLOUT_POLICY.choose
+        for _ in range(SIMULATION_DEPTH):
+            if state.is_done():
+                break
+            state.next_id(choose(state, rng))
+        return state.winner()
+
+    def _playout_rollout(self, state, rng=random):
+        """RolloutState用のプレイアウト（勝者は状態側で確定済みなので走査しない）"""
+        choose = ROLLOUT_POLICY.choose_rollout
+        next_id = state.next_id
+        for _ in range(SIMULATION_DEPTH):
+            if state.winner >= 0 or state.alive <= 1:
+                break
+            next_id(choose(state, rng))
+        return state.winner
+
+    def _playout_batch(self, batch, deadline=None):
+        """BatchState用のプレイアウト（全局を1手ずつ同時に進め、勝者の配列を返す）。deadline で打ち切る"""
+        # 同点の乱択用の乱数生成器（random から種を取るので、random のシードで再現できる）
+        rng = np.random.default_rng(random.getrandbits(64))
+        for ply in range(SIMULATION_DEPTH):
+            idx = batch.active_indices()
+            if idx.size == 0:
+                break
+            if deadline is not None and time.time() >= deadline:
+                break
+            batch.step(idx, ROLLOUT_POLICY.choose_batch(batch, idx, rng, ply))
+        return batch.winner
+
+
+# --- 情報集合MCTS ---
+
+class _ISMCTSNode:
+    """ISMCTS の木のノード（統計は、このノードへ進む手を打ったプレイヤーから見た値）"""
+    __slots__ = ('player', 'children', 'visits', 'reward', 'avail')
+
+    def __init__(self, player):
+        self.player = player
+        self.children = {}  # 手（カードID、-1はパス） → ノード
+        self.visits = 0
+        self.reward = 0.0
+        self.avail = 0  # 親でこの手が選べた回数（確定化によって合法手が変わるため）
+
+
+class ISMCTSSearch:
+    """単一観測者の情報集合MCTS（SO-ISMCTS、search='ismcts'）。
+
+    反復ごとに CardTracker の推論で相手手札を確定化し（determinization の方式に従う）、その世界で合法な手だけを
+    使って自分の視点の1本の木を下る。子は「その手が選べた回数」を母数にした UCB で選び、未展開の手があれば
+    1つ展開してロールアウト方策でプレイアウトする。各ノードはその手を打ったプレイヤーの勝ち（1）/負け（0）で、
+    ルートの子は _score_outcome の点数で更新する。ルートの子には strategic_bonus を progressive bias として
+    （訪問回数とともに減衰させて）加える。木は直列に育てるので、workers / engine によらず BitState で下る。
+    """
+
+    def __init__(self, ai, state, tracker, candidates, strategic_bonus, sim_count):
+        self.ai = ai
+        self.state = state
+        self.tracker = tracker
+        self.candidates = candidates
+        self.root = _ISMCTSNode(ai.my_player_num)
+        self._moves = [-1 if action is None else action.id for action in candidates]
+        # バンディットと同じ尺度の事前値（平均スコアに足す値）。未展開の候補は事前値の大きい順に展開する
+        self._prior = {move: strategic_bonus.get(action, 0) * STRATEGY_WEIGHT_MULTIPLIER / sim_count
+                       for move, action in zip(self._moves, candidates)}
+        self._root_order = sorted(self._moves, key=self._prior.get, reverse=True)
+        # ルートの子ごとの _score_outcome の合計
+        self._totals = {move: 0 for move in self._moves}
+
+    def run(self, iterations, deadline=None):
+        """iterations 回（None なら deadline まで）反復し、(候補ごとの合計スコア, 候補ごとの訪問回数, 反復回数) を返す"""
+        ai = self.ai
+        me = ai.my_player_num
+        bit_state = ai._state_pool.acquire(self.state)
+        rollout_state = ai._rollout_state
+        sampler = ai._world_sampler(self.state, self.tracker)
+        done = 0
+        for sim in (itertools.count() if iterations is None else range(iterations)):
+            if deadline is not None and time.time() >= deadline:
+                break
+            if sampler is None:
+                for p, cards in ai._determinize_hands(self.state, self.tracker).items():
+                    bit_state.set_hand(p, _cards_to_mask(cards))
+            else:
+                for p, mask in sampler.hand_masks(sim).items():
+                    bit_state.set_hand(p, mask)
+
+            depth = bit_state.undo_depth()
+            path = self._descend(bit_state)
+            winner = ai._playout_rollout(rollout_state.load(bit_state))
+            winner_remaining = rollout_state.hand_count(winner) if winner >= 0 else 0
+            bit_state.undo_to(depth)
+            self._backpropagate(path, (winner, rollout_state.hand_count(me), winner_remaining))
+            done += 1
+        ai._state_pool.release(bit_state)
+
+        totals, visits = {}, {}
+        for move, action in zip(self._moves, self.candidates):
+            child = self.root.children.get(move)
+            totals[action] = self._totals[move]
+            visits[action] = child.visits if child is not None else 0
+        return totals, visits, done
+
+    def _descend(self, bit_state):
+        """選択と展開: 木を下りながら bit_state を進め、通った (手, ノード) の列を返す"""
+        node = self.root
+        path = []
+        while not bit_state.is_done():
+            player = bit_state.turn_player
+            if node is self.root:
+                moves = self._root_order
+            else:
+                legal = bit_state.legal_mask() & bit_state.hands[player]
+                moves = [c for c in range(52) if legal >> c & 1] if legal else [-1]
+
+            children = node.children
+            untried = [move for move in moves if move not in children]
+            if untried:
+                move = untried[0] if node is self.root else random.choice(untried)
+                children[move] = _ISMCTSNode(player)
+            else:
+                move = max(moves, key=lambda m: self._ucb(node, m))
+            for m in moves:
+                sibling = children.get(m)
+                if sibling is not None:
+                    sibling.avail += 1
+
+            child = children[move]
+            bit_state.next_id(move)
+            path.append((move, child))
+            if untried:
+                break
+            node = child
+        return path
+
+    def _ucb(self, node, move):
+        child = node.children[move]
+        exploration = ISMCTS_UCB_C * math.sqrt(math.log(child.avail) / child.visits)
+        if node is not self.root:
+            return child.reward / child.visits + exploration
+        # ルート: 報酬 (-1.3〜+2) を幅 ROLLOUT_SCORE_RANGE で割り、事前値は訪問回数とともに減衰させる
+        mean = self._totals[move] / child.visits
+        return (mean + self._prior[move] / (child.visits + 1)) / ROLLOUT_SCORE_RANGE + exploration
+
+    def _backpropagate(self, path, outcome):
+        winner = outcome[0]
+        (move, first), rest = path[0], path[1:]
+        first.visits += 1
+        first.reward += self.ai._score_outcome(self._totals, move, outcome)
+        for _, node in rest:
+            node.visits += 1
+            if node.player == winner:
+                node.reward += 1.0
+
+
+# --- 並列探索ワーカー ---
+
+_WORKER_POOL = None
+_WORKER_POOL_SIZE = 0
+_WORKER_AIS = {}  # ワーカープロセス内で使い回すAI {(プレイヤー番号, 設定): HybridStrongestAI}
+_WORKER_MOVE = None  # ワーカープロセスが今の手で使う (RootSimulations.key, AI, 盤面, 推論器, 確定化器)
+
+
+def _get_worker_pool(workers):
+    """手・ゲームをまたいで使い回すプロセスプール（ワーカー数が変わったときだけ作り直す）"""
+    global _WORKER_POOL, _WORKER_POOL_SIZE
+    if _WORKER_POOL is None or _WORKER_POOL_SIZE != workers:
+        if _WORKER_POOL is not None:
+            _WORKER_POOL.shutdown()
+        _WORKER_POOL = ProcessPoolExecutor(max_workers=workers)
+        _WORKER_POOL_SIZE = workers
+    return _WORKER_POOL
+
+
+def _simulation_worker(task):
+    """ワーカープロセス側: 担当する連番のシミュレーション結果を返す。
+
+    payload（盤面・推論器など）は1手に1回だけ届くので、手のキーと一緒に覚えておく。
+    この手の payload を受け取っていなければ None を返す（呼び出し側が payload を付けて送り直す）。
+    """
+    global _WORKER_MOVE
+    key, base_seed, payload, candidates, first_sim, sim_count, sim_step, deadline = task
+    if payload is not None:
+        my_player_num, state, tracker, sampler, settings = payload
+        ai_key = (my_player_num, tuple(sorted(settings.items())))
+        ai = _WORKER_AIS.get(ai_key)
+        if ai is None:
+            ai = HybridStrongestAI(my_player_num, simulation_count=0, workers=0, **settings)
+            _WORKER_AIS[ai_key] = ai
+        _WORKER_MOVE = (key, ai, state, tracker, sampler)
+    elif _WORKER_MOVE is None or _WORKER_MOVE[0] != key:
+        return None
+    _, ai, state, tracker, sampler = _WORKER_MOVE
+    return ai._simulate_outcomes(state, tracker, candidates, sim_count, base_seed=base_seed, first_sim=first_sim,
+                                 sim_step=sim_step, deadline=deadline, sampler=sampler)
+
+
 # インスタンス作成
 ai_instance = HybridStrongestAI(MY_PLAYER_NUM, simulation_count=SIMULATION_COUNT)
 
@@ -0,0 +1,100 @@
+"""ルート探索の回帰テスト
+
+src から python -m unittest discover tests で実行する。
+"""
+
+import json
+import os
+import random
+import sys
+import unittest
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+# ♡K と ♢K が対称な局面（全プレイアウトで結果が同じになり、戦略ボーナスは丸め誤差の分だけ違う）
+SYMMETRIC_KINGS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'symmetric_kings.json')
+
+
+def _positions(count, seed):
+    """無作為に進めた対局から、手番のプレイヤーに2つ以上の合法手がある局面を count 個集める
+
+    配札は random から引くので、対局ごとに seed から決めた値で random を初期化してから配る（毎回同じ局面になる）。
+    """
+    rng = random.Random(seed)
+    positions = []
+    while len(positions) < count:
+        random.seed(rng.getrandbits(32))
+        state = main.State()
+        while not state.is_done():
+            actions = state.my_actions()
+            action = rng.choice(actions) if actions else None
+            state.next(action, 1 if action is None else 0)
+            if state.is_done():
+                break
+            if len(state.my_actions()) >= 2 and rng.random() < 0.3:
+                positions.append(state.clone())
+    return positions[:count]
+
+
+def _load_position(path):
+    """JSON（手札・場・履歴をカードIDで、パスは -1）から局面を作る"""
+    with open(path) as f:
+        data = json.load(f)
+    field_cards = np.zeros((4, 13), dtype='int64')
+    for card_id in data['field']:
+        field_cards[divmod(card_id, 13)] = 1
+    history = [(p, None if card_id < 0 else main.CARDS[card_id], pass_flag)
+               for p, card_id, pass_flag in data['history']]
+    return main.State(players_num=len(data['players_cards']), field_cards=field_cards,
+                      players_cards=[main.Hand([main.CARDS[c] for c in hand]) for hand in data['players_cards']],
+                      turn_player=data['turn_player'], pass_count=data['pass_count'], out_player=data['out_player'],
+                      history=history)
+
+
+class EarlyStoppingTest(unittest.TestCase):
+    """早期打ち切りで首位と判定した候補を、get_action が最後にそのまま選ぶこと"""
+
+    def _check_settled_leader(self, **settings):
+        # 予定回数を多くし信頼水準を下げて、予定よりずっと少ない回数で打ち切る局面を作る
+        # （合計を予定回数に揃えずに戦略ボーナスを足すと、ここで首位が入れ替わる）
+        stopped = 0
+        for i, state in enumerate(_positions(100, seed=1)):
+            random.seed(i)
+            ai = main.HybridStrongestAI(state.turn_player, simulation_count=1000, workers=0, early_stopping=True,
+                                        early_stop_confidence=0.7, **settings)
+            action, pass_flag = ai.get_action(state)
+            search = ai.last_search
+            if not search.get('stopped_early') or pass_flag:
+                continue
+            stopped += 1
+            self.assertIs(action, search['settled_action'], 'position %d' % i)
+        self.assertGreater(stopped, 0)
+
+    def test_final_choice_is_settled_leader(self):
+        self._check_settled_leader()
+
+    def test_final_choice_is_settled_leader_with_rave(self):
+        self._check_settled_leader(rave=True)
+
+    def _check_tie_not_settled(self, **settings):
+        state = _load_position(SYMMETRIC_KINGS_PATH)
+        random.seed(62)
+        ai = main.HybridStrongestAI(state.turn_player, simulation_count=200, workers=0, early_stopping=True,
+                                    early_stop_confidence=0.7, **settings)
+        ai.get_action(state)
+        self.assertFalse(ai.last_search['stopped_early'])
+
+    def test_symmetric_candidates_are_a_tie(self):
+        self._check_tie_not_settled()
+
+    def test_symmetric_candidates_are_a_tie_with_paired_rollouts(self):
+        # 共通乱数では対称な候補の対の差がどのシミュレーションでも0になる
+        self._check_tie_not_settled(paired_rollouts=True)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,58 @@
+"""戦略評価の回帰テスト
+
+src から python -m unittest discover tests で実行する。
+"""
+
+import json
+import os
+import random
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main  # noqa: E402
+
+# 特徴量行列にまとめる前の、戦略ごとの _evaluate_*_strategy を足し合わせていた実装で求めた戦略ボーナス。
+# 対局ごとに配札の乱数シードと手の列（カードID、パスは -1）、手の番号ごとの {カードID: ボーナス} を持つ
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'strategy_bonus.json')
+
+
+def _strategic_bonus(state):
+    """get_action と同じ手順（相手モデルに履歴を観測させ、履歴を再生した推論器を使う）で戦略ボーナスを求める"""
+    ai = main.HybridStrongestAI(state.turn_player, simulation_count=0, workers=0)
+    ai._opponent_model = main.OpponentModel(state.players_num)
+    for p, a, pf in state.history:
+        ai._opponent_model.observe(state, p, a, pf)
+    tracker = ai._build_tracker_from_history(state)
+    game_state_info = ai._evaluate_game_state(state)
+    return ai._evaluate_strategic_actions(state, tracker, state.my_actions(), game_state_info)
+
+
+class StrategyBonusTest(unittest.TestCase):
+    """特徴量行列 × 重みベクトルの戦略ボーナスが、戦略ごとに評価していた頃の値と一致すること"""
+
+    def test_matches_per_strategy_evaluation(self):
+        with open(GOLDEN_PATH) as f:
+            games = json.load(f)['games']
+        checked = 0
+        for game in games:
+            random.seed(game['seed'])
+            state = main.State()
+            for index, card_id in enumerate(game['moves']):
+                expected = game['positions'].get(str(index))
+                if expected is not None:
+                    bonus = {str(card.id): value for card, value in _strategic_bonus(state).items()}
+                    self.assertEqual(bonus.keys(), expected.keys(), 'seed %d move %d' % (game['seed'], index))
+                    for key, value in expected.items():
+                        self.assertAlmostEqual(bonus[key], value, places=6,
+                                               msg='seed %d move %d card %s' % (game['seed'], index, key))
+                    checked += 1
+                action = None if card_id < 0 else main.CARDS[card_id]
+                state.next(action, 1 if action is None else 0)
+            self.assertTrue(state.is_done())
+        self.assertEqual(checked, sum(len(game['positions']) for game in games))
+
+
+if __name__ == '__main__':
+    unittest.main()